@@ -0,0 +1,84 @@
+"""Benchmark the scaling of cell-parallel numba kernels with the thread count.
+
+Usage:
+    python benchmark_threads.py [tsm|nsm1] [gridsize ...]
+
+Prints the average time per timestep and the speedup over one thread for
+1, 2, 4, ... up to NUMBA_NUM_THREADS threads, and checks that every thread
+count gives the same results.
+"""
+import sys
+import time
+import numba
+import numpy as np
+import xarray as xr
+from clearwater_modules.nsm1.model import NutrientBudget
+from clearwater_modules.tsm.model import EnergyBudget
+
+WARMUP_STEPS: int = 3
+TIMED_STEPS: int = 20
+
+
+def create_data_array(gridsize: int, value: float) -> xr.DataArray:
+    return xr.DataArray(np.full(gridsize, value), dims=['cell'])
+
+
+def build_model(module: str, gridsize: int, threads: int):
+    if module == 'tsm':
+        return EnergyBudget(
+            time_steps=WARMUP_STEPS + TIMED_STEPS,
+            initial_state_values={
+                'water_temp_c': create_data_array(gridsize, 20.0),
+                'surface_area': create_data_array(gridsize, 1.0),
+                'volume': create_data_array(gridsize, 1000.0),
+            },
+            track_dynamic_variables=False,
+            backend='numba',
+            threads=threads,
+            history_window=1,
+        )
+    return NutrientBudget(
+        time_steps=WARMUP_STEPS + TIMED_STEPS,
+        initial_state_values={
+            var.name: create_data_array(gridsize, 1.0)
+            for var in NutrientBudget.get_state_variables()
+        },
+        updateable_static_variables=['TwaterC'],
+        track_dynamic_variables=False,
+        backend='numba',
+        threads=threads,
+        history_window=1,
+    )
+
+
+def time_per_step(module: str, gridsize: int, threads: int) -> tuple[float, xr.Dataset]:
+    model = build_model(module, gridsize, threads)
+    model.run(WARMUP_STEPS)
+    start: float = time.perf_counter()
+    model.run(TIMED_STEPS)
+    elapsed: float = (time.perf_counter() - start) / TIMED_STEPS
+    return elapsed, model.dataset
+
+
+def main(module: str, gridsizes: list[int]) -> None:
+    thread_counts: list[int] = [
+        2 ** i for i in range(int(np.log2(numba.config.NUMBA_NUM_THREADS)) + 1)
+    ]
+    print(f'{module}, NUMBA_NUM_THREADS={numba.config.NUMBA_NUM_THREADS}')
+    print('gridsize,threads,ms_per_step,speedup')
+    for gridsize in gridsizes:
+        serial: float = 0.0
+        reference: xr.Dataset | None = None
+        for threads in thread_counts:
+            elapsed, dataset = time_per_step(module, gridsize, threads)
+            if reference is None:
+                serial, reference = elapsed, dataset
+            else:
+                xr.testing.assert_identical(dataset, reference)
+            print(f'{gridsize},{threads},{elapsed * 1e3:.2f},{serial / elapsed:.2f}')
+
+
+if __name__ == '__main__':
+    module: str = sys.argv[1] if len(sys.argv) > 1 else 'tsm'
+    gridsizes: list[int] = [int(arg) for arg in sys.argv[2:]] or [10_000, 100_000, 1_000_000]
+    main(module, gridsizes)
@@ -0,0 +1,117 @@
+"""Buffer reuse for the intermediates of the NumPy backend.
+
+Without tracking, dynamic variables are only needed until the last process
+reading them has run, but each timestep still allocates a new grid-sized
+array for every one of them and keeps all of them referenced until the next
+timestep. ArenaExecutor uses the liveness of each intermediate in the plan
+(see ComputationPlan.live_ranges) to:
+
+* write intermediates into a small arena of preallocated buffers, assigned so
+  that intermediates live at the same time never share one (see
+  ComputationPlan.assign_buffers). Processes write into their buffer through
+  an out= variant generated from their source (see codegen.out_function).
+* release the other intermediates after their last use.
+
+Peak memory per timestep is then bounded by the intermediates live at the
+same time, rather than by all dynamic variables.
+"""
+import numpy as np
+from clearwater_modules.codegen import out_function
+from clearwater_modules.plan import ComputationPlan
+from clearwater_modules.shared.types import (
+    Process,
+)
+from typing import (
+    Optional,
+)
+
+
+class ArenaExecutor:
+    """Runs plan steps on full-grid arrays, reusing buffers for intermediates.
+
+    The executor is built on its first call: that timestep is computed
+    without the arena, and the results are used to find the intermediates
+    that are grid-sized floats, which are the ones stored in the arena.
+
+    Attributes:
+        plan: The computation plan being executed.
+        needed_slots: Slots read after the step (e.g. state and tracked
+            variables), which are never released or stored in the arena.
+        shape: The shape of the model grid.
+        steps: The plan steps to run (defaults to all of plan.steps).
+        buffers: The arena, once built.
+        arena_slots: The buffer index of each slot stored in the arena.
+    """
+
+    def __init__(
+        self,
+        plan: ComputationPlan,
+        needed_slots: set[int],
+        shape: tuple[int, ...],
+        steps: Optional[tuple[tuple[int, Process, tuple[int, ...]], ...]] = None,
+    ) -> None:
+        self.plan = plan
+        self.needed_slots = set(needed_slots)
+        self.shape = shape
+        self.steps = plan.steps if steps is None else steps
+        self.buffers: list[np.ndarray] = []
+        self.arena_slots: dict[int, int] = {}
+        self._stages: Optional[list[tuple]] = None
+
+    def __call__(self, values: list) -> None:
+        if self._stages is None:
+            results: list[tuple] = []
+            for out, func, args in self.steps:
+                inputs: list = [values[i] for i in args]
+                values[out] = func(*inputs)
+                results.append((values[out], inputs))
+            self._stages = self.build(results)
+            return
+        for out, func, args, buffer, release in self._stages:
+            if buffer is None:
+                values[out] = func(*[values[i] for i in args])
+            else:
+                values[out] = func(*[values[i] for i in args], buffer)
+            for slot in release:
+                values[slot] = None
+
+    def build(self, results: list[tuple]) -> list[tuple]:
+        """Assign the arena, using the (result, inputs) of each step of a timestep."""
+        ranges: dict[int, tuple[int, int]] = self.plan.live_ranges(self.steps)
+        functions: dict[int, object] = {}
+        # results viewing their inputs would be overwritten with the inputs
+        views: set[int] = set()
+        for (out, func, args), (result, inputs) in zip(self.steps, results):
+            array: np.ndarray = np.asarray(result)
+            if array.base is not None or any(result is value for value in inputs):
+                views.update(args)
+            if out in self.needed_slots:
+                continue
+            if array.shape != self.shape or array.dtype != np.float64:
+                continue
+            variant = out_function(func)
+            if variant is not None:
+                functions[out] = variant
+        for slot in views:
+            functions.pop(slot, None)
+
+        self.arena_slots = self.plan.assign_buffers(functions, self.steps)
+        self.buffers = [
+            np.empty(self.shape)
+            for _ in range(max(self.arena_slots.values(), default=-1) + 1)
+        ]
+
+        # release intermediates after the last step reading them
+        release: list[list[int]] = [[] for _ in self.steps]
+        for slot, (_, last) in ranges.items():
+            if slot not in self.needed_slots:
+                release[last].append(slot)
+
+        stages: list[tuple] = []
+        for i, (out, func, args) in enumerate(self.steps):
+            buffer: Optional[np.ndarray] = None
+            if out in self.arena_slots:
+                func = functions[out]
+                buffer = self.buffers[self.arena_slots[out]]
+            stages.append((out, func, args, buffer, tuple(release[i])))
+        return stages
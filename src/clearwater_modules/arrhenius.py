@@ -0,0 +1,181 @@
+"""Batched Arrhenius temperature corrections for the NumPy backend.
+
+Many NSM1 rate processes (kah_tc, knit_tc, kdoc_tc, ...) only return
+arrhenius_correction(TwaterC, rc20, theta), i.e. rc20 * theta**(TwaterC - 20),
+so every one of them subtracts 20 from the temperature and evaluates pow
+over the whole grid. With batch_arrhenius, these processes are removed from
+the plan steps, and a single ArrheniusStage computes all of them at the start
+of each timestep, before the executor runs the other steps:
+
+* TwaterC - 20 is computed once,
+* the correction factors exp((TwaterC - 20) * ln(theta)) of all distinct
+  theta values with one exp over a (thetas, *grid) array,
+* every rate with one multiplication by the rc20 values, written to a
+  (rates, *grid) array whose rows are the values of the *_tc variables.
+
+Only rates whose theta is a uniform static value, and whose temperature and
+rc20 are not computed earlier in the timestep, are batched (their inputs then
+have the same values at the start of the timestep). Results match pow to
+within a few ulp.
+"""
+import ast
+import inspect
+import textwrap
+import types
+import numpy as np
+from clearwater_modules.shared.types import (
+    Process,
+)
+from clearwater_modules.sorter import get_process_args
+from typing import (
+    Optional,
+)
+
+Step = tuple[int, Process, tuple[int, ...]]
+
+ARRHENIUS_FUNCTION: str = 'arrhenius_correction'
+REFERENCE_TEMPERATURE: float = 20.0
+
+
+def arrhenius_args(process: Process) -> Optional[tuple[int, int, int]]:
+    """Return the positions of (temperature, rc20, theta) in a process's arguments.
+
+    Only processes which return arrhenius_correction() of three of their
+    arguments (directly, or through a single assignment) are recognized,
+    None is returned for the others.
+    """
+    func = getattr(process, 'py_func', process)
+    if not isinstance(func, types.FunctionType) or func.__closure__:
+        return None
+    correction = func.__globals__.get(ARRHENIUS_FUNCTION)
+    if getattr(correction, '__name__', None) != ARRHENIUS_FUNCTION:
+        return None
+    try:
+        tree: ast.Module = ast.parse(textwrap.dedent(inspect.getsource(func)))
+    except (OSError, TypeError, SyntaxError):
+        return None
+
+    body: list[ast.stmt] = tree.body[0].body
+    if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant):
+        body = body[1:]  # docstring
+    value: Optional[ast.expr] = None
+    if len(body) == 1 and isinstance(body[0], ast.Return):
+        value = body[0].value
+    elif (
+        len(body) == 2 and isinstance(body[0], ast.Assign) and
+        isinstance(body[1], ast.Return) and len(body[0].targets) == 1 and
+        isinstance(body[0].targets[0], ast.Name) and
+        isinstance(body[1].value, ast.Name) and
+        body[1].value.id == body[0].targets[0].id
+    ):
+        value = body[0].value
+
+    args: list[str] = get_process_args(process)
+    is_correction: bool = (
+        isinstance(value, ast.Call) and
+        isinstance(value.func, ast.Name) and value.func.id == ARRHENIUS_FUNCTION and
+        len(value.args) == 3 and not value.keywords and
+        all(isinstance(arg, ast.Name) and arg.id in args for arg in value.args)
+    )
+    if not is_correction:
+        return None
+    temperature, rc20, theta = (args.index(arg.id) for arg in value.args)
+    return temperature, rc20, theta
+
+
+class ArrheniusStage:
+    """Computes every batched Arrhenius rate of a timestep in one pass.
+
+    Attributes:
+        temperature: The slot of the temperature the rates are corrected for.
+        outs: The slot of each rate.
+        rc20s: The slot of each rate's value at 20 degrees C.
+        thetas: The distinct theta values.
+        factors: The index in thetas of each rate's theta.
+    """
+
+    def __init__(
+        self,
+        temperature: int,
+        outs: list[int],
+        rc20s: list[int],
+        thetas: list[float],
+        factors: list[int],
+        constants: dict[int, object],
+    ) -> None:
+        self.temperature = temperature
+        self.outs = outs
+        self.rc20s = rc20s
+        self.thetas = thetas
+        self.factors = factors
+        self._log_thetas: np.ndarray = np.log(np.asarray(thetas, dtype=np.float64))
+        self._index: np.ndarray = np.asarray(factors, dtype=np.intp)
+        # uniform rc20 values are applied with a single multiplication
+        self._uniform: np.ndarray = np.array([
+            float(constants[slot]) if slot in constants else 1.0 for slot in rc20s
+        ])
+        self._varying: list[tuple[int, int]] = [
+            (i, slot) for i, slot in enumerate(rc20s) if slot not in constants
+        ]
+
+    def __call__(self, values: list) -> None:
+        difference = np.subtract(values[self.temperature], REFERENCE_TEMPERATURE)
+        factors: np.ndarray = np.multiply.outer(self._log_thetas, difference)
+        np.exp(factors, out=factors)
+        rates: np.ndarray = factors[self._index]
+        np.multiply(
+            rates,
+            self._uniform.reshape((-1,) + (1,) * difference.ndim),
+            out=rates,
+        )
+        for i, slot in self._varying:
+            np.multiply(rates[i], values[slot], out=rates[i])
+        for i, out in enumerate(self.outs):
+            values[out] = rates[i]
+
+
+def batch_arrhenius_steps(
+    steps: tuple[Step, ...],
+    constants: dict[int, object],
+) -> tuple[tuple[Step, ...], list[ArrheniusStage]]:
+    """Move Arrhenius rate steps into batched stages, one per temperature.
+
+    Args:
+        steps: Plan steps, in computation order.
+        constants: Values of slots that never change (e.g. uniform statics).
+
+    Returns:
+        The remaining steps, and the stages to run before them.
+    """
+    new_steps: list[Step] = []
+    batches: dict[int, dict[str, list]] = {}
+    written: set[int] = set()
+    read: set[int] = set()
+    for out, func, args in steps:
+        positions: Optional[tuple[int, int, int]] = arrhenius_args(func)
+        if positions is not None:
+            temperature, rc20, theta = (args[i] for i in positions)
+            # rates read, or inputs updated, earlier in the timestep are not batched
+            if (
+                temperature not in written and rc20 not in written and
+                out not in read and theta in constants
+            ):
+                batch: dict[str, list] = batches.setdefault(
+                    temperature, {'outs': [], 'rc20s': [], 'thetas': [], 'factors': []},
+                )
+                value: float = float(constants[theta])
+                if value not in batch['thetas']:
+                    batch['thetas'].append(value)
+                batch['outs'].append(out)
+                batch['rc20s'].append(rc20)
+                batch['factors'].append(batch['thetas'].index(value))
+                written.add(out)
+                continue
+        new_steps.append((out, func, args))
+        written.add(out)
+        read.update(args)
+    stages: list[ArrheniusStage] = [
+        ArrheniusStage(temperature, constants=constants, **batch)
+        for temperature, batch in batches.items()
+    ]
+    return tuple(new_steps), stages
@@ -1,20 +1,36 @@
 """Stored base types shared by all sub-modules."""
+import dataclasses
 import warnings
 import xarray as xr
 import numpy as np
 import clearwater_modules.utils as utils
+from clearwater_modules.codegen import fold_constants
+from clearwater_modules.forcing import Forcing
+from clearwater_modules.lookup import TemperatureTables
+from clearwater_modules.engine import (
+    ArrayEngine,
+    Backend,
+)
+from clearwater_modules.plan import ComputationPlan
 import clearwater_modules.sorter as sorter
+from clearwater_modules.sinks import OutputSink
+from clearwater_modules.zones import ParameterZones
 from clearwater_modules.shared.types import (
     InitialVariablesDict,
     Variable,
 )
 from typing import (
+    Callable,
     runtime_checkable,
     Protocol,
     Optional,
     Iterable,
+    Literal,
 )
 
+Validation = Literal['once', 'always', 'never']
+VALIDATION_MODES: tuple[str, ...] = ('once', 'always', 'never')
+
 
 @runtime_checkable
 class CanRegisterVariable(Protocol):
@@ -26,6 +42,16 @@ class CanRegisterVariable(Protocol):
 
 class Model(CanRegisterVariable):
     _variables: list[Variable] = []
+    _computation_plan: Optional[ComputationPlan] = None
+    _specialized_plans: dict[tuple, ComputationPlan] = {}
+    # static switches turning modules on and off (see _init_plan)
+    _switches: tuple[str, ...] = ()
+    # static options selecting between the formulas of processes
+    _options: tuple[str, ...] = ()
+    # dynamic variables interpolated in temperature tables (see lookup.py)
+    _tabulated: tuple[str, ...] = ()
+    # the water temperature variable (degrees C) the tables are indexed by
+    _temperature: Optional[str] = None
 
     def __init__(
         self,
@@ -37,6 +63,20 @@ class Model(CanRegisterVariable):
         hotstart_dataset: Optional[xr.Dataset] = None,
         time_dim: Optional[str] = None,
         timestep: Optional[int] = 0,
+        backend: Backend = 'numpy',
+        output_interval: int = 1,
+        output_steps: Optional[Iterable[int]] = None,
+        history_window: Optional[int] = None,
+        sinks: Optional[list[OutputSink]] = None,
+        output_variables: Optional[list[str]] = None,
+        zones: Optional[xr.DataArray] = None,
+        validate: Validation = 'always',
+        threads: Optional[int] = None,
+        workers: Optional[int] = None,
+        tile_size: Optional[int] = None,
+        group_options: bool = False,
+        lookup_tables: Optional[TemperatureTables] = None,
+        batch_arrhenius: bool = False,
     ) -> None:
         """Initialize the model, should be accessed by subclasses.
 
@@ -58,15 +98,111 @@ class Model(CanRegisterVariable):
                 and state variables.
             time_dim: The name of the time dimension. If not provided, defaults
                 to 'time_step'.
+            backend: How timesteps are computed. 'numpy' (default) calls each
+                process on full-grid arrays. 'numba' generates fused kernels
+                that loop once over cells, computing every compilable process
+                per cell, and falls back to 'numpy' for the other processes.
+            output_interval: Keep every Nth timestep in Model.dataset. All
+                timesteps are still computed, but only the kept ones are
+                allocated and written.
+            output_steps: An explicit list of timesteps to keep in Model.dataset,
+                overriding output_interval. Timestep 0 is always kept.
+            history_window: If set, Model.dataset only keeps the last
+                history_window output steps in ring buffers, and the model can
+                be incremented indefinitely (time_steps is no longer a limit).
+                Older steps should be written out (or discarded) by the caller.
+            sinks: Output sinks (see clearwater_modules.sinks) that each output
+                step is streamed to as it is computed. Call Model.close() at
+                the end of a run to flush them.
+            output_variables: The dynamic variables the caller needs. Only
+                these, the state variables and the variables they depend on
+                are computed and stored. Defaults to all dynamic variables if
+                they are tracked, else to none (only the state variables).
+            zones: A DataArray with the zone id of each cell. Static values
+                given as a {zone id: value} dict are then stored as per-zone
+                tables (see Model.set_zone_parameter) instead of grid arrays.
+            validate: How update_state_values and run() forcing are checked.
+                'always' (default) checks each variable's name and dims on
+                every call, 'once' only the first time each variable is
+                passed, and 'never' skips the checks for trusted inputs.
+            threads: With backend='numba', split the cells of each kernel
+                across this many threads (at most NUMBA_NUM_THREADS). Cells
+                are computed independently, so results are identical for any
+                number of threads.
+            workers: Run the independent processes of each dependency level
+                (see sorter.dependency_levels) concurrently on this many
+                threads. Results are identical to a sequential run.
+            tile_size: With backend='numpy', compute each timestep on blocks
+                of this many cells at a time, so that intermediate arrays stay
+                in cache on large grids (see tiling.py).
+            group_options: With backend='numpy', run processes taking option
+                variables that differ between cells once per option value, on
+                the cells using it only (see options.py).
+            lookup_tables: With backend='numpy', interpolate dynamic variables
+                of water temperature alone in tables built with these
+                settings, instead of computing them (see lookup.py). The
+                tabulated variables default to Model._tabulated.
+            batch_arrhenius: With backend='numpy', compute every Arrhenius
+                rate (*_tc) of a timestep in one batched stage, with one
+                correction factor per distinct theta (see arrhenius.py).
         """
         self.initial_state_values = initial_state_values
         self.static_variable_values = static_variable_values
         self.hotstart_dataset = hotstart_dataset
+        self.zones = zones
+        self.parameter_zones: Optional[ParameterZones] = None
         self._track_dynamic_variables = track_dynamic_variables
         self.timestep = timestep
+        self.backend = backend
+        self.threads = threads
+        self.workers = workers
+        self.tile_size = tile_size
+        self.group_options = group_options
+        if lookup_tables is not None:
+            lookup_tables = dataclasses.replace(
+                lookup_tables,
+                variables=(
+                    self._tabulated if lookup_tables.variables is None
+                    else tuple(lookup_tables.variables)
+                ),
+                temperature=lookup_tables.temperature or self._temperature,
+            )
+            if not lookup_tables.variables:
+                raise ValueError(
+                    f'{type(self).__name__} has no default variables to tabulate, '
+                    'list them in TemperatureTables(variables=...).'
+                )
+        self.lookup_tables = lookup_tables
+        self.batch_arrhenius = batch_arrhenius
+        if validate not in VALIDATION_MODES:
+            raise ValueError(
+                f'validate must be one of {VALIDATION_MODES}, not {validate!r}.'
+            )
+        self.validate = validate
+        self._validated: set[str] = set()
         self.time_steps = time_steps + 1  # xarray indexing
         self.temporal_variables: list = []
 
+        if not isinstance(output_interval, int) or output_interval < 1:
+            raise ValueError(
+                f'output_interval must be a positive integer, got {output_interval}.'
+            )
+        self.output_interval = output_interval
+        self._requested_output_steps: Optional[list[int]] = None
+        if output_steps is not None:
+            self._requested_output_steps = [int(step) for step in output_steps]
+
+        if history_window is not None:
+            if not isinstance(history_window, int) or history_window < 1:
+                raise ValueError(
+                    f'history_window must be a positive integer, got {history_window}.'
+                )
+            if output_steps is not None:
+                raise ValueError(
+                    'output_steps cannot be combined with history_window, use output_interval.'
+                )
+        self.history_window = history_window
+
         if not time_dim:
             time_dim = 'time_step'
         self.time_dim = time_dim
@@ -75,6 +211,11 @@ class Model(CanRegisterVariable):
             updateable_static_variables = []
         self.updateable_static_variables = updateable_static_variables
         self.__non_updateable_static_variables: list[str] | None = None
+        self._plan: ComputationPlan = self._init_plan(output_variables)
+
+        self._updateable_names: frozenset[str] = frozenset(
+            self.state_variables_names + self.updateable_static_variables
+        )
 
         # create list of temporal variables
         if self._track_dynamic_variables:
@@ -86,7 +227,7 @@ class Model(CanRegisterVariable):
 
         if isinstance(self.initial_state_values, dict) and isinstance(self.static_variable_values, dict):
             print('Initializing from dicts...')
-            self.dataset: xr.Dataset = self._init_dataset_from_dicts(
+            self.dataset = self._init_dataset_from_dicts(
                 initial_state_values=self.initial_state_values,
                 static_variable_values=self.static_variable_values,
                 updateable_static_variables=self.updateable_static_variables,
@@ -95,7 +236,7 @@ class Model(CanRegisterVariable):
 
         elif isinstance(hotstart_dataset, xr.Dataset):
             print('Initializing from hotstart dataset...')
-            self.dataset: xr.Dataset = self._init_from_dataset(
+            self.dataset = self._init_from_dataset(
                 hotstart_dataset,
                 time_steps,
             )
@@ -106,7 +247,56 @@ class Model(CanRegisterVariable):
                 'Must provide either initial state and static values, or a hotstart dataset.'
             )
 
-        self._sorted_variables: list[Variable] = []
+        for sink in sinks or []:
+            self.add_sink(sink)
+
+    def _init_plan(
+        self,
+        output_variables: Optional[list[str]] = None,
+    ) -> ComputationPlan:
+        """Return the computation plan of this model instance.
+
+        Switches and options (see Model._switches, Model._options) that are
+        uniform, non-updateable static values are resolved once: selections on
+        them are folded out of the processes (see codegen.fold_constants), so
+        that only the selected formulas are computed. Dynamic variables that
+        neither the state variables nor the output variables depend on are
+        then pruned from the plan. Every state variable is still computed, so
+        results are the same as with the full plan.
+        """
+        switches: dict[str, object] = self._resolve_switches()
+        if output_variables is None:
+            if not switches:
+                return self.get_computation_plan()
+            output_variables = [
+                var.name for var in self._variables if var.use == 'dynamic'
+            ] if self._track_dynamic_variables else []
+        for name in output_variables:
+            if self.get_variable(name).use == 'static':
+                raise ValueError(
+                    f'Output variable {name} must be a state or dynamic variable.'
+                )
+        return self.get_specialized_plan(switches, output_variables)
+
+    def _resolve_switches(self) -> dict[str, object]:
+        """Return the values of switches and options that are the same in every cell."""
+        if isinstance(self.static_variable_values, dict):
+            values: dict = self.static_variable_values
+        elif isinstance(self.hotstart_dataset, xr.Dataset):
+            values = self.hotstart_dataset.data_vars
+        else:
+            return {}
+
+        switches: dict[str, object] = {}
+        for name in [*self._switches, *self._options]:
+            if name in self.updateable_static_variables or name not in values:
+                continue
+            if isinstance(values[name], dict):
+                continue
+            array: np.ndarray = np.asarray(values[name])
+            if array.size and np.all(array == array.flat[0]):
+                switches[name] = array.flat[0].item()
+        return switches
 
     def _init_dataset_from_dicts(
         self,
@@ -132,8 +322,18 @@ class Model(CanRegisterVariable):
                     f'No initial value found for state variable: {state_var.name}.'
                 )
 
+        zoned: dict[str, dict] = {
+            name: static_variable_values.pop(name)
+            for name, value in list(static_variable_values.items())
+            if isinstance(value, dict)
+        }
+
         # reassign updateable_static_variables to state variables
         for static in updateable_static_variables:
+            if static in zoned:
+                raise ValueError(
+                    f'Updateable static variable {static} cannot have per-zone values.'
+                )
             if static not in static_variable_values.keys():
                 warnings.warn(
                     f'Variable name = {static} is not a static variable, skipping.'
@@ -143,10 +343,13 @@ class Model(CanRegisterVariable):
                 initial_state_values[static] = static_variable_values.pop(static)
 
         # initialize the main model dataset
+        self.output_steps: np.ndarray = self._get_output_steps(time_steps)
         dataset: xr.Dataset = self._init_state_arrays(
             initial_state_values,
-            time_steps,
+            self.output_steps,
         )
+        if zoned:
+            self.parameter_zones = self._init_zones(dataset, zoned)
         dataset: xr.Dataset = self._init_static_arrays(
             dataset,
             static_variable_values,
@@ -171,25 +374,29 @@ class Model(CanRegisterVariable):
                 f'Hotstart dataset must have a {self.time_dim} dimension.'
             )
         else:
+            self.output_steps = self._get_output_steps(time_steps)
             coords = {
                 key: value if key != self.time_dim
-                else np.arange(time_steps)
+                else self.output_steps
                 for key, value in hotstart_dataset.coords.items()
             }
 
+            names: set[str] = set(self.computation_plan.names)
             new_hotstart_dataset = xr.Dataset(
                 data_vars={
                     var_name: (
                         hotstart_dataset[var_name].dims,
                         np.full(
                             tuple(
-                                hotstart_dataset[var_name].sizes[dim]
+                                len(self.output_steps) if dim == self.time_dim
+                                else hotstart_dataset[var_name].sizes[dim]
                                 for dim in hotstart_dataset[var_name].dims
                             ),
                             np.nan
                         )
                     )
                     for var_name, _ in hotstart_dataset.data_vars.items()
+                    if var_name in names
                 },
                 coords={
                     **coords
@@ -203,26 +410,50 @@ class Model(CanRegisterVariable):
                 {self.time_dim: -1}
             )
 
-            new_hotstart_dataset[self._non_updateable_static_variables] = hotstart_dataset[self._non_updateable_static_variables]
+            new_hotstart_dataset.update(
+                hotstart_dataset[self._non_updateable_static_variables]
+            )
 
         return new_hotstart_dataset
 
+    def _get_output_steps(self, time_steps: int) -> np.ndarray:
+        """Return the timesteps kept in Model.dataset (always including 0)."""
+        if self.history_window is not None:
+            # ring buffers are allocated by the engine, starting from step 0
+            return np.array([0])
+        if self._requested_output_steps is None:
+            steps: set[int] = set(range(0, time_steps, self.output_interval))
+        else:
+            steps = {
+                step for step in self._requested_output_steps
+                if 0 <= step < time_steps
+            }
+            if len(steps) < len(set(self._requested_output_steps)):
+                warnings.warn(
+                    f'Ignoring output steps outside of [0, {time_steps - 1}].'
+                )
+        steps.add(0)
+        return np.array(sorted(steps))
+
     def _init_state_arrays(
         self,
         initial_state_values: InitialVariablesDict,
-        time_steps: int,
+        output_steps: np.ndarray,
     ) -> xr.Dataset:
-        """Initializes the state arrays."""
+        """Initializes the state arrays, with one slice per output step."""
+        n_outputs: int = len(output_steps)
         match_dims: list[str] = []
         data_arrays: dict[str, xr.DataArray] = {}
         coords: dict = {}
         add_data: list[str] = []
 
         for k, v in initial_state_values.items():
-            if k not in (self.state_variables_names + self.updateable_static_variables):
-                warnings.warn(
-                    f'Variable {k} is not a state variable, skipping.',
-                )
+            if k not in self._updateable_names:
+                # state variables pruned from the plan are silently skipped
+                if k not in self.get_variable_names():
+                    warnings.warn(
+                        f'Variable {k} is not a state variable, skipping.',
+                    )
                 continue
             if not isinstance(v, xr.DataArray):
                 match_dims.append(k)
@@ -237,14 +468,14 @@ class Model(CanRegisterVariable):
                     k: (
                         (self.time_dim,) + data_arrays[k].dims,
                         np.full(
-                            (time_steps,) + tuple(data_arrays[k].sizes[dim] for dim in data_arrays[k].dims),
+                            (n_outputs,) + tuple(data_arrays[k].sizes[dim] for dim in data_arrays[k].dims),
                             np.nan
                         )
                     )
                     for k in data_arrays.keys()
                 },
                 coords={
-                    self.time_dim: np.arange(time_steps),
+                    self.time_dim: output_steps,
                     **coords,
                 }
             )
@@ -253,12 +484,12 @@ class Model(CanRegisterVariable):
                 data_vars={
                     k: (
                         (self.time_dim, 'x', 'y'),
-                        np.full((time_steps, 1, 1), np.nan)
+                        np.full((n_outputs, 1, 1), np.nan)
                     )
                     for k in match_dims
                 },
                 coords={
-                    self.time_dim: np.arange(time_steps),
+                    self.time_dim: output_steps,
                     'x': [1.0],
                     'y': [1.0],
                 }
@@ -292,7 +523,45 @@ class Model(CanRegisterVariable):
 
             ds[var_name].attrs = attrs
 
-        return ds  # ds.expand_dims({self.time_dim: np.arange(time_steps)})
+        return ds
+
+    def _init_zones(
+        self,
+        dataset: xr.Dataset,
+        zoned: dict[str, dict],
+    ) -> ParameterZones:
+        """Build the per-zone tables of static variables given by zone."""
+        if self.zones is None:
+            raise ValueError(
+                f'Per-zone values were given for {sorted(zoned)}, but no zones.'
+            )
+        like: xr.DataArray = dataset[
+            list(dataset.data_vars)[0]
+        ].isel({self.time_dim: 0})
+        utils.validate_dims(self.zones, like.dims)
+        if self.zones.shape != like.shape:
+            raise ValueError(
+                f'zones must have shape {like.shape}, got {self.zones.shape}.'
+            )
+        parameter_zones = ParameterZones(self.zones)
+        names: set[str] = set(self.static_variables_names)
+        for name, values in zoned.items():
+            if name not in names:
+                warnings.warn(
+                    f'Variable {name} is not a static variable, skipping.'
+                )
+                continue
+            var: Variable = self.get_variable(name)
+            parameter_zones.add(
+                name,
+                values,
+                attrs={
+                    'long_name': var.long_name,
+                    'units': var.units,
+                    'description': var.description,
+                },
+            )
+        return parameter_zones
 
     def _init_static_arrays(
         self,
@@ -313,6 +582,8 @@ class Model(CanRegisterVariable):
         for var in self.static_variables:
             if var.name in self.updateable_static_variables:
                 continue
+            if self.parameter_zones is not None and var.name in self.parameter_zones:
+                continue
             if var.name not in static_variable_values.keys():
                 raise ValueError(
                     f'No initial value found for static variable: {var.name}.'
@@ -326,13 +597,19 @@ class Model(CanRegisterVariable):
                 'units': var.units,
                 'description': var.description,
             }
-            dataset[var.name] = xr.full_like(
-                dataset[
+            value = static_variable_values[var.name]
+            if isinstance(value, xr.DataArray):
+                dataset[var.name] = value.copy()
+            else:
+                # scalars are broadcast without copying (see ArrayEngine)
+                like: xr.DataArray = dataset[
                     list(dataset.data_vars)[0]
-                ].isel({self.time_dim: 0}),
-                static_variable_values[var.name],
-                dtype=type(static_variable_values[var.name]),
-            )
+                ].isel({self.time_dim: 0})
+                dataset[var.name] = xr.DataArray(
+                    np.broadcast_to(np.array(value, dtype=type(value)), like.shape),
+                    dims=like.dims,
+                    coords=like.coords,
+                )
             dataset[var.name].attrs = attrs
         return dataset
 
@@ -381,7 +658,8 @@ class Model(CanRegisterVariable):
         """Register a variable with the model."""
         if variable.name not in cls.get_variable_names():
             cls._variables.append(variable)
-            cls._sorted_variables = []
+            cls._computation_plan = None
+            cls._specialized_plans = {}
 
     @classmethod
     def unregister_variables(cls, variables: str | list[str]) -> None:
@@ -391,7 +669,83 @@ class Model(CanRegisterVariable):
         cls._variables = [
             var for var in cls._variables if var.name not in variables
         ]
-        cls._sorted_variables = []
+        cls._computation_plan = None
+        cls._specialized_plans = {}
+
+    @classmethod
+    def get_computation_plan(cls) -> ComputationPlan:
+        """Return the class' computation plan, building (or loading) it once."""
+        plan: Optional[ComputationPlan] = cls.__dict__.get('_computation_plan')
+        if plan is None:
+            plan = ComputationPlan.build(cls._variables)
+            cls._computation_plan = plan
+        return plan
+
+    @classmethod
+    def get_specialized_plan(
+        cls,
+        constants: dict[str, object],
+        outputs: Iterable[str],
+    ) -> ComputationPlan:
+        """Return a plan specialized for constant static values and pruned to outputs.
+
+        Args:
+            constants: Static variable names and scalar values, folded into the
+                processes that take them.
+            outputs: Names of the dynamic variables to compute. Only these, the
+                state variables and the variables they depend on are kept.
+        """
+        key: tuple = (tuple(sorted(constants.items())), tuple(sorted(outputs)))
+        plans: dict[tuple, ComputationPlan] = cls.__dict__.get('_specialized_plans', {})
+        if key in plans:
+            return plans[key]
+
+        variables: dict[str, Variable] = {}
+        for var in cls._variables:
+            if var.process is not None:
+                var = dataclasses.replace(
+                    var,
+                    process=fold_constants(var.process, constants),
+                )
+            variables[var.name] = var
+
+        needed: set[str] = set()
+        stack: list[str] = [
+            *outputs,
+            *(var.name for var in cls._variables if var.use == 'state'),
+        ]
+        while stack:
+            name = stack.pop()
+            if name in needed:
+                continue
+            if name not in variables:
+                raise ValueError(f'No variable found with name: {name}')
+            needed.add(name)
+            if variables[name].process is not None:
+                stack.extend(sorter.get_process_args(variables[name].process))
+
+        kept: list[Variable] = [
+            var for var in variables.values()
+            if var.use != 'dynamic' or var.name in needed
+        ]
+        # keep the order of the full plan: folding only removes dependencies,
+        # and sorting again could move a dynamic variable across the update of
+        # a state variable it reads
+        names: set[str] = {var.name for var in kept}
+        order: list[str] = [
+            var.name for var in cls.get_computation_plan().order
+            if var.name in names
+        ]
+        plan = ComputationPlan(
+            kept,
+            order=order,
+            args={
+                name: sorter.get_process_args(variables[name].process)
+                for name in order
+            },
+        )
+        cls._specialized_plans = {**plans, key: plan}
+        return plan
 
     @classmethod
     def get_variable(cls, name: str) -> Variable:
@@ -403,8 +757,8 @@ class Model(CanRegisterVariable):
 
     @property
     def all_variables(self) -> list[Variable]:
-        """Return a list of variables."""
-        return self._variables
+        """Return a list of the variables in the model's computation plan."""
+        return list(self.computation_plan.variables)
 
     @property
     def static_variables(self) -> list[Variable]:
@@ -419,7 +773,7 @@ class Model(CanRegisterVariable):
     @property
     def state_variables(self) -> list[Variable]:
         """Return a list of state variables."""
-        return self.get_state_variables()
+        return [var for var in self.all_variables if var.use == 'state']
 
     @property
     def static_variables_names(self) -> list[str]:
@@ -436,14 +790,24 @@ class Model(CanRegisterVariable):
         """Return a list of state variable names."""
         return [var.name for var in self.state_variables]
 
+    @property
+    def computation_plan(self) -> ComputationPlan:
+        """Return the precompiled execution plan of the model."""
+        return self._plan
+
     @property
     def computation_order(self) -> list[Variable]:
         """Return a list of variables to compute in order (dynamic + state)."""
-        if len(self._sorted_variables) == 0:
-            self._sorted_variables = sorter.sort_variables_for_computation(
-                sorter.split_variables(self.all_variables),
-            )
-        return self._sorted_variables
+        return list(self.computation_plan.order)
+
+    @property
+    def hoisted_variables(self) -> list[str]:
+        """Return the dynamic variables computed once instead of every timestep.
+
+        These only depend on non-updateable static variables (directly or
+        through other hoisted variables).
+        """
+        return list(self._engine.hoisted)
 
     @property
     def _update_vars(self) -> list[str]:
@@ -462,6 +826,36 @@ class Model(CanRegisterVariable):
             ]
         return self.__non_updateable_static_variables
 
+    @property
+    def dataset(self) -> xr.Dataset:
+        """An xarray.Dataset view of the model state.
+
+        Values live in the NumPy buffers of the model's ArrayEngine; the view is
+        built (without copying) the first time it is read.
+        """
+        return self._engine.dataset
+
+    @dataset.setter
+    def dataset(self, dataset: xr.Dataset) -> None:
+        self._engine = ArrayEngine.from_dataset(
+            dataset,
+            time_dim=self.time_dim,
+            carried_variables=self.state_variables_names +
+            self.updateable_static_variables,
+            plan=self.computation_plan,
+            timestep=self.timestep,
+            backend=self.backend,
+            history_window=self.history_window,
+            output_interval=self.output_interval,
+            zones=self.parameter_zones,
+            threads=self.threads,
+            workers=self.workers,
+            tile_size=self.tile_size,
+            group_options=self.group_options,
+            lookup_tables=self.lookup_tables,
+            batch_arrhenius=self.batch_arrhenius,
+        )
+
     @property
     def track_dynamic_variables(self) -> bool:
         """Track dynamic variables property."""
@@ -473,24 +867,159 @@ class Model(CanRegisterVariable):
             pass
         elif value:
             self._track_dynamic_variables = value
-            self.dataset = self._init_dynamic_arrays(
-                self.dataset,
-            )
+            like: str = self.state_variables_names[0]
+            for var in self.dynamic_variables:
+                self._engine.add_temporal(
+                    var.name,
+                    like=like,
+                    attrs={
+                        'long_name': var.long_name,
+                        'units': var.units,
+                        'description': var.description,
+                    },
+                )
             self.temporal_variables = self.temporal_variables + self.dynamic_variables_names
 
-    def _iter_computations(self):
-        """Iterate over the computation order."""
-        inputs = map(
-            lambda x: utils._prep_inputs(
-                self.timestep_ds,
-                x),
-            self.computation_order
-        )
-        dims = self.timestep_ds.dims
+    @property
+    def sinks(self) -> list[OutputSink]:
+        """The output sinks the model streams output steps to."""
+        return self._engine.sinks
+
+    def add_sink(self, sink: OutputSink) -> None:
+        """Open an output sink and stream all following output steps to it."""
+        self._engine.add_sink(sink, self.timestep)
+
+    @property
+    def forcing(self) -> Optional[Forcing]:
+        """The time series applied to each timestep, if any."""
+        return self._engine.forcing
+
+    def set_forcing(self, forcing: Optional[Forcing]) -> None:
+        """Drive state or updateable static variables with time series.
 
-        for name, func, arrays in inputs:
-            array: np.ndarray = func(*arrays)
-            self.timestep_ds[name] = (dims, array)
+        Each following timestep (from increment_timestep() or run()) applies
+        the forcing interpolated to that timestep, before any
+        update_state_values. Series are validated once, here.
+
+        Args:
+            forcing: The forcing (see clearwater_modules.forcing.Forcing), with
+                one time per model timestep. None removes the forcing.
+        """
+        if forcing is not None:
+            for name in forcing.names:
+                if name not in self._updateable_names:
+                    raise ValueError(
+                        f'Variable {name} cannot be updated between timesteps.',
+                    )
+            if self.zones is not None and self._engine.zones is None:
+                self._engine.zones = ParameterZones(self.zones)
+        self._engine.set_forcing(forcing)
+
+    def _host_array(self, name: str, array: object) -> np.ndarray:
+        """Return a NumPy view of a buffer-protocol object, validating it once."""
+        view: np.ndarray = np.asarray(array)
+        if name in self._engine.dims:
+            shape: tuple[int, ...] = tuple(
+                self._engine.sizes[dim] for dim in self._engine.dims[name]
+            )
+        else:
+            shape = self._engine.grid_shape
+        if view.shape != shape:
+            raise ValueError(
+                f'Array for {name} must have shape {shape}, got {view.shape}.'
+            )
+        if view.dtype.kind != 'f':
+            raise TypeError(
+                f'Array for {name} must have a floating point dtype, got {view.dtype}.'
+            )
+        return view
+
+    def bind_inputs(self, arrays: dict[str, object]) -> None:
+        """Read caller-owned arrays in place at each following timestep.
+
+        This replaces passing the same variables to increment_timestep() as
+        update_state_values: the arrays are validated once, here, and then
+        read without copying at every timestep (after any forcing, before
+        update_state_values), so the caller only updates them in place.
+
+        Args:
+            arrays: A dict with state or updateable static variable names as
+                keys, and NumPy arrays or other buffer-protocol objects (e.g.
+                memoryviews) with the variable's grid shape as values. An
+                empty dict unbinds all inputs.
+        """
+        views: dict[str, np.ndarray] = {}
+        for name, array in arrays.items():
+            if name not in self._updateable_names:
+                raise ValueError(
+                    f'Variable {name} cannot be updated between timesteps.',
+                )
+            views[name] = self._host_array(name, array)
+        self._engine.bind_inputs(views)
+
+    def bind_outputs(self, arrays: dict[str, object]) -> None:
+        """Write each following timestep's values into caller-owned arrays.
+
+        Args:
+            arrays: A dict with state or dynamic variable names as keys, and
+                writeable NumPy arrays or other buffer-protocol objects with the
+                variable's grid shape as values. An empty dict unbinds all
+                outputs.
+        """
+        views: dict[str, np.ndarray] = {}
+        for name, array in arrays.items():
+            if name not in self.state_variables_names + self.dynamic_variables_names:
+                raise ValueError(
+                    f'Output variable {name} must be a state or dynamic variable.'
+                )
+            view: np.ndarray = self._host_array(name, array)
+            if not view.flags.writeable:
+                raise ValueError(f'Array for {name} must be writeable.')
+            views[name] = view
+        self._engine.bind_outputs(views)
+
+    def set_zone_parameter(
+        self,
+        name: str,
+        zone: object,
+        value: object,
+    ) -> None:
+        """Set the value of a per-zone static variable in one zone.
+
+        Only the zone's table entry is updated; the cells of the zone pick up
+        the new value at the next timestep.
+
+        Args:
+            name: The name of a static variable given per zone.
+            zone: The zone id.
+            value: The new value.
+        """
+        self._engine.set_zone_value(name, zone, value)
+
+    def close(self) -> None:
+        """Flush and close all output sinks."""
+        for sink in self._engine.sinks:
+            sink.close()
+
+    def _needs_validation(self, var_name: str) -> bool:
+        """Return whether an update of var_name is checked (see validate)."""
+        if self.validate == 'always':
+            return True
+        return self.validate == 'once' and var_name not in self._validated
+
+    def _validate_update(
+        self,
+        var_name: str,
+        value: xr.DataArray,
+        dims: tuple[str, ...],
+    ) -> None:
+        """Check that a variable can be updated with a DataArray of these dims."""
+        if var_name not in self._updateable_names:
+            raise ValueError(
+                f'Variable {var_name} cannot be updated between timesteps.',
+            )
+        utils.validate_dims(value, dims)
+        self._validated.add(var_name)
 
     def increment_timestep(
         self,
@@ -502,35 +1031,88 @@ class Model(CanRegisterVariable):
         if update_state_values is None:
             update_state_values = {}
 
-        # by default, set current timestep equal to last timestep
-        self.timestep_ds: xr.Dataset = self.dataset.isel(
-            {self.time_dim: self.timestep - 1}
-        )
-
         # update the state variables as necessary (i.e. interacting w/ other models)
+        updates: dict[str, np.ndarray] = {}
         for var_name, value in update_state_values.items():
-            if var_name not in (self.state_variables_names + self.updateable_static_variables):
-                raise ValueError(
-                    f'Variable {var_name} cannot be updated between timesteps, skipping.',
-                )
-            utils.validate_arrays(value, self.timestep_ds[var_name])
-            self.timestep_ds[var_name] = value
+            if self._needs_validation(var_name):
+                self._validate_update(var_name, value, self._engine.dims[var_name])
+            updates[var_name] = value.values
+
+        # compute the dynamic and state variables in order, writing to the buffers
+        self._engine.step(self.timestep, updates)
+        return self.dataset
 
-        # compute the dynamic variables in order
-        self._iter_computations()
+    def run(
+        self,
+        n_steps: int,
+        forcing: Optional[dict[str, xr.DataArray]] = None,
+        sync_steps: Optional[Iterable[int]] = None,
+        callback: Optional[Callable[['Model'], Optional[bool]]] = None,
+    ) -> xr.Dataset:
+        """Advance the model by multiple timesteps in a single call.
+
+        Unlike calling increment_timestep() in a loop, forcing is validated
+        once up front and the steps are run back to back by the engine, which
+        resolves names and output slots once per run (see ArrayEngine.run).
+        The timesteps are still looped over in Python, one executor call per
+        step; use backend='numba' to compile the loops over cells.
+
+        Args:
+            n_steps: The number of timesteps to run.
+            forcing: A dict with state or updateable static variable names as
+                keys, and DataArrays with time_dim as their first dimension
+                (of length n_steps) as values. Slice i is applied before step i,
+                like update_state_values in increment_timestep().
+            sync_steps: Steps of this run (1 to n_steps) after which the engine
+                returns control to `callback`.
+            callback: Called with the model at each sync step. Returning True
+                stops the run early.
 
-        if not self._track_dynamic_variables:
-            self.timestep_ds = self.timestep_ds.drop_vars(
-                self.dynamic_variables_names
+        Returns:
+            The model dataset.
+        """
+        if n_steps < 0:
+            raise ValueError(f'n_steps must not be negative, got {n_steps}.')
+        if self.history_window is None and self.timestep + n_steps >= self.time_steps:
+            raise ValueError(
+                f'Cannot run {n_steps} steps from timestep {self.timestep}, '
+                f'the model only has {self.time_steps - 1} timesteps.'
             )
-        self.timestep_ds = self.timestep_ds.drop_vars(
-            self._non_updateable_static_variables
-        )
 
-        self.dataset[self.temporal_variables].loc[
-            {self.time_dim: self.timestep}
-        ] = self.timestep_ds
-    
+        if forcing is None:
+            forcing = {}
+        arrays: dict[str, np.ndarray] = {}
+        for var_name, value in forcing.items():
+            if self._needs_validation(var_name):
+                self._validate_update(
+                    var_name,
+                    value,
+                    (self.time_dim,) + self._engine.dims[var_name],
+                )
+            if value.sizes[self.time_dim] != n_steps:
+                raise ValueError(
+                    f'Forcing for {var_name} must have {n_steps} values along '
+                    f'{self.time_dim}, got {value.sizes[self.time_dim]}.'
+                )
+            arrays[var_name] = np.ascontiguousarray(value.values)
+
+        sync: set[int] = {
+            step for step in (sync_steps or []) if 0 < step <= n_steps
+        }
+        stops: list[int] = sorted(sync | {n_steps})
+        done: int = 0
+        for stop in stops:
+            self._engine.run(
+                start=self.timestep,
+                n_steps=stop - done,
+                forcing={
+                    name: array[done:stop] for name, array in arrays.items()
+                },
+            )
+            self.timestep += stop - done
+            done = stop
+            if stop in sync and callback is not None and callback(self):
+                break
         return self.dataset
 
 
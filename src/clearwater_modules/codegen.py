@@ -0,0 +1,1088 @@
+"""Fused, cell-wise numba kernels generated from a computation plan.
+
+The default engine calls each process on full-grid arrays, so every dynamic
+variable is materialized as a temporary grid-sized array. The executor in this
+module instead walks the sorted plan and generates source for numba kernels
+that loop over cells once, computing every compilable process for a cell in
+registers and only writing the values that are needed afterwards.
+
+Element-wise selections (xr.where, np.select) are rewritten as scalar
+conditionals before compiling. Processes that numba still cannot compile for
+scalar inputs are run with the regular per-process NumPy path between kernels.
+Kernels are compiled on the first timesteps of a model, which takes a few
+seconds for TSM and around 20 seconds for NSM1.
+
+With workers, the plan is split into dependency levels (see
+sorter.dependency_levels), and the independent processes of each level are
+fused into one kernel per worker and run concurrently on a thread pool. The
+kernels are compiled with nogil, so they run in parallel even on grids too
+small to split cells across threads.
+
+fold_constants() specializes processes for switches resolved when a model is
+constructed (see base.Model._init_plan), for both backends.
+
+When every process of the plan is compiled into a single kernel, the executor
+can also generate a multi-step kernel (see FusedExecutor.multistep_kernel),
+which loops over cells and, for each cell, over the timesteps of a whole run
+(see ArrayEngine.run): state values stay in registers between timesteps, and
+forcing rows and output slots are indexed by timestep inside the kernel.
+"""
+import ast
+import concurrent.futures
+import hashlib
+import inspect
+import linecache
+import textwrap
+import types
+import warnings
+import numba
+import numpy as np
+from numba.core.registry import CPUDispatcher
+from clearwater_modules.plan import ComputationPlan
+from clearwater_modules.shared.types import (
+    Process,
+)
+from typing import (
+    Callable,
+    Optional,
+)
+
+Stage = Callable[[list], None]
+
+_WHERE_FUNCTIONS: tuple[str, ...] = ('xr.where', 'np.where')
+_SELECT_FUNCTIONS: tuple[str, ...] = ('np.select',)
+
+
+class _ScalarRewriter(ast.NodeTransformer):
+    """Rewrites element-wise selections as scalar conditional expressions.
+
+    xr.where(cond, x, y) becomes (x if cond else y), and np.select() with
+    literal condition/choice lists becomes a chain of conditionals, so that
+    compiled processes do not build lists or call array functions per cell.
+    Calls to the warnings module are dropped, as kernels do not emit
+    RuntimeWarnings.
+    """
+
+    def visit_Expr(self, node: ast.Expr) -> Optional[ast.Expr]:
+        is_call: bool = isinstance(node.value, ast.Call)
+        if is_call and ast.unparse(node.value.func).startswith('warnings.'):
+            return None
+        return self.generic_visit(node)
+
+    def visit_FunctionDef(self, node: ast.FunctionDef) -> ast.FunctionDef:
+        node.decorator_list = []
+        self.generic_visit(node)
+        return node
+
+    def visit_Call(self, node: ast.Call) -> ast.AST:
+        self.generic_visit(node)
+        name: str = ast.unparse(node.func)
+        if name in _WHERE_FUNCTIONS and len(node.args) == 3 and not node.keywords:
+            cond, x, y = node.args
+            return ast.copy_location(ast.IfExp(test=cond, body=x, orelse=y), node)
+
+        if name in _SELECT_FUNCTIONS:
+            params: dict[str, ast.expr] = dict(
+                zip(('condlist', 'choicelist', 'default'), node.args)
+            )
+            params.update({kw.arg: kw.value for kw in node.keywords})
+            condlist = params.get('condlist')
+            choicelist = params.get('choicelist')
+            is_literal: bool = (
+                isinstance(condlist, ast.List) and
+                isinstance(choicelist, ast.List) and
+                len(condlist.elts) == len(choicelist.elts)
+            )
+            if is_literal:
+                expr: ast.expr = params.get('default', ast.Constant(0))
+                for cond, choice in reversed(list(zip(condlist.elts, choicelist.elts))):
+                    expr = ast.IfExp(test=cond, body=choice, orelse=expr)
+                return ast.copy_location(expr, node)
+        return node
+
+
+def scalar_function(func: types.FunctionType) -> types.FunctionType:
+    """Return a copy of a process with element-wise selections made scalar.
+
+    The function is returned unchanged if its source is not available.
+    """
+    if func.__closure__:
+        return func
+    try:
+        source: str = textwrap.dedent(inspect.getsource(func))
+        lineno: int = func.__code__.co_firstlineno
+    except (OSError, TypeError):
+        return func
+    tree: ast.Module = ast.parse(source)
+    ast.increment_lineno(tree, lineno - 1)
+    tree = ast.fix_missing_locations(_ScalarRewriter().visit(tree))
+    namespace: dict = {}
+    exec(compile(tree, func.__code__.co_filename, 'exec'), func.__globals__, namespace)
+    return namespace[func.__name__]
+
+
+_FOLDABLE_NODES: tuple[type, ...] = (
+    ast.BoolOp,
+    ast.BinOp,
+    ast.UnaryOp,
+    ast.Compare,
+    ast.Name,
+    ast.Constant,
+    ast.expr_context,
+    ast.boolop,
+    ast.operator,
+    ast.unaryop,
+    ast.cmpop,
+)
+
+
+class _ConstantFolder(ast.NodeTransformer):
+    """Resolves element-wise selections whose conditions only use constants.
+
+    xr.where(cond, x, y) becomes x or y, and false conditions are removed from
+    np.select() (which becomes its first choice if that condition is true, or
+    its default if no condition is left). Constant operands that do not change
+    the other conditions are removed from them. Conditions are evaluated on
+    NumPy scalars, so that e.g. ~use_NH4 behaves as it does on boolean arrays.
+    """
+
+    def __init__(self, constants: dict[str, object]) -> None:
+        self.namespace: dict = {
+            name: np.asarray(value)[()] for name, value in constants.items()
+        }
+        self.changed: bool = False
+
+    def evaluate(self, node: ast.expr) -> tuple[bool, object]:
+        """Return (True, value) if an expression only depends on constants.
+
+        A conjunction with a false operand (or a disjunction with a true one)
+        is known even if its other operands are not.
+        """
+        is_constant: bool = all(
+            isinstance(child, _FOLDABLE_NODES) and (
+                not isinstance(child, ast.Name) or child.id in self.namespace
+            )
+            for child in ast.walk(node)
+        )
+        if is_constant:
+            expression = ast.fix_missing_locations(ast.Expression(body=node))
+            code = compile(expression, '<constant>', 'eval')
+            return True, eval(code, {}, dict(self.namespace))
+
+        operands: list[ast.expr] = []
+        if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.BitAnd, ast.BitOr)):
+            operands = [node.left, node.right]
+            is_and: bool = isinstance(node.op, ast.BitAnd)
+        elif isinstance(node, ast.BoolOp):
+            operands = node.values
+            is_and = isinstance(node.op, ast.And)
+        for operand in operands:
+            known, value = self.evaluate(operand)
+            if known and bool(value) != is_and:
+                return True, not is_and
+        return False, None
+
+    def simplify(self, node: ast.expr) -> ast.expr:
+        """Remove the constant operands that do not change a condition.
+
+        E.g. (option == 5) & (depth < 0.61) becomes depth < 0.61 for option 5,
+        so that the condition no longer depends on the option.
+        """
+        if not isinstance(node, ast.BinOp) or not isinstance(node.op, (ast.BitAnd, ast.BitOr)):
+            return node
+        is_and: bool = isinstance(node.op, ast.BitAnd)
+        node.left = self.simplify(node.left)
+        node.right = self.simplify(node.right)
+        for operand, other in ((node.left, node.right), (node.right, node.left)):
+            # only boolean operands are kept as they are by & and |
+            if not isinstance(other, (ast.Compare, ast.BinOp)):
+                continue
+            known, value = self.evaluate(operand)
+            if known and np.ndim(value) == 0 and bool(value) == is_and:
+                self.changed = True
+                return other
+        return node
+
+    def visit_Call(self, node: ast.Call) -> ast.AST:
+        self.generic_visit(node)
+        name: str = ast.unparse(node.func)
+        if name in _WHERE_FUNCTIONS and len(node.args) == 3 and not node.keywords:
+            cond, x, y = node.args
+            known, value = self.evaluate(cond)
+            if known and np.ndim(value) == 0:
+                self.changed = True
+                return x if value else y
+            node.args[0] = self.simplify(cond)
+
+        if name in _SELECT_FUNCTIONS:
+            params: dict[str, ast.expr] = dict(
+                zip(('condlist', 'choicelist', 'default'), node.args)
+            )
+            params.update({kw.arg: kw.value for kw in node.keywords})
+            condlist = params.get('condlist')
+            choicelist = params.get('choicelist')
+            is_literal: bool = (
+                isinstance(condlist, ast.List) and
+                isinstance(choicelist, ast.List) and
+                len(condlist.elts) == len(choicelist.elts)
+            )
+            if not is_literal:
+                return node
+            pairs: list[tuple[ast.expr, ast.expr]] = []
+            for cond, choice in zip(condlist.elts, choicelist.elts):
+                known, value = self.evaluate(cond)
+                if not known or np.ndim(value) != 0:
+                    pairs.append((self.simplify(cond), choice))
+                elif value:
+                    if not pairs:
+                        self.changed = True
+                        return choice
+                    pairs.append((ast.Constant(True), choice))
+                    break
+            if len(pairs) != len(condlist.elts):
+                self.changed = True
+                if not pairs:
+                    return params.get('default', ast.Constant(0))
+            condlist.elts = [cond for cond, _ in pairs]
+            choicelist.elts = [choice for _, choice in pairs]
+        return node
+
+
+def fold_constants(
+    process: Process,
+    constants: dict[str, object],
+) -> Process:
+    """Return a process specialized for constant (scalar) argument values.
+
+    Selections on the constants are resolved at build time (see
+    _ConstantFolder), and arguments that are no longer used are removed from
+    the process signature, so that the plan no longer depends on them. The
+    process is returned unchanged if nothing can be folded, or if its source
+    is not available.
+    """
+    func: Optional[types.FunctionType] = _python_function(process)
+    if func is None or func.__closure__:
+        return process
+    args: list[str] = [
+        name for name in func.__annotations__ if name != 'return'
+    ]
+    constants = {name: value for name, value in constants.items() if name in args}
+    if not constants:
+        return process
+    try:
+        source: str = textwrap.dedent(inspect.getsource(func))
+    except (OSError, TypeError):
+        return process
+
+    tree: ast.Module = ast.parse(source)
+    function: ast.FunctionDef = tree.body[0]
+    assigned: set[str] = {
+        node.id for node in ast.walk(function)
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store)
+    }
+    folder = _ConstantFolder({
+        name: value for name, value in constants.items() if name not in assigned
+    })
+    function.body = [folder.visit(statement) for statement in function.body]
+    if not folder.changed:
+        return process
+
+    used: set[str] = {
+        node.id for statement in function.body for node in ast.walk(statement)
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load)
+    }
+    function.args.args = [arg for arg in function.args.args if arg.arg in used]
+    source = ast.unparse(ast.fix_missing_locations(tree)) + '\n'
+
+    # register the source, so that the folded process can still be compiled
+    digest: str = hashlib.sha1(source.encode()).hexdigest()[:12]
+    filename: str = f'<folded {func.__module__}.{func.__qualname__} {digest}>'
+    linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+    namespace: dict = {}
+    exec(compile(source, filename, 'exec'), func.__globals__, namespace)
+    return namespace[function.name]
+
+
+_OUT_OPERATORS: dict[type, str] = {
+    ast.Add: 'add',
+    ast.Sub: 'subtract',
+    ast.Mult: 'multiply',
+    ast.Div: 'true_divide',
+    ast.FloorDiv: 'floor_divide',
+    ast.Mod: 'remainder',
+    ast.Pow: 'power',
+}
+_OUT_NUMPY: str = '__out_numpy'
+
+
+def _out_ufunc_call(node: ast.expr) -> Optional[ast.Call]:
+    """Return the outermost operation of an expression as a ufunc call with out=."""
+    out: ast.keyword = ast.keyword(arg='out', value=ast.Name(id='out', ctx=ast.Load()))
+    numpy: ast.Name = ast.Name(id=_OUT_NUMPY, ctx=ast.Load())
+    if isinstance(node, ast.BinOp) and type(node.op) in _OUT_OPERATORS:
+        ufunc: str = _OUT_OPERATORS[type(node.op)]
+        args: list[ast.expr] = [node.left, node.right]
+    elif isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        ufunc, args = 'negative', [node.operand]
+    elif (
+        isinstance(node, ast.Call) and not node.keywords and
+        isinstance(node.func, ast.Attribute) and
+        ast.unparse(node.func.value) == 'np' and
+        isinstance(getattr(np, node.func.attr, None), np.ufunc) and
+        getattr(np, node.func.attr).nout == 1 and
+        not any(isinstance(arg, ast.Starred) for arg in node.args)
+    ):
+        ufunc, args = node.func.attr, node.args
+    else:
+        return None
+    return ast.Call(
+        func=ast.Attribute(value=numpy, attr=ufunc, ctx=ast.Load()),
+        args=args,
+        keywords=[out],
+    )
+
+
+def out_function(process: Process) -> Optional[types.FunctionType]:
+    """Return a NumPy variant of a process writing its result into `out`.
+
+    The variant takes the process arguments followed by `out`, a preallocated
+    array of the result's shape and dtype, and evaluates the process's final
+    operation as a ufunc with out=out, so the result is not allocated. Only
+    processes with a single return statement, at their end, whose value is an
+    arithmetic operation or a NumPy ufunc call, have a variant; None is
+    returned for the others. The process itself is left unchanged for the
+    numba backend, which cannot compile an out argument for scalars.
+    """
+    func: Optional[types.FunctionType] = _python_function(process)
+    if func is None or func.__closure__:
+        return None
+    try:
+        source: str = textwrap.dedent(inspect.getsource(func))
+    except (OSError, TypeError):
+        return None
+
+    tree: ast.Module = ast.parse(source)
+    function = tree.body[0]
+    if not isinstance(function, ast.FunctionDef):
+        return None
+    signature: ast.arguments = function.args
+    if signature.defaults or signature.kwonlyargs or signature.vararg or signature.kwarg:
+        return None
+    returns: list[ast.Return] = [
+        node for node in ast.walk(function) if isinstance(node, ast.Return)
+    ]
+    last = function.body[-1]
+    if len(returns) != 1 or returns[0] is not last or last.value is None:
+        return None
+    call: Optional[ast.Call] = _out_ufunc_call(last.value)
+    if call is None:
+        return None
+    last.value = call
+    function.decorator_list = []
+    function.args.args.append(ast.arg(arg='out'))
+    source = ast.unparse(ast.fix_missing_locations(tree)) + '\n'
+
+    digest: str = hashlib.sha1(source.encode()).hexdigest()[:12]
+    filename: str = f'<out {func.__module__}.{func.__qualname__} {digest}>'
+    linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+    namespace: dict = {}
+    exec(
+        compile(source, filename, 'exec'),
+        {**func.__globals__, _OUT_NUMPY: np},
+        namespace,
+    )
+    return namespace[function.name]
+
+
+def _python_function(process: Process) -> Optional[types.FunctionType]:
+    func = getattr(process, 'py_func', process)
+    if isinstance(func, types.FunctionType):
+        return func
+    return None
+
+
+def jit_process(
+    process: Process,
+    cache: Optional[dict] = None,
+) -> Optional[CPUDispatcher]:
+    """Return a scalar-friendly numba dispatcher for a process.
+
+    Plain Python helper functions called by the process (from its own module,
+    or other numba functions) are jitted as well, so that e.g. processes built
+    on arrhenius_correction() can be compiled, and element-wise selections
+    are rewritten with scalar_function(). NumPy's error model is used so that
+    division by zero gives inf/nan instead of raising.
+    """
+    if cache is None:
+        cache = {}
+    func: Optional[types.FunctionType] = _python_function(process)
+    if func is None:
+        return None
+    if func in cache:
+        return cache[func]
+    cache[func] = None  # guards against recursion
+
+    func_globals: dict = dict(func.__globals__)
+    for name in func.__code__.co_names:
+        obj = func_globals.get(name)
+        is_helper: bool = isinstance(obj, CPUDispatcher) or (
+            isinstance(obj, types.FunctionType) and
+            obj.__module__ == func.__module__
+        )
+        if is_helper:
+            jitted = jit_process(obj, cache)
+            if jitted is not None:
+                func_globals[name] = jitted
+
+    scalar: types.FunctionType = scalar_function(func)
+    rebound = types.FunctionType(
+        scalar.__code__,
+        func_globals,
+        scalar.__name__,
+        scalar.__defaults__,
+        scalar.__closure__,
+    )
+    dispatcher: CPUDispatcher = numba.njit(error_model='numpy')(rebound)
+    cache[func] = dispatcher
+    return dispatcher
+
+
+def compile_scalar(
+    dispatcher: CPUDispatcher,
+    arg_types: tuple,
+) -> Optional[numba.types.Type]:
+    """Compile a dispatcher for scalar arguments, returning its scalar return type.
+
+    Returns None if the process cannot be compiled or does not return a scalar.
+    """
+    try:
+        dispatcher.compile(arg_types)
+    except Exception:
+        return None
+    return_type = dispatcher.overloads[arg_types].signature.return_type
+    if not isinstance(return_type, (numba.types.Number, numba.types.Boolean)):
+        return None
+    return return_type
+
+
+def _flat(array, size: int) -> np.ndarray:
+    array = np.asarray(array)
+    if array.size == size:
+        return array.reshape(-1)
+    if array.size == 1:
+        return np.broadcast_to(array.reshape(1), (size,))
+    raise ValueError(
+        f'Cannot broadcast an array of shape {array.shape} to {size} cells.'
+    )
+
+
+class KernelStage:
+    """A generated numba kernel computing a run of processes cell by cell.
+
+    Attributes:
+        source: The generated Python source of the kernel.
+        names: Names of the variables computed by the kernel.
+        in_slots: Plan slots read by the kernel.
+        out_slots: Plan slots written back (those needed after the kernel).
+        threads: The number of threads of a parallel kernel (None for all).
+    """
+
+    def __init__(
+        self,
+        source: str,
+        kernel: CPUDispatcher,
+        names: list[str],
+        in_slots: list[int],
+        out_slots: list[int],
+        out_dtypes: list[np.dtype],
+        shape: tuple[int, ...],
+        threads: Optional[int] = None,
+    ) -> None:
+        self.source = source
+        self.kernel = kernel
+        self.names = names
+        self.in_slots = in_slots
+        self.out_slots = out_slots
+        self.out_dtypes = out_dtypes
+        self.shape = shape
+        self.size = int(np.prod(shape))
+        self.threads = threads
+
+    def __call__(self, values: list) -> None:
+        size: int = self.size
+        if self.threads is not None:
+            numba.set_num_threads(self.threads)
+        inputs = [_flat(values[slot], size) for slot in self.in_slots]
+        outputs = [np.empty(size, dtype=dtype) for dtype in self.out_dtypes]
+        self.kernel(size, *inputs, *outputs)
+        for slot, output in zip(self.out_slots, outputs):
+            values[slot] = output.reshape(self.shape)
+
+
+class MultiStepKernel:
+    """A generated numba kernel computing several timesteps cell by cell.
+
+    Attributes:
+        source: The generated Python source of the kernel.
+        in_slots: Plan slots read by the kernel that do not change during a run.
+        carried_slots: Slots carried from one timestep to the next (state and
+            updateable static variables), updated in place.
+        forced_slots: Carried slots set from a forcing row before each timestep.
+        series_slots: Slots written to the output buffers at output timesteps.
+        final_slots: Other slots whose values at the last timestep are kept.
+        threads: The number of threads of a parallel kernel (None for all).
+    """
+
+    def __init__(
+        self,
+        source: str,
+        kernel: CPUDispatcher,
+        in_slots: list[int],
+        carried_slots: list[int],
+        carried_dtypes: list[np.dtype],
+        forced_slots: list[int],
+        series_slots: list[int],
+        final_slots: list[int],
+        final_dtypes: list[np.dtype],
+        shape: tuple[int, ...],
+        threads: Optional[int] = None,
+    ) -> None:
+        self.source = source
+        self.kernel = kernel
+        self.in_slots = in_slots
+        self.carried_slots = carried_slots
+        self.carried_dtypes = carried_dtypes
+        self.forced_slots = forced_slots
+        self.series_slots = series_slots
+        self.final_slots = final_slots
+        self.final_dtypes = final_dtypes
+        self.shape = shape
+        self.size = int(np.prod(shape))
+        self.threads = threads
+
+    def __call__(
+        self,
+        values: list,
+        forced: list[np.ndarray],
+        series: list[np.ndarray],
+        rows: np.ndarray,
+    ) -> None:
+        """Compute len(rows) timesteps, leaving the last one in `values`.
+
+        Args:
+            values: The slot values before the first timestep.
+            forced: Arrays of shape (timesteps, cells) for forced_slots.
+            series: Output buffers of shape (slots, cells) for series_slots.
+            rows: The output buffer slots of each timestep, (timesteps, k)
+                with -1 where a timestep is not written.
+        """
+        size: int = self.size
+        if self.threads is not None:
+            numba.set_num_threads(self.threads)
+        inputs = [_flat(values[slot], size) for slot in self.in_slots]
+        carried = [
+            np.array(_flat(values[slot], size), dtype=dtype)
+            for slot, dtype in zip(self.carried_slots, self.carried_dtypes)
+        ]
+        finals = [np.empty(size, dtype=dtype) for dtype in self.final_dtypes]
+        self.kernel(size, len(rows), rows, *inputs, *carried, *forced, *series, *finals)
+        for slot, array in zip(self.carried_slots + self.final_slots, carried + finals):
+            values[slot] = array.reshape(self.shape)
+
+
+class ProcessStage:
+    """A single process run on full-grid arrays (the NumPy fallback)."""
+
+    def __init__(self, out: int, func: Process, args: tuple[int, ...]) -> None:
+        self.out = out
+        self.func = func
+        self.args = args
+
+    def __call__(self, values: list) -> None:
+        values[self.out] = self.func(*[values[i] for i in self.args])
+
+
+class LevelStage:
+    """Independent stages of one dependency level, run concurrently.
+
+    The first stage runs on the calling thread, the others on the pool (or
+    one after the other without a pool). Stages write distinct slots, so they
+    do not need to be synchronized.
+    """
+
+    def __init__(
+        self,
+        stages: list[Stage],
+        pool: Optional[concurrent.futures.ThreadPoolExecutor] = None,
+    ) -> None:
+        self.stages = stages
+        self.pool = pool
+
+    def __call__(self, values: list) -> None:
+        if self.pool is None:
+            for stage in self.stages:
+                stage(values)
+            return
+        futures: list[concurrent.futures.Future] = [
+            self.pool.submit(stage, values) for stage in self.stages[1:]
+        ]
+        self.stages[0](values)
+        for future in futures:
+            future.result()
+
+
+def _thread_pool(workers: Optional[int]) -> Optional[concurrent.futures.ThreadPoolExecutor]:
+    """Return a pool for the workers besides the calling thread, if any."""
+    if workers is not None and (not isinstance(workers, int) or workers < 1):
+        raise ValueError(f'workers must be a positive integer, got {workers}.')
+    if workers is None or workers == 1:
+        return None
+    return concurrent.futures.ThreadPoolExecutor(
+        max_workers=workers - 1,
+        thread_name_prefix='clearwater_level',
+    )
+
+
+class LevelExecutor:
+    """Runs plan steps level by level, with processes on full-grid arrays.
+
+    The NumPy backend counterpart of FusedExecutor(workers=...): NumPy
+    releases the GIL in its array loops, so the processes of a level overlap.
+
+    Attributes:
+        plan: The computation plan being executed.
+        steps: The plan steps to run (defaults to all of plan.steps).
+        workers: The number of threads running each level.
+        stages: A stage per dependency level.
+    """
+
+    def __init__(
+        self,
+        plan: ComputationPlan,
+        workers: int,
+        steps: Optional[tuple[tuple[int, Process, tuple[int, ...]], ...]] = None,
+    ) -> None:
+        self.plan = plan
+        self.steps = plan.steps if steps is None else steps
+        self.workers = workers
+        self._pool = _thread_pool(workers)
+        self.stages: list[Stage] = []
+        for level in plan.levels(self.steps):
+            stages: list[Stage] = [ProcessStage(*step) for step in level]
+            self.stages.append(
+                stages[0] if len(stages) == 1 else LevelStage(stages, self._pool)
+            )
+
+    def __call__(self, values: list) -> None:
+        for stage in self.stages:
+            stage(values)
+
+
+def generate_kernel_source(
+    name: str,
+    steps: list[tuple[int, str, tuple[int, ...]]],
+    in_slots: list[int],
+    out_slots: list[int],
+    loop: str = 'range',
+) -> str:
+    """Generate the source of a kernel looping once over all cells.
+
+    Args:
+        name: The name of the generated function.
+        steps: (output slot, process global name, argument slots) to compute.
+        in_slots: Slots loaded from input arrays at the start of each cell.
+        out_slots: Slots stored to output arrays at the end of each cell.
+        loop: The loop iterator, e.g. 'range' or 'numba.prange'.
+    """
+    params: list[str] = (
+        ['n'] +
+        [f'in_{slot}' for slot in in_slots] +
+        [f'out_{slot}' for slot in out_slots]
+    )
+    lines: list[str] = [
+        f'def {name}({", ".join(params)}):',
+        f'    for i in {loop}(n):',
+    ]
+    for slot in in_slots:
+        lines.append(f'        v_{slot} = in_{slot}[i]')
+    for out, func_name, args in steps:
+        lines.append(
+            f'        v_{out} = {func_name}({", ".join(f"v_{a}" for a in args)})'
+        )
+    for slot in out_slots:
+        lines.append(f'        out_{slot}[i] = v_{slot}')
+    return '\n'.join(lines) + '\n'
+
+
+def generate_multistep_source(
+    name: str,
+    steps: list[tuple[int, str, tuple[int, ...]]],
+    in_slots: list[int],
+    carried_slots: list[int],
+    forced_slots: list[int],
+    series_slots: list[int],
+    final_slots: list[int],
+    loop: str = 'range',
+) -> str:
+    """Generate the source of a kernel looping over cells, then over timesteps.
+
+    Args:
+        name: The name of the generated function.
+        steps: (output slot, process global name, argument slots) to compute
+            at each timestep.
+        in_slots: Slots loaded from input arrays once per cell.
+        carried_slots: Slots loaded from and stored back to state arrays once
+            per cell, and carried between timesteps.
+        forced_slots: Carried slots loaded from forcing rows at each timestep.
+        series_slots: Slots stored to the output buffer rows of each timestep.
+        final_slots: Slots stored to output arrays after the last timestep.
+        loop: The cell loop iterator, e.g. 'range' or 'numba.prange'.
+    """
+    params: list[str] = (
+        ['n', 'n_steps', 'rows'] +
+        [f'in_{slot}' for slot in in_slots] +
+        [f'state_{slot}' for slot in carried_slots] +
+        [f'forced_{slot}' for slot in forced_slots] +
+        [f'series_{slot}' for slot in series_slots] +
+        [f'out_{slot}' for slot in final_slots]
+    )
+    lines: list[str] = [
+        f'def {name}({", ".join(params)}):',
+        f'    for i in {loop}(n):',
+    ]
+    for slot in in_slots:
+        lines.append(f'        v_{slot} = in_{slot}[i]')
+    for slot in carried_slots:
+        lines.append(f'        v_{slot} = state_{slot}[i]')
+    lines.append('        for t in range(n_steps):')
+    for slot in forced_slots:
+        lines.append(f'            v_{slot} = forced_{slot}[t, i]')
+    for out, func_name, args in steps:
+        lines.append(
+            f'            v_{out} = {func_name}({", ".join(f"v_{a}" for a in args)})'
+        )
+    if series_slots:
+        lines += [
+            '            for k in range(rows.shape[1]):',
+            '                row = rows[t, k]',
+            '                if row >= 0:',
+        ]
+        for slot in series_slots:
+            lines.append(f'                    series_{slot}[row, i] = v_{slot}')
+    for slot in carried_slots:
+        lines.append(f'        state_{slot}[i] = v_{slot}')
+    for slot in final_slots:
+        lines.append(f'        out_{slot}[i] = v_{slot}')
+    return '\n'.join(lines) + '\n'
+
+
+class FusedExecutor:
+    """Runs a plan as fused numba kernels with a per-process NumPy fallback.
+
+    The executor is built on its first call: that timestep is computed with
+    the per-process path, and the dtypes it produces are used to compile each
+    process for scalar inputs. Consecutive compilable processes are fused into
+    a single generated kernel.
+
+    Attributes:
+        plan: The computation plan being executed.
+        needed_slots: Slots that must be materialized as arrays after the step
+            (e.g. state and tracked variables).
+        shape: The shape of the model grid.
+        steps: The plan steps to run (defaults to all of plan.steps).
+        parallel: If True, kernels split cells across threads (numba.prange).
+            Cells are independent, so results do not depend on the threads.
+        threads: The number of threads of parallel kernels, defaults to
+            numba's thread count.
+        workers: If set, the processes of each dependency level are split
+            between this many kernels, run concurrently on a thread pool.
+        stages: The kernel and fallback stages, once built.
+        fallback: Names of the variables computed with the NumPy fallback.
+        fused: The compiled (output slot, dispatcher, argument slots) of every
+            step, if they are all computed by a single kernel (no fallback
+            and no workers), which multi-step kernels are generated from.
+    """
+
+    def __init__(
+        self,
+        plan: ComputationPlan,
+        needed_slots: set[int],
+        shape: tuple[int, ...],
+        parallel: bool = False,
+        steps: Optional[tuple[tuple[int, Process, tuple[int, ...]], ...]] = None,
+        threads: Optional[int] = None,
+        workers: Optional[int] = None,
+    ) -> None:
+        if threads is not None and not 1 <= threads <= numba.config.NUMBA_NUM_THREADS:
+            raise ValueError(
+                f'threads must be between 1 and {numba.config.NUMBA_NUM_THREADS} '
+                f'(NUMBA_NUM_THREADS), got {threads}.'
+            )
+        if workers is not None and parallel:
+            raise ValueError('workers cannot be combined with parallel kernels.')
+        self.plan = plan
+        self.needed_slots = set(needed_slots)
+        self.shape = shape
+        self.steps = plan.steps if steps is None else steps
+        self.parallel = parallel
+        self.threads = threads
+        self.workers = workers
+        self._pool = _thread_pool(workers)
+        self.stages: Optional[list[Stage]] = None
+        self.fallback: list[str] = []
+        self.fused: Optional[list[tuple[int, CPUDispatcher, tuple[int, ...]]]] = None
+        self._dtypes: dict[int, np.dtype] = {}
+        self._multistep: dict[tuple, MultiStepKernel] = {}
+
+    @property
+    def kernels(self) -> list[KernelStage]:
+        """The generated kernel stages."""
+        stages: list[Stage] = []
+        for stage in self.stages or []:
+            stages.extend(stage.stages if isinstance(stage, LevelStage) else [stage])
+        return [s for s in stages if isinstance(s, KernelStage)]
+
+    def __call__(self, values: list) -> None:
+        if self.stages is None:
+            for out, func, args in self.steps:
+                values[out] = func(*[values[i] for i in args])
+            self.stages = self.build(values)
+            return
+        for stage in self.stages:
+            stage(values)
+
+    def build(self, values: list) -> list[Stage]:
+        """Compile the plan, using `values` (a computed timestep) for dtypes."""
+        jit_cache: dict = {}
+        self.fallback = []
+        self.fused = None
+        self._multistep = {}
+
+        # scalar type of each slot, as seen by compiled processes
+        scalar_types: dict[int, numba.types.Type] = {}
+
+        def scalar_type(slot: int) -> numba.types.Type:
+            if slot not in scalar_types:
+                scalar_types[slot] = numba.from_dtype(np.asarray(values[slot]).dtype)
+            return scalar_types[slot]
+
+        def compile_step(out: int, func: Process, args: tuple[int, ...]) -> Optional[CPUDispatcher]:
+            compiled: Optional[CPUDispatcher] = None
+            try:
+                arg_types = tuple(scalar_type(a) for a in args)
+                dispatcher = jit_process(func, jit_cache)
+            except (NotImplementedError, numba.core.errors.NumbaError):
+                dispatcher = None
+            if dispatcher is not None:
+                return_type = compile_scalar(dispatcher, arg_types)
+                if return_type is not None:
+                    compiled = dispatcher
+                    scalar_types[out] = return_type
+            if compiled is None:
+                scalar_types.pop(out, None)
+                self.fallback.append(self.plan.names[out])
+            return compiled
+
+        # group compilable processes into segments, run one level at a time
+        levels: list[list[list[tuple[int, Process, tuple[int, ...]]] | ProcessStage]] = []
+        if self.workers is None:
+            # consecutive compilable processes are fused, levels are sequential
+            for out, func, args in self.steps:
+                compiled = compile_step(out, func, args)
+                if compiled is None:
+                    levels.append([ProcessStage(out, func, args)])
+                elif levels and isinstance(levels[-1][0], list):
+                    levels[-1][0].append((out, compiled, args))
+                else:
+                    levels.append([[(out, compiled, args)]])
+        else:
+            # independent processes are split between one kernel per worker
+            for level in self.plan.levels(self.steps):
+                fallback: list[ProcessStage] = []
+                compiled_steps: list[tuple[int, CPUDispatcher, tuple[int, ...]]] = []
+                for out, func, args in level:
+                    compiled = compile_step(out, func, args)
+                    if compiled is None:
+                        fallback.append(ProcessStage(out, func, args))
+                    else:
+                        compiled_steps.append((out, compiled, args))
+                n_groups: int = min(self.workers, len(compiled_steps))
+                levels.append([
+                    compiled_steps[i::n_groups] for i in range(n_groups)
+                ] + fallback)
+
+        # slots read by a later level must be written back to arrays
+        read_after: list[set[int]] = [set() for _ in levels]
+        later_reads: set[int] = set(self.needed_slots)
+        for i in range(len(levels) - 1, -1, -1):
+            read_after[i] = set(later_reads)
+            for segment in levels[i]:
+                steps = [(segment.out, None, segment.args)] if isinstance(
+                    segment, ProcessStage) else segment
+                for _, _, args in steps:
+                    later_reads.update(args)
+
+        self._dtypes = {
+            slot: np.dtype(str(scalar_type)) for slot, scalar_type in scalar_types.items()
+        }
+        if self.workers is None and len(levels) == 1 and isinstance(levels[0][0], list):
+            self.fused = levels[0][0]
+
+        stages: list[Stage] = []
+        n_kernels: int = 0
+        for i, level in enumerate(levels):
+            level_stages: list[Stage] = []
+            for segment in level:
+                if isinstance(segment, ProcessStage):
+                    level_stages.append(segment)
+                    continue
+                dtypes: dict[int, np.dtype] = {
+                    out: np.dtype(str(scalar_types[out])) for out, _, _ in segment
+                }
+                level_stages.append(
+                    self._build_kernel(n_kernels, segment, read_after[i], dtypes)
+                )
+                n_kernels += 1
+            if len(level_stages) == 1:
+                stages.extend(level_stages)
+            else:
+                stages.append(LevelStage(level_stages, self._pool))
+        return stages
+
+    def multistep_kernel(
+        self,
+        carried_slots: list[int],
+        forced_slots: list[int],
+        series_slots: list[int],
+        final_slots: list[int],
+    ) -> Optional[MultiStepKernel]:
+        """Return a kernel computing several timesteps per cell, if possible.
+
+        Only plans compiled into a single kernel (see FusedExecutor.fused)
+        can be run this way. Kernels are generated once for each set of slots.
+
+        Args:
+            carried_slots: Slots carried between timesteps.
+            forced_slots: Carried slots set from forcing rows at each timestep.
+            series_slots: Slots written to the output buffers.
+            final_slots: Slots whose values are kept after the last timestep.
+        """
+        if self.fused is None:
+            return None
+        key: tuple = (
+            tuple(carried_slots), tuple(forced_slots), tuple(series_slots), tuple(final_slots),
+        )
+        if key not in self._multistep:
+            self._multistep[key] = self._build_multistep_kernel(*key)
+        return self._multistep[key]
+
+    def _build_multistep_kernel(
+        self,
+        carried_slots: tuple[int, ...],
+        forced_slots: tuple[int, ...],
+        series_slots: tuple[int, ...],
+        final_slots: tuple[int, ...],
+    ) -> MultiStepKernel:
+        namespace: dict = {'numba': numba}
+        steps: list[tuple[int, str, tuple[int, ...]]] = []
+        for out, dispatcher, args in self.fused:
+            func_name: str = f'p_{self.plan.names[out]}'
+            namespace[func_name] = dispatcher
+            steps.append((out, func_name, args))
+
+        # values that do not change during a run are loaded once per cell
+        defined: set[int] = set(carried_slots) | {out for out, _, _ in steps}
+        in_slots: list[int] = []
+        read: list[int] = [
+            *(arg for _, _, args in steps for arg in args),
+            *series_slots,
+            *final_slots,
+        ]
+        for slot in read:
+            if slot not in defined and slot not in in_slots:
+                in_slots.append(slot)
+
+        name: str = 'multistep_kernel'
+        source: str = generate_multistep_source(
+            name,
+            steps,
+            in_slots,
+            list(carried_slots),
+            list(forced_slots),
+            list(series_slots),
+            list(final_slots),
+            loop='numba.prange' if self.parallel else 'range',
+        )
+        exec(compile(source, f'<{name}>', 'exec'), namespace)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', numba.NumbaPerformanceWarning)
+            kernel: CPUDispatcher = numba.njit(
+                error_model='numpy',
+                parallel=self.parallel,
+                nogil=True,
+            )(namespace[name])
+        return MultiStepKernel(
+            source=source,
+            kernel=kernel,
+            in_slots=in_slots,
+            carried_slots=list(carried_slots),
+            carried_dtypes=[
+                self._dtypes.get(slot, np.dtype(np.float64)) for slot in carried_slots
+            ],
+            forced_slots=list(forced_slots),
+            series_slots=list(series_slots),
+            final_slots=list(final_slots),
+            final_dtypes=[self._dtypes[slot] for slot in final_slots],
+            shape=self.shape,
+            threads=self.threads if self.parallel else None,
+        )
+
+    def _build_kernel(
+        self,
+        index: int,
+        segment: list[tuple[int, CPUDispatcher, tuple[int, ...]]],
+        read_after: set[int],
+        dtypes: dict[int, np.dtype],
+    ) -> KernelStage:
+        written: set[int] = set()
+        in_slots: list[int] = []
+        namespace: dict = {'numba': numba}
+        steps: list[tuple[int, str, tuple[int, ...]]] = []
+        for out, dispatcher, args in segment:
+            for arg in args:
+                if arg not in written and arg not in in_slots:
+                    in_slots.append(arg)
+            func_name: str = f'p_{self.plan.names[out]}'
+            namespace[func_name] = dispatcher
+            steps.append((out, func_name, args))
+            written.add(out)
+        out_slots: list[int] = [
+            out for out, _, _ in segment if out in read_after
+        ]
+
+        name: str = f'fused_kernel_{index}'
+        source: str = generate_kernel_source(
+            name,
+            steps,
+            in_slots,
+            out_slots,
+            loop='numba.prange' if self.parallel else 'range',
+        )
+        exec(compile(source, f'<{name}>', 'exec'), namespace)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', numba.NumbaPerformanceWarning)
+            kernel: CPUDispatcher = numba.njit(
+                error_model='numpy',
+                parallel=self.parallel,
+                nogil=True,
+            )(namespace[name])
+        return KernelStage(
+            source=source,
+            kernel=kernel,
+            names=[self.plan.names[out] for out, _, _ in segment],
+            in_slots=in_slots,
+            out_slots=out_slots,
+            out_dtypes=[dtypes[slot] for slot in out_slots],
+            shape=self.shape,
+            threads=self.threads if self.parallel else None,
+        )
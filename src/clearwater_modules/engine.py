@@ -0,0 +1,821 @@
+"""Array-backed execution engine used by base.Model.
+
+All state, static and (tracked) dynamic variables are held in preallocated,
+contiguous NumPy buffers, and the computation order is run directly against
+them. An xarray.Dataset view of the buffers is only built when it is read.
+
+Static variables that have the same value in every cell are stored as 0-d
+arrays, which NumPy broadcasts where a process combines them with grid arrays
+(and the dataset view broadcasts without copying). Zoned parameters (see
+zones.py) are gathered from their per-zone tables.
+"""
+import numpy as np
+import xarray as xr
+from clearwater_modules.arena import ArenaExecutor
+from clearwater_modules.arrhenius import (
+    ArrheniusStage,
+    batch_arrhenius_steps,
+)
+from clearwater_modules.codegen import (
+    FusedExecutor,
+    LevelExecutor,
+    MultiStepKernel,
+)
+from clearwater_modules.forcing import Forcing
+from clearwater_modules.lookup import (
+    TableLookup,
+    TemperatureTables,
+    build_tables,
+)
+from clearwater_modules.options import group_option_steps
+from clearwater_modules.plan import ComputationPlan
+from clearwater_modules.sinks import OutputSink
+from clearwater_modules.tiling import TiledExecutor
+from clearwater_modules.zones import ParameterZones
+from typing import (
+    Literal,
+    Optional,
+)
+
+Backend = Literal['numpy', 'numba']
+BACKENDS: tuple[str, ...] = ('numpy', 'numba')
+OPTION_SUFFIX: str = '_option'
+
+
+def compact_array(name: str, values: np.ndarray) -> np.ndarray:
+    """Return a compact copy of a static variable's values.
+
+    Uniform values are reduced to a 0-d array, and integer option flags
+    (variables named *_option) are stored as int8 if their values fit.
+    """
+    array: np.ndarray = np.asarray(values)
+    if array.ndim and array.size:
+        first = array.flat[0]
+        if not any(array.strides) or np.all(array == first):
+            array = np.asarray(first)
+    is_option: bool = name.endswith(OPTION_SUFFIX) and array.dtype.kind in 'iu'
+    if is_option and array.size and array.min() >= -128 and array.max() <= 127:
+        return array.astype(np.int8)
+    return np.array(array, order='C', copy=True)
+
+
+class ArrayEngine:
+    """Stores model variables in NumPy buffers and advances them in time.
+
+    Attributes:
+        time_dim: The name of the time dimension.
+        time_coords: The timestep held by each buffer slot along time_dim. Only
+            these timesteps are written (see Model output_interval).
+        coords: All non-time coordinates of the model grid.
+        sizes: The size of each non-time dimension.
+        dims: The non-time dimensions of each variable.
+        temporal: Buffers of shape (time, *grid) for variables tracked in time.
+        static: Buffers for non-updateable static variables, of shape (*grid),
+            or 0-d if uniform (see compact_array).
+        current: The latest value of each state/updateable static variable.
+        plan: The computation plan run at each timestep.
+        hoisted: Time-invariant dynamic variables, which only depend on static
+            variables and are computed once when the engine is created.
+        zones: Per-zone tables of zoned static variables. Zoned variables read
+            at each timestep are gathered to grid arrays once (and again when a
+            zone is updated), the others are only gathered to compute hoisted
+            variables and the dataset view.
+        backend: 'numpy' runs each process on full-grid arrays, 'numba' runs
+            the plan as fused, code-generated kernels (see codegen.py).
+        threads: If set with backend='numba', kernels split cells across this
+            many threads.
+        workers: If set, the independent processes of each dependency level
+            are run concurrently on this many threads.
+        tile_size: If set with backend='numpy', each timestep is computed on
+            blocks of this many cells (see tiling.py).
+        group_options: If True (backend='numpy'), processes taking option
+            variables are run separately on the cells of each option value
+            (see options.py).
+        lookup_tables: If set (backend='numpy'), the variables listed in the
+            settings are interpolated in temperature tables (see lookup.py).
+        tables: The table of each tabulated variable.
+        batch_arrhenius: If True (backend='numpy'), Arrhenius rate processes
+            are computed together by a stage run before the other steps of
+            each timestep (see arrhenius.py).
+        executor: The fused kernel executor when backend='numba'. With
+            backend='numpy', the level executor with workers, the tiled
+            executor with tile_size, or else the arena executor, which reuses
+            buffers for the intermediates that are not tracked (see arena.py).
+        history_window: If set, temporal buffers are mirrored ring buffers of
+            2 * history_window slots, holding the last history_window output
+            steps (see _init_ring), and timesteps are unbounded.
+        output_interval: Every Nth timestep is an output step (ring mode only,
+            otherwise output steps are given by time_coords).
+        sinks: Output sinks receiving every output step as it is written.
+        forcing: Time series interpolated onto each timestep, applied before
+            the updates passed to step().
+        inputs: Caller-owned arrays read in place at each timestep, after the
+            forcing and before the updates passed to step().
+        outputs: Caller-owned arrays each timestep's values are copied into.
+    """
+
+    def __init__(
+        self,
+        time_dim: str,
+        time_coords: np.ndarray,
+        coords: dict[str, xr.DataArray],
+        dims: dict[str, tuple[str, ...]],
+        temporal: dict[str, np.ndarray],
+        static: dict[str, np.ndarray],
+        current: dict[str, np.ndarray],
+        var_attrs: dict[str, dict],
+        plan: ComputationPlan,
+        attrs: Optional[dict] = None,
+        backend: Backend = 'numpy',
+        history_window: Optional[int] = None,
+        output_interval: int = 1,
+        sizes: Optional[dict[str, int]] = None,
+        zones: Optional[ParameterZones] = None,
+        threads: Optional[int] = None,
+        workers: Optional[int] = None,
+        tile_size: Optional[int] = None,
+        group_options: bool = False,
+        lookup_tables: Optional[TemperatureTables] = None,
+        batch_arrhenius: bool = False,
+    ) -> None:
+        if backend not in BACKENDS:
+            raise ValueError(
+                f'backend must be one of {BACKENDS}, not {backend!r}.'
+            )
+        if threads is not None and backend != 'numba':
+            raise ValueError("threads requires backend='numba'.")
+        if threads is not None and workers is not None:
+            raise ValueError('threads and workers cannot be combined.')
+        if tile_size is not None and (backend != 'numpy' or workers is not None):
+            raise ValueError(
+                "tile_size requires backend='numpy' and cannot be combined with workers."
+            )
+        if group_options and backend != 'numpy':
+            raise ValueError("group_options requires backend='numpy'.")
+        if lookup_tables is not None:
+            if backend != 'numpy' or workers is not None:
+                raise ValueError(
+                    "lookup_tables requires backend='numpy' and cannot be combined with workers."
+                )
+        if batch_arrhenius and (backend != 'numpy' or workers is not None):
+            raise ValueError(
+                "batch_arrhenius requires backend='numpy' and cannot be combined with workers."
+            )
+        if lookup_tables is not None:
+            if lookup_tables.temperature not in plan.index:
+                raise ValueError(
+                    f'Unknown lookup table temperature: {lookup_tables.temperature}'
+                )
+        self.time_dim = time_dim
+        self.time_coords = time_coords
+        self.coords = coords
+        self.dims = dims
+        self.temporal = temporal
+        self.static = static
+        self.current = current
+        self.var_attrs = var_attrs
+        self.attrs: dict = attrs if attrs is not None else {}
+        self.zones = zones
+        zoned: list[str] = list(zones.tables) if zones is not None else []
+        for name in zoned:
+            self.dims[name] = zones.dims
+            self.var_attrs[name] = zones.attrs[name]
+        if sizes is None:
+            sizes = {}
+            if zones is not None:
+                sizes.update(zip(zones.dims, zones.index.shape))
+            for name, array in {**temporal, **static}.items():
+                shape = array.shape[1:] if name in temporal else array.shape
+                if len(shape) == len(dims[name]):
+                    sizes.update(zip(dims[name], shape))
+        self.sizes = sizes
+        self.plan = plan
+        self.backend = backend
+        self.threads = threads
+        self.workers = workers
+        self.tile_size = tile_size
+        self.group_options = group_options
+        self.lookup_tables = lookup_tables
+        self.tables: dict[str, TableLookup] = {}
+        self.batch_arrhenius = batch_arrhenius
+        self._arrhenius: list[ArrheniusStage] = []
+        self.executor: Optional[
+            FusedExecutor | LevelExecutor | TiledExecutor | ArenaExecutor
+        ] = None
+        self._dataset: Optional[xr.Dataset] = None
+        self.history_window = history_window
+        self.output_interval = output_interval
+        self._time_slots: dict[int, int] = {
+            int(step): slot for slot, step in enumerate(time_coords)
+        }
+        # with ring buffers, the view of all slots the dataset is sliced from
+        self._template: Optional[xr.Dataset] = None
+        self._template_lap: int = 0
+        self.sinks: list[OutputSink] = []
+        self.forcing: Optional[Forcing] = None
+        self._forced: list[tuple[int, str]] = []
+        self.inputs: dict[str, np.ndarray] = {}
+        self.outputs: dict[str, np.ndarray] = {}
+        self._inputs: list[tuple[int, np.ndarray]] = []
+        self._host_outputs: list[tuple[int, np.ndarray]] = []
+        if history_window is not None:
+            self._init_ring(history_window)
+
+        # slot-indexed values for the plan; static slots are filled only once
+        self._values: list = [None] * len(plan.names)
+        for name, array in self.static.items():
+            if name in plan.index:
+                self._values[plan.index[name]] = array
+        self._carried: list[tuple[int, str]] = [
+            (plan.index[name], name) for name in self.current
+        ]
+
+        # time-invariant dynamic variables are computed once, like statics
+        self.hoisted: tuple[str, ...] = plan.time_invariant(
+            list(self.static) + zoned
+        )
+        hoisted_slots: set[int] = {plan.index[name] for name in self.hoisted}
+        self._steps: tuple = tuple(
+            step for step in plan.steps if step[0] not in hoisted_slots
+        )
+        self._hoisted_steps: tuple = tuple(
+            step for step in plan.steps if step[0] in hoisted_slots
+        )
+        if group_options:
+            self._steps = group_option_steps(self._steps, plan.names, OPTION_SUFFIX)
+            self._hoisted_steps = group_option_steps(
+                self._hoisted_steps, plan.names, OPTION_SUFFIX,
+            )
+        step_args: set[int] = {i for _, _, args in self._steps for i in args}
+        self._zoned: list[tuple[int, str, bool]] = [
+            (plan.index[name], name, plan.index[name] in step_args)
+            for name in zoned if name in plan.index
+        ]
+        self._hoist()
+        # uniform statics, the only values tables and factors can depend on
+        constants: dict[int, np.ndarray] = {
+            plan.index[name]: array for name, array in self.static.items()
+            if name in plan.index and array.ndim == 0
+        }
+        if lookup_tables is not None:
+            # an extra slot holds the located cell temperatures
+            self._values.append(None)
+            self._steps, self.tables = build_tables(
+                plan,
+                self._steps,
+                constants,
+                lookup_tables,
+                index_slot=len(self._values) - 1,
+            )
+        if batch_arrhenius:
+            self._steps, self._arrhenius = batch_arrhenius_steps(
+                self._steps, constants,
+            )
+        self._outputs: list[tuple[int, np.ndarray]] = []
+        self._bind_outputs()
+
+    def _hoist(self) -> None:
+        """Gather zoned variables and compute the hoisted variables."""
+        values: list = self._values
+        for slot, name, _ in self._zoned:
+            values[slot] = self.zones.gather(name)
+        for out, func, args in self._hoisted_steps:
+            values[out] = func(*[values[i] for i in args])
+        for slot, _, per_step in self._zoned:
+            if not per_step:
+                values[slot] = None
+
+    def set_zone_value(self, name: str, zone: object, value: object) -> None:
+        """Set a zoned variable in one zone, recomputing what depends on it."""
+        if self.zones is None or name not in self.zones:
+            raise ValueError(f'Variable {name} is not a zoned variable.')
+        self.zones.set(name, zone, value)
+        self._hoist()
+        self.invalidate()
+
+    def _init_ring(self, history_window: int) -> None:
+        """Move the temporal buffers into mirrored ring buffers.
+
+        Output step k (timestep k * output_interval) is written to slot
+        k % history_window and to its mirror, history_window slots later, so
+        that the last history_window output steps are always contiguous,
+        ending at the mirror of the latest one. The dataset view is then a
+        slice of the buffers, which never have to be reordered.
+        """
+        if history_window < 1:
+            raise ValueError(
+                f'history_window must be a positive integer, got {history_window}.'
+            )
+        kept: np.ndarray = np.sort(self.time_coords)[-history_window:]
+        # the view holds the latest run of consecutive output steps
+        gaps: np.ndarray = np.flatnonzero(np.diff(kept // self.output_interval) != 1)
+        if len(gaps):
+            kept = kept[gaps[-1] + 1:]
+        outputs: np.ndarray = kept // self.output_interval
+        ring_slots: np.ndarray = outputs % history_window
+        positions: list[int] = [
+            int(np.flatnonzero(self.time_coords == step)[0]) for step in kept
+        ]
+
+        time_coords: np.ndarray = np.full(2 * history_window, -1, dtype=np.int64)
+        for name, array in self.temporal.items():
+            ring: np.ndarray = np.empty(
+                (2 * history_window,) + array.shape[1:],
+                dtype=array.dtype,
+            )
+            if ring.dtype.kind in 'fc':
+                ring.fill(np.nan)
+            ring[ring_slots] = array[positions]
+            ring[ring_slots + history_window] = array[positions]
+            self.temporal[name] = ring
+        time_coords[ring_slots] = kept
+        time_coords[ring_slots + history_window] = kept
+
+        self.time_coords = time_coords
+        self._ring_last: int = int(outputs[-1])
+        self._ring_count: int = len(outputs)
+        self._time_slots = {}
+
+    def _time_slot(self, timestep: int) -> tuple[int, ...]:
+        """Return the buffer slots an output timestep is written to, if any."""
+        if self.history_window is None:
+            slot: Optional[int] = self._time_slots.get(timestep)
+            return () if slot is None else (slot,)
+        if timestep % self.output_interval:
+            return ()
+        slot = timestep // self.output_interval % self.history_window
+        return slot, slot + self.history_window
+
+    def _record_outputs(self, first: int, last: int) -> None:
+        """Record the ring-buffer output steps among timesteps first to last."""
+        if self.history_window is None or last < first:
+            return
+        window: int = self.history_window
+        first_output: int = -(-first // self.output_interval)
+        last_output: int = last // self.output_interval
+        if last_output < first_output:
+            return
+        n_outputs: int = last_output - first_output + 1
+        if first_output == self._ring_last + 1:
+            n_outputs += self._ring_count
+        self._ring_count = min(n_outputs, window)
+        self._ring_last = last_output
+
+        outputs: np.ndarray = np.arange(
+            max(first_output, last_output - window + 1),
+            last_output + 1,
+        )
+        slots: np.ndarray = outputs % window
+        self.time_coords[slots] = outputs * self.output_interval
+        self.time_coords[slots + window] = outputs * self.output_interval
+        # the next view is sliced lazily from the same template
+        self._drop_view()
+
+    def _bind_outputs(self) -> None:
+        self._outputs = [
+            (self.plan.index[name], array)
+            for name, array in self.temporal.items()
+        ]
+        # slots read after a timestep, which executors must materialize
+        needed_slots: set[int] = {
+            slot for slot, _ in self._carried + self._outputs + self._host_outputs
+        }
+        if self.backend == 'numba':
+            self.executor = FusedExecutor(
+                self.plan,
+                needed_slots=needed_slots,
+                shape=self.grid_shape,
+                steps=self._steps,
+                parallel=self.threads is not None,
+                threads=self.threads,
+                workers=self.workers,
+            )
+        elif self.workers is not None:
+            self.executor = LevelExecutor(
+                self.plan,
+                workers=self.workers,
+                steps=self._steps,
+            )
+        elif self.tile_size is not None:
+            self.executor = TiledExecutor(
+                self.plan,
+                needed_slots=needed_slots,
+                shape=self.grid_shape,
+                tile_size=self.tile_size,
+                steps=self._steps,
+            )
+        else:
+            self.executor = ArenaExecutor(
+                self.plan,
+                needed_slots=needed_slots,
+                shape=self.grid_shape,
+                steps=self._steps,
+            )
+
+    @property
+    def grid_shape(self) -> tuple[int, ...]:
+        """The shape of the model grid (excluding time)."""
+        return next(iter(self.temporal.values())).shape[1:]
+
+    @classmethod
+    def from_dataset(
+        cls,
+        dataset: xr.Dataset,
+        time_dim: str,
+        carried_variables: list[str],
+        plan: ComputationPlan,
+        timestep: int = 0,
+        backend: Backend = 'numpy',
+        history_window: Optional[int] = None,
+        output_interval: int = 1,
+        zones: Optional[ParameterZones] = None,
+        threads: Optional[int] = None,
+        workers: Optional[int] = None,
+        tile_size: Optional[int] = None,
+        group_options: bool = False,
+        lookup_tables: Optional[TemperatureTables] = None,
+        batch_arrhenius: bool = False,
+    ) -> 'ArrayEngine':
+        """Copies an initialized model dataset into contiguous buffers.
+
+        Args:
+            dataset: The dataset built by Model initialization (or a hotstart).
+            time_dim: The name of the time dimension.
+            carried_variables: State and updateable static variable names, whose
+                values are carried from one timestep to the next.
+            plan: The computation plan run at each timestep.
+            timestep: The timestep holding the current values.
+            backend: The execution backend, 'numpy' or 'numba'.
+            history_window: Keep only this many output steps, in ring buffers.
+            output_interval: The interval between output steps in ring mode.
+            zones: Per-zone tables of static variables missing from dataset.
+            threads: The number of threads of numba kernels (see ArrayEngine).
+            workers: The number of threads running each dependency level.
+            tile_size: The number of cells per block of tiled execution.
+            group_options: Run option processes per option value (see ArrayEngine).
+            lookup_tables: Settings of the temperature lookup tables.
+            batch_arrhenius: Share the temperature correction of Arrhenius rates.
+        """
+        dims: dict[str, tuple[str, ...]] = {}
+        temporal: dict[str, np.ndarray] = {}
+        static: dict[str, np.ndarray] = {}
+        var_attrs: dict[str, dict] = {}
+
+        for name, data_array in dataset.data_vars.items():
+            var_attrs[name] = dict(data_array.attrs)
+            if time_dim in data_array.dims:
+                if data_array.dims[0] != time_dim:
+                    raise ValueError(
+                        f'Variable {name} must have {time_dim} as its first dimension.'
+                    )
+                dims[name] = tuple(data_array.dims[1:])
+                temporal[name] = np.array(data_array.values, order='C', copy=True)
+            else:
+                dims[name] = tuple(data_array.dims)
+                static[name] = compact_array(name, data_array.values)
+
+        time_coords: np.ndarray = np.array(dataset[time_dim].values)
+        slots: np.ndarray = np.flatnonzero(time_coords == timestep)
+        if len(slots) == 0:
+            raise ValueError(
+                f'Timestep {timestep} is not held in the dataset {time_dim}.'
+            )
+        current: dict[str, np.ndarray] = {}
+        for name in carried_variables:
+            if name not in temporal:
+                raise ValueError(
+                    f'Variable {name} must be tracked along {time_dim}.'
+                )
+            current[name] = temporal[name][slots[0]].copy()
+
+        return cls(
+            time_dim=time_dim,
+            time_coords=time_coords,
+            coords={
+                key: value for key, value in dataset.coords.items()
+                if key != time_dim
+            },
+            dims=dims,
+            temporal=temporal,
+            static=static,
+            current=current,
+            var_attrs=var_attrs,
+            plan=plan,
+            attrs=dict(dataset.attrs),
+            backend=backend,
+            history_window=history_window,
+            output_interval=output_interval,
+            sizes={
+                dim: size for dim, size in dataset.sizes.items()
+                if dim != time_dim
+            },
+            zones=zones,
+            threads=threads,
+            workers=workers,
+            tile_size=tile_size,
+            group_options=group_options,
+            lookup_tables=lookup_tables,
+            batch_arrhenius=batch_arrhenius,
+        )
+
+    @property
+    def dataset(self) -> xr.Dataset:
+        """An xarray.Dataset view of the engine buffers, which does not copy.
+
+        With ring buffers, the view holds the last history_window output
+        steps in chronological order. It is sliced from a view of the whole
+        mirrored buffers, which is only rebuilt once every history_window
+        output steps, when the timesteps of its slots change.
+        """
+        if self._dataset is None:
+            if self.history_window is None:
+                self._dataset = self._build_dataset(self.time_coords)
+            else:
+                self._dataset = self._ring_view()
+        return self._dataset
+
+    def _ring_view(self) -> xr.Dataset:
+        """Return the last output steps, sliced from a view of the ring buffers."""
+        window: int = self.history_window
+        lap: int = self._ring_last // window
+        if self._template is None or self._template_lap != lap:
+            # during a lap, mirrored slot i only shows output (lap - 1) * window + i
+            self._template = self._build_dataset(
+                ((lap - 1) * window + np.arange(2 * window)) * self.output_interval
+            )
+            self._template_lap = lap
+        stop: int = self._ring_last % window + window + 1
+        view: xr.Dataset = self._template.isel(
+            {self.time_dim: slice(stop - self._ring_count, stop)}
+        )
+        view.attrs = self.attrs
+        return view
+
+    def _build_dataset(self, time_coords: np.ndarray) -> xr.Dataset:
+        data_vars: dict[str, tuple] = {}
+        for name, array in self.temporal.items():
+            data_vars[name] = ((self.time_dim,) + self.dims[name], array)
+        for name, array in self.static.items():
+            shape = tuple(self.sizes[dim] for dim in self.dims[name])
+            data_vars[name] = (self.dims[name], np.broadcast_to(array, shape))
+        for name in (self.zones.tables if self.zones is not None else {}):
+            data_vars[name] = (self.dims[name], self.zones.gather(name))
+
+        dataset = xr.Dataset(
+            data_vars=data_vars,
+            coords={
+                self.time_dim: time_coords,
+                **self.coords,
+            },
+            attrs=self.attrs,
+        )
+        for name, attrs in self.var_attrs.items():
+            dataset[name].attrs = attrs
+        return dataset
+
+    def _drop_view(self) -> None:
+        """Drop the cached dataset view, keeping the attributes set on it."""
+        if self._dataset is not None:
+            self.attrs = dict(self._dataset.attrs)
+        self._dataset = None
+
+    def invalidate(self) -> None:
+        """Drop the cached dataset views, e.g. after buffers are added."""
+        self._drop_view()
+        self._template = None
+
+    def add_sink(self, sink: OutputSink, timestep: int) -> None:
+        """Open a sink, writing the current timestep if it is an output step."""
+        dataset: xr.Dataset = self.dataset
+        steps: np.ndarray = dataset[self.time_dim].values
+        current: np.ndarray = np.flatnonzero(steps == timestep)
+        sink.open(
+            dataset.isel({self.time_dim: slice(0, 1)}),
+            time_dim=self.time_dim,
+        )
+        if len(current):
+            sink.write(
+                timestep,
+                {
+                    name: dataset[name].values[current[0]]
+                    for name in sink.variables
+                },
+            )
+        self.sinks.append(sink)
+
+    def set_forcing(self, forcing: Optional[Forcing]) -> None:
+        """Bind forcing to the grid, applying it from the next step on."""
+        if forcing is not None:
+            forcing.bind(
+                dims={name: self.dims[name] for name in forcing.names},
+                shape=self.grid_shape,
+                zones=self.zones,
+            )
+            self._forced = [
+                (self.plan.index[name], name) for name in forcing.names
+            ]
+        else:
+            self._forced = []
+        self.forcing = forcing
+
+    def bind_inputs(self, arrays: dict[str, np.ndarray]) -> None:
+        """Read these arrays in place at each following timestep."""
+        self.inputs = dict(arrays)
+        self._inputs = [
+            (self.plan.index[name], array) for name, array in arrays.items()
+        ]
+
+    def bind_outputs(self, arrays: dict[str, np.ndarray]) -> None:
+        """Copy each following timestep's values into these arrays."""
+        self.outputs = dict(arrays)
+        self._host_outputs = [
+            (self.plan.index[name], array) for name, array in arrays.items()
+        ]
+        self._bind_outputs()
+
+    def add_temporal(
+        self,
+        name: str,
+        like: str,
+        attrs: Optional[dict] = None,
+    ) -> None:
+        """Allocate a NaN-filled temporal buffer shaped like an existing one."""
+        if name in self.temporal:
+            return
+        self.temporal[name] = np.full(self.temporal[like].shape, np.nan)
+        self.dims[name] = self.dims[like]
+        self.var_attrs[name] = attrs if attrs is not None else {}
+        self._bind_outputs()
+        self.invalidate()
+
+    def step(
+        self,
+        timestep: int,
+        updates: Optional[dict[str, np.ndarray]] = None,
+    ) -> None:
+        """Compute one timestep, writing it to the buffers if it is an output step.
+
+        Args:
+            timestep: The timestep being computed.
+            updates: New values for state/updateable static variables, applied
+                before computing.
+        """
+        self._advance(
+            timestep,
+            [(self.plan.index[name], array) for name, array in (updates or {}).items()],
+            self._time_slot(timestep),
+        )
+        for slot, array in self._host_outputs:
+            np.copyto(array, self._values[slot])
+        self._record_outputs(timestep, timestep)
+
+    def _advance(
+        self,
+        timestep: int,
+        updates: list[tuple[int, np.ndarray]],
+        time_slots: tuple[int, ...],
+    ) -> None:
+        """Compute one timestep from resolved update slots, writing its outputs."""
+        values: list = self._values
+        for slot, name in self._carried:
+            values[slot] = self.current[name]
+        if self.forcing is not None:
+            forced: dict[str, np.ndarray] = self.forcing.at(timestep)
+            for slot, name in self._forced:
+                values[slot] = forced[name]
+        for slot, array in self._inputs:
+            values[slot] = array
+        for slot, array in updates:
+            values[slot] = array
+
+        for stage in self._arrhenius:
+            stage(values)
+        if self.executor is not None:
+            self.executor(values)
+        else:
+            for out, func, args in self._steps:
+                values[out] = func(*[values[i] for i in args])
+
+        for slot, name in self._carried:
+            self.current[name] = np.asarray(values[slot])
+        if time_slots:
+            for slot, array in self._outputs:
+                for time_slot in time_slots:
+                    array[time_slot] = values[slot]
+            for sink in self.sinks:
+                sink.write(
+                    timestep,
+                    {name: self.temporal[name][time_slots[0]] for name in sink.variables},
+                )
+
+    def run(
+        self,
+        start: int,
+        n_steps: int,
+        forcing: Optional[dict[str, np.ndarray]] = None,
+    ) -> None:
+        """Compute timesteps start + 1 to start + n_steps back to back.
+
+        What does not change between steps is done once per run: forcing
+        names and output slots are resolved before the first step, and bound
+        outputs, ring-buffer bookkeeping and the dataset view are updated
+        after the last one. With backend='numba', once the kernels are
+        compiled, the remaining steps are computed by a single multi-step
+        kernel call (see _multistep_kernel), otherwise each step is one call
+        of the executor.
+
+        Args:
+            start: The timestep holding the current values.
+            n_steps: The number of timesteps to compute.
+            forcing: Arrays of shape (n_steps, *grid) for state/updateable
+                static variables. Row i is applied before computing step i.
+        """
+        forced: list[tuple[int, np.ndarray]] = [
+            (self.plan.index[name], array) for name, array in (forcing or {}).items()
+        ]
+        timesteps: range = range(start + 1, start + n_steps + 1)
+        time_slots: list[tuple[int, ...]] = [self._time_slot(step) for step in timesteps]
+        done: int = start
+        kernel: Optional[MultiStepKernel] = self._multistep_kernel(forced)
+        try:
+            for i, timestep in enumerate(timesteps):
+                if kernel is not None:
+                    self._advance_steps(
+                        kernel,
+                        [(slot, array[i:]) for slot, array in forced],
+                        time_slots[i:],
+                    )
+                    done = timesteps[-1]
+                    break
+                self._advance(
+                    timestep,
+                    [(slot, array[i]) for slot, array in forced],
+                    time_slots[i],
+                )
+                done = timestep
+                if i == 0:
+                    # fused kernels are compiled on the first timestep
+                    kernel = self._multistep_kernel(forced)
+        finally:
+            # the buffers hold every step computed, even if one failed
+            self._record_outputs(start + 1, done)
+        for slot, array in self._host_outputs:
+            np.copyto(array, self._values[slot])
+
+    def _multistep_kernel(
+        self,
+        forced: list[tuple[int, np.ndarray]],
+    ) -> Optional[MultiStepKernel]:
+        """Return a kernel running whole runs per cell, if this engine can use one.
+
+        This requires a numba plan compiled into a single kernel (see
+        FusedExecutor.fused), and nothing to do between timesteps in Python:
+        no sinks, interpolated forcing or bound inputs.
+        """
+        executor = self.executor
+        if not isinstance(executor, FusedExecutor) or executor.fused is None:
+            return None
+        if self.sinks or self.forcing is not None or self._inputs:
+            return None
+        size: int = int(np.prod(self.grid_shape))
+        if any(array[0].size != size for _, array in forced if len(array)):
+            return None
+        if any(not array.flags.c_contiguous for _, array in self._outputs):
+            return None
+        carried: list[int] = [slot for slot, _ in self._carried]
+        computed: set[int] = {out for out, _, _ in executor.fused}
+        return executor.multistep_kernel(
+            carried_slots=carried,
+            forced_slots=[slot for slot, _ in forced],
+            series_slots=[slot for slot, _ in self._outputs],
+            final_slots=[
+                slot for slot, _ in self._host_outputs
+                if slot in computed and slot not in carried
+            ],
+        )
+
+    def _advance_steps(
+        self,
+        kernel: MultiStepKernel,
+        forced: list[tuple[int, np.ndarray]],
+        time_slots: list[tuple[int, ...]],
+    ) -> None:
+        """Compute len(time_slots) timesteps with one multi-step kernel call."""
+        values: list = self._values
+        for slot, name in self._carried:
+            values[slot] = self.current[name]
+        rows: np.ndarray = np.full(
+            (len(time_slots), max(1, *map(len, time_slots))),
+            -1,
+            dtype=np.int64,
+        )
+        for t, slots in enumerate(time_slots):
+            rows[t, :len(slots)] = slots
+        kernel(
+            values,
+            [np.ascontiguousarray(array).reshape(len(array), -1) for _, array in forced],
+            [array.reshape(len(array), -1) for _, array in self._outputs],
+            rows,
+        )
+        for slot, name in self._carried:
+            self.current[name] = np.asarray(values[slot])
@@ -0,0 +1,225 @@
+"""Time-varying forcing of state and updateable static variables.
+
+Forcing holds time series (e.g. hourly meteorology) on their own time axes,
+and interpolates them linearly onto the model time axis. The interpolation
+indices and weights are computed once, for all series sharing a time axis, and
+each timestep is written into preallocated buffers that the engine reads
+directly (see ArrayEngine.step). Series from a forcing cache (see
+forcing_cache.py) are read in place from the memory map.
+"""
+import numpy as np
+import xarray as xr
+from pathlib import Path
+from clearwater_modules.forcing_cache import ForcingCache
+from clearwater_modules.zones import ParameterZones
+from typing import (
+    Optional,
+)
+
+
+def _as_numeric(times: np.ndarray) -> np.ndarray:
+    """Return times as float64, datetimes as nanoseconds since the epoch."""
+    times = np.asarray(times)
+    if times.dtype.kind == 'M':
+        return times.astype('datetime64[ns]').astype(np.int64).astype(np.float64)
+    if times.dtype.kind == 'm':
+        return times.astype('timedelta64[ns]').astype(np.int64).astype(np.float64)
+    return times.astype(np.float64)
+
+
+def interpolation_weights(
+    source_times: np.ndarray,
+    target_times: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Return linear interpolation indices and weights of target times.
+
+    The value at target_times[k] is
+    (1 - weights[k]) * values[indices[k]] + weights[k] * values[indices[k] + 1].
+
+    Args:
+        source_times: The increasing times of a series.
+        target_times: The times to interpolate to, within the source times.
+    """
+    source: np.ndarray = _as_numeric(source_times)
+    target: np.ndarray = _as_numeric(target_times)
+    if len(source) == 0 or np.any(np.diff(source) <= 0):
+        raise ValueError('Forcing times must be strictly increasing.')
+    if len(target) and (target.min() < source[0] or target.max() > source[-1]):
+        raise ValueError(
+            'Forcing time series do not cover the model times.'
+        )
+    if len(source) == 1:
+        return np.zeros(len(target), dtype=np.intp), np.zeros(len(target))
+    indices: np.ndarray = np.clip(
+        np.searchsorted(source, target, side='right') - 1,
+        0,
+        len(source) - 2,
+    )
+    weights: np.ndarray = (target - source[indices]) / (
+        source[indices + 1] - source[indices]
+    )
+    return indices.astype(np.intp), weights
+
+
+class Forcing:
+    """Time series interpolated onto the model timesteps.
+
+    Each series is a DataArray with time_dim as its first dimension, followed
+    by either the model grid dimensions (per cell), a zone_dim dimension whose
+    coordinate holds zone ids (per zone, see Model zones), or nothing (the same
+    value in every cell).
+
+    Attributes:
+        series: Variable names and their (time, ...) values.
+        times: The time of each model timestep (times[0] is timestep 0).
+        names: The forced variable names.
+        weights: For each series, the interpolation (indices, weights) of the
+            model times. Series on the same time axis share them.
+    """
+
+    def __init__(
+        self,
+        series: dict[str, xr.DataArray],
+        times: np.ndarray,
+        time_dim: str = 'time',
+        zone_dim: str = 'zone',
+    ) -> None:
+        """Precompute the interpolation of each series onto the model times.
+
+        Args:
+            series: A dict with state or updateable static variable names as
+                keys, and DataArrays with a time_dim coordinate as values.
+            times: The time of each model timestep, starting at timestep 0, in
+                the same units (or datetime type) as the series times.
+            time_dim: The time dimension of the series.
+            zone_dim: The zone dimension of per-zone series.
+        """
+        self.time_dim = time_dim
+        self.zone_dim = zone_dim
+        self.times: np.ndarray = np.asarray(times)
+        self.series: dict[str, xr.DataArray] = {}
+        self.weights: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+
+        axes: dict[bytes, tuple[np.ndarray, np.ndarray]] = {}
+        for name, data_array in series.items():
+            if not isinstance(data_array, xr.DataArray):
+                raise TypeError(
+                    f'Forcing for {name} must be a xarray.DataArray, got {type(data_array)}.'
+                )
+            if data_array.dims[:1] != (time_dim,):
+                raise ValueError(
+                    f'Forcing for {name} must have {time_dim} as its first dimension.'
+                )
+            source: np.ndarray = np.asarray(data_array[time_dim].values)
+            key: bytes = _as_numeric(source).tobytes()
+            if key not in axes:
+                axes[key] = interpolation_weights(source, self.times)
+            self.series[name] = data_array
+            self.weights[name] = axes[key]
+
+        self.names: list[str] = list(self.series)
+        self._values: Optional[dict[str, np.ndarray]] = None
+        self._sources: list[tuple] = []
+
+    @classmethod
+    def from_cache(
+        cls,
+        path: str | Path,
+        times: np.ndarray,
+        variables: Optional[list[str]] = None,
+        zone_dim: str = 'zone',
+    ) -> 'Forcing':
+        """Create forcing reading a forcing cache in place.
+
+        Args:
+            path: A forcing cache file (see forcing_cache.write_forcing_cache).
+            times: The time of each model timestep, starting at timestep 0.
+            variables: The cached variables to force, defaults to all.
+            zone_dim: The zone dimension of per-zone caches.
+        """
+        cache: ForcingCache = ForcingCache(path)
+        return cls(
+            cache.series(variables),
+            times=times,
+            time_dim=cache.time_dim,
+            zone_dim=zone_dim,
+        )
+
+    def bind(
+        self,
+        dims: dict[str, tuple[str, ...]],
+        shape: tuple[int, ...],
+        zones: Optional[ParameterZones] = None,
+    ) -> None:
+        """Validate the series against the model grid and allocate buffers.
+
+        Args:
+            dims: The grid dimensions of each forced variable.
+            shape: The shape of the model grid.
+            zones: The model zones, required by per-zone series.
+        """
+        values: dict[str, np.ndarray] = {}
+        sources: list[tuple] = []
+        for name, data_array in self.series.items():
+            space: tuple[str, ...] = tuple(data_array.dims[1:])
+            # read in place (e.g. from a memory-mapped forcing cache)
+            data: np.ndarray = np.asarray(data_array.values)
+            if data.dtype.kind != 'f':
+                data = data.astype(np.float64)
+            gather: Optional[np.ndarray] = None
+            if space == (self.zone_dim,):
+                if zones is None or zones.index.shape != shape:
+                    raise ValueError(
+                        f'Forcing for {name} is given per zone, but the model has no zones.'
+                    )
+                ids: np.ndarray = np.asarray(data_array[self.zone_dim].values)
+                order: np.ndarray = np.argsort(ids)
+                positions: np.ndarray = order[
+                    np.searchsorted(ids, zones.ids, sorter=order).clip(0, len(ids) - 1)
+                ]
+                if not np.array_equal(ids[positions], zones.ids):
+                    raise ValueError(
+                        f'Forcing for {name} must have a value for every zone.'
+                    )
+                data = np.ascontiguousarray(data[:, positions])
+                gather = zones.index
+                buffer: np.ndarray = np.empty(shape)
+            elif space == ():
+                buffer = np.empty(())
+            elif space == dims[name] and data.shape[1:] == shape:
+                buffer = np.empty(shape)
+            else:
+                raise ValueError(
+                    f'Forcing for {name} must have dimensions {(self.time_dim,) + dims[name]}, '
+                    f'({self.time_dim}, {self.zone_dim}) or ({self.time_dim},), got {data_array.dims}.'
+                )
+            indices, weights = self.weights[name]
+            scratch: np.ndarray = np.empty(data.shape[1:])
+            sources.append((name, data, indices, weights, gather, scratch, buffer))
+            values[name] = buffer
+        self._values = values
+        self._sources = sources
+
+    def at(self, timestep: int) -> dict[str, np.ndarray]:
+        """Interpolate every series to a timestep, in place.
+
+        The returned dict and arrays are reused by the next call.
+        """
+        if self._values is None:
+            raise RuntimeError('Forcing must be bound to a model first.')
+        if not 0 <= timestep < len(self.times):
+            raise ValueError(
+                f'No forcing time for timestep {timestep}, forcing has {len(self.times)} times.'
+            )
+        for name, data, indices, weights, gather, scratch, buffer in self._sources:
+            i: int = indices[timestep]
+            w: float = weights[timestep]
+            target: np.ndarray = scratch if gather is not None else buffer
+            if w == 0.0:
+                target[...] = data[i]
+            else:
+                np.multiply(data[i], 1.0 - w, out=target)
+                target += w * data[i + 1]
+            if gather is not None:
+                np.take(scratch, gather, out=buffer)
+        return self._values
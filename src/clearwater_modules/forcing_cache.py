@@ -0,0 +1,256 @@
+"""Binary, memory-mapped forcing cache.
+
+Source forcing (NetCDF or CSV) is converted once into a single file holding a
+(time, cell, variable) array behind a small JSON header. Opening the cache
+only parses the header and memory-maps the array, so scenarios start without
+re-reading the source files, and concurrent runs share the OS page cache.
+
+Layout:
+    MAGIC (8 bytes), header length (uint64, little endian), JSON header,
+    padding to a multiple of ALIGNMENT bytes, then the data in C order.
+
+Usage:
+    python -m clearwater_modules.forcing_cache met.nc met.cwf --dtype float32
+"""
+import argparse
+import json
+import struct
+import numpy as np
+import pandas as pd
+import xarray as xr
+from pathlib import Path
+from typing import (
+    Optional,
+)
+
+MAGIC: bytes = b'CWFORCE1'
+ALIGNMENT: int = 4096
+VERSION: int = 1
+
+
+def read_source(
+    source: str | Path | xr.Dataset,
+    time_dim: str = 'time',
+    cell_columns: Optional[list[str]] = None,
+) -> xr.Dataset:
+    """Open forcing source data as a (lazily loaded) dataset.
+
+    Args:
+        source: A dataset, a NetCDF file, or a CSV file with one row per time
+            (and cell), a time_dim column and one column per variable.
+        time_dim: The time dimension (the time column of a CSV file).
+        cell_columns: CSV columns identifying the cell of each row, which
+            become the grid dimensions. Without them rows are uniform series.
+    """
+    if isinstance(source, xr.Dataset):
+        return source
+    path = Path(source)
+    if path.suffix.lower() != '.csv':
+        return xr.open_dataset(path)
+    table: pd.DataFrame = pd.read_csv(path)
+    if table[time_dim].dtype == object:
+        table[time_dim] = pd.to_datetime(table[time_dim])
+    return table.set_index([time_dim] + list(cell_columns or [])).to_xarray()
+
+
+def write_forcing_cache(
+    source: str | Path | xr.Dataset,
+    path: str | Path,
+    variables: Optional[list[str]] = None,
+    time_dim: str = 'time',
+    dtype: str | np.dtype = np.float64,
+    cell_columns: Optional[list[str]] = None,
+    chunk_size: int = 1024,
+) -> 'ForcingCache':
+    """Convert forcing source data into a memory-mapped forcing cache.
+
+    All variables must share the same grid dimensions, after time_dim;
+    variables with only time_dim are broadcast to every cell.
+
+    Args:
+        source: A dataset, NetCDF file or CSV file (see read_source).
+        path: The cache file to write.
+        variables: The variables to convert, defaults to all with time_dim.
+        time_dim: The time dimension of the source.
+        dtype: The floating point type stored in the cache.
+        cell_columns: CSV columns identifying cells (see read_source).
+        chunk_size: The number of times converted at once, bounding memory use.
+
+    Returns:
+        The opened cache.
+    """
+    dataset: xr.Dataset = read_source(source, time_dim, cell_columns)
+    if variables is None:
+        variables = [
+            str(name) for name, data_array in dataset.data_vars.items()
+            if time_dim in data_array.dims
+        ]
+    if not variables:
+        raise ValueError(f'No forcing variables with a {time_dim} dimension.')
+
+    dims: tuple[str, ...] = ()
+    for name in variables:
+        if time_dim not in dataset[name].dims:
+            raise ValueError(f'Variable {name} has no {time_dim} dimension.')
+        var_dims = tuple(dim for dim in dataset[name].dims if dim != time_dim)
+        if var_dims and dims and var_dims != dims:
+            raise ValueError(
+                f'Variable {name} has dimensions {var_dims}, expected {dims}.'
+            )
+        dims = dims or var_dims
+    sizes: list[int] = [dataset.sizes[dim] for dim in dims]
+    n_cells: int = int(np.prod(sizes, dtype=np.int64))
+
+    times: np.ndarray = np.asarray(dataset[time_dim].values)
+    if times.dtype.kind == 'M':
+        time_dtype: str = 'datetime64[ns]'
+        time_values: list = times.astype('datetime64[ns]').astype(np.int64).tolist()
+    else:
+        time_dtype = str(times.dtype)
+        time_values = times.tolist()
+    header: dict = {
+        'version': VERSION,
+        'dtype': np.dtype(dtype).str,
+        'time_dim': time_dim,
+        'time_dtype': time_dtype,
+        'times': time_values,
+        'dims': list(dims),
+        'sizes': sizes,
+        'coords': {
+            dim: np.asarray(dataset[dim].values).tolist()
+            for dim in dims if dim in dataset.coords
+        },
+        'variables': list(variables),
+    }
+    encoded: bytes = json.dumps(header).encode()
+    offset: int = -(-(len(MAGIC) + 8 + len(encoded)) // ALIGNMENT) * ALIGNMENT
+    with open(path, 'wb') as file:
+        file.write(MAGIC)
+        file.write(struct.pack('<Q', len(encoded)))
+        file.write(encoded)
+        file.write(b'\0' * (offset - len(MAGIC) - 8 - len(encoded)))
+
+    data = np.memmap(
+        path,
+        dtype=np.dtype(dtype),
+        mode='r+',
+        offset=offset,
+        shape=(len(times), n_cells, len(variables)),
+    )
+    for start in range(0, len(times), chunk_size):
+        stop: int = min(start + chunk_size, len(times))
+        for v, name in enumerate(variables):
+            values = dataset[name].isel({time_dim: slice(start, stop)})
+            if values.dims == (time_dim,):
+                data[start:stop, :, v] = values.values[:, np.newaxis]
+            else:
+                data[start:stop, :, v] = values.transpose(time_dim, *dims).values.reshape(
+                    stop - start, n_cells,
+                )
+    data.flush()
+    del data
+    return ForcingCache(path)
+
+
+class ForcingCache:
+    """A memory-mapped forcing cache (see write_forcing_cache).
+
+    Attributes:
+        path: The cache file.
+        header: The decoded header.
+        times: The source times.
+        variables: The variable names.
+        data: The read-only (time, cell, variable) memory map.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        with open(self.path, 'rb') as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f'{self.path} is not a forcing cache.')
+            (length,) = struct.unpack('<Q', file.read(8))
+            self.header: dict = json.loads(file.read(length))
+        if self.header['version'] != VERSION:
+            raise ValueError(
+                f'Unsupported forcing cache version {self.header["version"]}.'
+            )
+        offset: int = -(-(len(MAGIC) + 8 + length) // ALIGNMENT) * ALIGNMENT
+
+        times: np.ndarray = np.asarray(self.header['times'])
+        if self.header['time_dtype'].startswith('datetime64'):
+            times = times.astype(np.int64).astype(self.header['time_dtype'])
+        else:
+            times = times.astype(self.header['time_dtype'])
+        self.times: np.ndarray = times
+        self.variables: list[str] = list(self.header['variables'])
+        self.data = np.memmap(
+            self.path,
+            dtype=np.dtype(self.header['dtype']),
+            mode='r',
+            offset=offset,
+            shape=(
+                len(times),
+                int(np.prod(self.header['sizes'], dtype=np.int64)),
+                len(self.variables),
+            ),
+        )
+
+    @property
+    def time_dim(self) -> str:
+        return self.header['time_dim']
+
+    @property
+    def dims(self) -> tuple[str, ...]:
+        """The grid dimensions of the cells."""
+        return tuple(self.header['dims'])
+
+    def series(
+        self,
+        variables: Optional[list[str]] = None,
+    ) -> dict[str, xr.DataArray]:
+        """Return (time, *dims) DataArrays viewing the cache without copying."""
+        if variables is None:
+            variables = self.variables
+        shape: tuple[int, ...] = (len(self.times),) + tuple(self.header['sizes'])
+        coords: dict = {self.time_dim: self.times, **self.header['coords']}
+        series: dict[str, xr.DataArray] = {}
+        for name in variables:
+            if name not in self.variables:
+                raise KeyError(f'Variable {name} is not in the forcing cache.')
+            view: np.ndarray = self.data[:, :, self.variables.index(name)]
+            series[name] = xr.DataArray(
+                view.reshape(shape),
+                dims=(self.time_dim,) + self.dims,
+                coords=coords,
+            )
+        return series
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """Convert a NetCDF or CSV forcing file into a forcing cache."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('source', help='NetCDF or CSV forcing file.')
+    parser.add_argument('cache', help='The forcing cache to write.')
+    parser.add_argument('--variables', nargs='+', default=None)
+    parser.add_argument('--time-dim', default='time')
+    parser.add_argument('--cell-columns', nargs='+', default=None)
+    parser.add_argument('--dtype', default='float64')
+    parser.add_argument('--chunk-size', type=int, default=1024)
+    args = parser.parse_args(argv)
+    cache: ForcingCache = write_forcing_cache(
+        args.source,
+        args.cache,
+        variables=args.variables,
+        time_dim=args.time_dim,
+        dtype=args.dtype,
+        cell_columns=args.cell_columns,
+        chunk_size=args.chunk_size,
+    )
+    print(
+        f'Wrote {len(cache.variables)} variables, {len(cache.times)} times and '
+        f'{cache.data.shape[1]} cells to {cache.path}.'
+    )
+
+
+if __name__ == '__main__':
+    main()
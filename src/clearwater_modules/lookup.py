@@ -0,0 +1,207 @@
+"""Interpolation tables for dynamic variables of water temperature alone.
+
+Saturation concentrations, Henry's constants and other thermodynamic
+properties are smooth functions of water temperature (and of static values
+that are the same in every cell), but they are evaluated with exp and pow on
+every cell at every timestep. With lookup tables (see TemperatureTables),
+such variables are evaluated once on a regular temperature grid when the
+engine is built, and then linearly interpolated. The position of each cell in
+the grid is computed once per timestep and shared by all tables, so that
+each table costs two gathers and a multiply-add.
+
+The error of linear interpolation grows with the square of the resolution.
+It is largest at the middle of the table intervals, where it is measured when
+the tables are built (see TableLookup.max_error). Cells outside the range of
+the tables (or NaN) are computed exactly.
+"""
+import dataclasses
+import numpy as np
+from clearwater_modules.plan import ComputationPlan
+from clearwater_modules.shared.types import (
+    Process,
+)
+from typing import (
+    Optional,
+)
+
+Step = tuple[int, Process, tuple[int, ...]]
+
+
+@dataclasses.dataclass(frozen=True)
+class TemperatureTables:
+    """Settings of the temperature lookup tables (see Model lookup_tables).
+
+    Attributes:
+        resolution: The temperature step of the tables (degrees C).
+        t_min: The lowest temperature of the tables (degrees C).
+        t_max: The highest temperature of the tables (degrees C).
+        variables: The dynamic variables to tabulate. Defaults to the
+            model's (see Model._tabulated).
+        temperature: The water temperature variable (degrees C) the tables
+            are indexed by. Defaults to the model's (see Model._temperature).
+    """
+    resolution: float = 0.01
+    t_min: float = -5.0
+    t_max: float = 45.0
+    variables: Optional[tuple[str, ...]] = None
+    temperature: Optional[str] = None
+
+    def __post_init__(self) -> None:
+        if not self.resolution > 0 or not self.t_max > self.t_min:
+            raise ValueError(
+                'Lookup tables need a positive resolution and t_max > t_min, '
+                f'got resolution={self.resolution}, range=({self.t_min}, {self.t_max}).'
+            )
+
+    @property
+    def grid(self) -> np.ndarray:
+        """The temperatures of the table entries."""
+        n_steps: int = int(np.ceil((self.t_max - self.t_min) / self.resolution - 1e-9))
+        return self.t_min + self.resolution * np.arange(n_steps + 1)
+
+
+class TableIndex:
+    """Locates each cell's temperature in the tables.
+
+    Returns the index of the table interval of each cell and the position of
+    the cell within it, or None if a temperature is outside the tables.
+    """
+
+    def __init__(self, settings: TemperatureTables) -> None:
+        self.settings = settings
+        grid: np.ndarray = settings.grid
+        self.t_min: float = float(grid[0])
+        self.t_max: float = float(grid[-1])
+        self.scale: float = 1.0 / settings.resolution
+
+    def __call__(self, temperature) -> Optional[tuple[np.ndarray, np.ndarray]]:
+        temperature = np.asarray(temperature, dtype=np.float64)
+        # NaN temperatures fail both comparisons
+        if not (temperature.min() >= self.t_min and temperature.max() <= self.t_max):
+            return None
+        position: np.ndarray = temperature - self.t_min
+        position *= self.scale
+        index: np.ndarray = position.astype(np.intp)
+        position -= index
+        return index, position
+
+
+class TableLookup:
+    """Interpolates a tabulated variable at the located cell temperatures.
+
+    Attributes:
+        name: The tabulated variable.
+        table: The variable at each temperature of the grid, followed by a
+            copy of the last value (for temperatures equal to t_max).
+        slope: The difference to the next table entry.
+        max_error: The largest absolute interpolation error at the middle of
+            the table intervals.
+    """
+
+    def __init__(self, name: str, evaluate, slot: int, settings: TemperatureTables) -> None:
+        self.name = name
+        self._evaluate = evaluate
+        self._slot = slot
+        grid: np.ndarray = settings.grid
+        values: np.ndarray = self.exact(grid)
+        self.table: np.ndarray = np.append(values, values[-1])
+        self.slope: np.ndarray = np.append(np.diff(values), 0.0)
+
+        middle: np.ndarray = grid[:-1] + settings.resolution / 2
+        index = TableIndex(settings)(middle)
+        self.max_error: float = float(
+            np.nanmax(np.abs(self(index, middle) - self.exact(middle)))
+        )
+
+    def exact(self, temperature) -> np.ndarray:
+        """Compute the variable without the table."""
+        return np.broadcast_to(
+            np.asarray(self._evaluate(temperature)[self._slot], dtype=np.float64),
+            np.shape(temperature),
+        )
+
+    def __call__(self, index: Optional[tuple[np.ndarray, np.ndarray]], temperature) -> np.ndarray:
+        if index is None:
+            return np.array(self.exact(temperature))
+        cells, position = index
+        out: np.ndarray = self.table.take(cells)
+        out += self.slope.take(cells) * position
+        return out
+
+
+def temperature_chain(
+    steps: tuple[Step, ...],
+    temperature: int,
+    constants: dict[int, object],
+) -> list[Step]:
+    """Return the steps that only depend on a temperature slot and constants.
+
+    If the temperature is a state variable, only the steps before its update
+    (which read its value at the start of the timestep) are considered.
+
+    Args:
+        steps: Plan steps, in computation order.
+        temperature: The slot of the temperature the chain depends on.
+        constants: Values of slots that never change (e.g. uniform statics).
+    """
+    known: set[int] = {temperature, *constants}
+    chain: list[Step] = []
+    for out, func, args in steps:
+        if out == temperature:
+            break
+        if out not in known and all(slot in known for slot in args):
+            known.add(out)
+            chain.append((out, func, args))
+    return chain
+
+
+def build_tables(
+    plan: ComputationPlan,
+    steps: tuple[Step, ...],
+    constants: dict[int, object],
+    settings: TemperatureTables,
+    index_slot: int,
+) -> tuple[tuple[Step, ...], dict[str, TableLookup]]:
+    """Replace the steps of tabulated variables by table lookups.
+
+    Args:
+        plan: The computation plan of the steps.
+        steps: Plan steps, in computation order.
+        constants: Values of slots that never change (e.g. uniform statics).
+        settings: The table settings, with their variables and temperature.
+        index_slot: A free value slot, holding the located cell temperatures.
+
+    Returns:
+        The steps with table lookups, and the table of each variable.
+    """
+    temperature: int = plan.index[settings.temperature]
+    chain: list[Step] = temperature_chain(steps, temperature, constants)
+    in_chain: dict[str, Step] = {plan.names[step[0]]: step for step in chain}
+
+    def evaluate(values_at) -> dict[int, object]:
+        values: dict[int, object] = {**constants, temperature: values_at}
+        for out, func, args in chain:
+            values[out] = func(*[values[i] for i in args])
+        return values
+
+    tables: dict[str, TableLookup] = {}
+    for name in settings.variables or ():
+        if name not in in_chain:
+            continue
+        tables[name] = TableLookup(name, evaluate, plan.index[name], settings)
+    if not tables:
+        return steps, tables
+
+    tabulated: dict[int, TableLookup] = {
+        plan.index[name]: table for name, table in tables.items()
+    }
+    new_steps: list[Step] = []
+    for out, func, args in steps:
+        if out in tabulated:
+            # cells are located once, before the first lookup
+            if not any(step[0] == index_slot for step in new_steps):
+                new_steps.append((index_slot, TableIndex(settings), (temperature,)))
+            new_steps.append((out, tabulated[out], (index_slot, temperature)))
+        else:
+            new_steps.append((out, func, args))
+    return tuple(new_steps), tables
@@ -277,6 +277,49 @@ DEFAULT_GLOBALPARAMETERS = GlobalParameters(
     use_POM = True         
 )
 
+# Switches turning the modules on and off. Those that are uniform when
+# NutrientBudget is constructed are folded out of the processes reading them.
+MODULE_SWITCHES: tuple[str, ...] = (
+    'use_NH4',
+    'use_NO3',
+    'use_OrgN',
+    'use_OrgP',
+    'use_TIP',
+    'use_SedFlux',
+    'use_POC',
+    'use_DOC',
+    'use_DOX',
+    'use_DIC',
+    'use_Algae',
+    'use_Balgae',
+    'use_N2',
+    'use_Pathogen',
+    'use_Alk',
+    'use_POM',
+)
+
+# Static variables selecting between the formulas of a process. Options that
+# are uniform and not updateable when NutrientBudget is constructed are folded
+# into the processes, so that only the selected formulas are computed.
+OPTION_VARIABLES: tuple[str, ...] = (
+    'hydraulic_reaeration_option',
+    'wind_reaeration_option',
+    'growth_rate_option',
+    'light_limitation_option',
+    'b_growth_rate_option',
+    'b_light_limitation_option',
+)
+
+# Dynamic variables of water temperature alone that are interpolated in
+# temperature tables with NutrientBudget(lookup_tables=...), see lookup.py.
+TABULATED_VARIABLES: tuple[str, ...] = (
+    'pwv',
+    'DOX_sat',
+    'K_H',
+    'KHN2_tc',
+    'N2sat',
+)
+
 class GlobalVars(TypedDict):
     vson: float
     vsoc: float
@@ -8,6 +8,7 @@ from clearwater_modules.nsm1 import (
 from clearwater_modules import base
 import clearwater_modules.shared.processes as shared_processes
 from typing import (
+    Any,
     Optional,
 )
 
@@ -15,6 +16,10 @@ from typing import (
 class NutrientBudget(base.Model):
     """"""
     _variables: list[base.Variable] = []
+    _switches: tuple[str, ...] = constants.MODULE_SWITCHES
+    _options: tuple[str, ...] = constants.OPTION_VARIABLES
+    _tabulated: tuple[str, ...] = constants.TABULATED_VARIABLES
+    _temperature: str = 'TwaterC'
 
     def __init__(
         self,
@@ -37,20 +42,26 @@ class NutrientBudget(base.Model):
         track_dynamic_variables: bool = True,
         hotstart_dataset: Optional[xr.Dataset] = None,
         time_dim: Optional[str] = None,
+        **engine_options: Any,
     ) -> None:
-        self.__algae_parameters: constants.AlgaeStaticVariables = constants.DEFAULT_ALGAE
-        self.__alkalinity_parameters: constants.AlkalinityStaticVariables = constants.DEFAULT_ALKALINITY
-        self.__balgae_parameters: constants.BalgaeStaticVariables = constants.DEFAULT_BALGAE
-        self.__carbon_parameters: constants.CarbonStaticVariables = constants.DEFAULT_CARBON
-        self.__CBOD_parameters: constants.CBODStaticVariables = constants.DEFAULT_CBOD
-        self.__DOX_parameters: constants.DOXStaticVariables = constants.DEFAULT_DOX
-        self.__nitrogen_parameters: constants.NitrogenStaticVariables = constants.DEFAULT_NITROGEN
-        self.__POM_parameters: constants.POMStaticVariables = constants.DEFAULT_POM
-        self.__N2_parameters: constants.N2StaticVariables = constants.DEFAULT_N2
-        self.__phosphorus_parameters: constants.PhosphorusStaticVariables = constants.DEFAULT_PHOSPHORUS
-        self.__pathogen_parameters: constants.PathogenStaticVariables = constants.DEFAULT_PATHOGEN
-        self.__global_parameters: constants.PathogenStaticVariables = constants.DEFAULT_GLOBALPARAMETERS
-        self.__global_vars: constants.PathogenStaticVariables = constants.DEFAULT_GLOBALVARS
+        """Initialize the model.
+
+        Execution options (backend, output_interval, history_window, ...)
+        are passed to base.Model as engine_options, see base.Model.__init__.
+        """
+        self.__algae_parameters: constants.AlgaeStaticVariables = constants.DEFAULT_ALGAE.copy()
+        self.__alkalinity_parameters: constants.AlkalinityStaticVariables = constants.DEFAULT_ALKALINITY.copy()
+        self.__balgae_parameters: constants.BalgaeStaticVariables = constants.DEFAULT_BALGAE.copy()
+        self.__carbon_parameters: constants.CarbonStaticVariables = constants.DEFAULT_CARBON.copy()
+        self.__CBOD_parameters: constants.CBODStaticVariables = constants.DEFAULT_CBOD.copy()
+        self.__DOX_parameters: constants.DOXStaticVariables = constants.DEFAULT_DOX.copy()
+        self.__nitrogen_parameters: constants.NitrogenStaticVariables = constants.DEFAULT_NITROGEN.copy()
+        self.__POM_parameters: constants.POMStaticVariables = constants.DEFAULT_POM.copy()
+        self.__N2_parameters: constants.N2StaticVariables = constants.DEFAULT_N2.copy()
+        self.__phosphorus_parameters: constants.PhosphorusStaticVariables = constants.DEFAULT_PHOSPHORUS.copy()
+        self.__pathogen_parameters: constants.PathogenStaticVariables = constants.DEFAULT_PATHOGEN.copy()
+        self.__global_parameters: constants.PathogenStaticVariables = constants.DEFAULT_GLOBALPARAMETERS.copy()
+        self.__global_vars: constants.PathogenStaticVariables = constants.DEFAULT_GLOBALVARS.copy()
         
 
 
@@ -176,6 +187,7 @@ class NutrientBudget(base.Model):
             track_dynamic_variables=track_dynamic_variables,
             hotstart_dataset=hotstart_dataset,
             time_dim=time_dim,
+            **engine_options,
         )
 
     @property
@@ -0,0 +1,146 @@
+"""Per-cell option grouping for processes selecting between formulas.
+
+Processes taking option variables (named *_option, e.g.
+hydraulic_reaeration_option) select between their formulas with np.select,
+which evaluates every formula on every cell. Options that are uniform and
+not updateable are folded into the processes when the model is constructed
+(see base.Model._init_plan), but options that differ between cells (e.g.
+riverine and reservoir cells in one mesh) are not.
+
+GroupedProcess instead buckets the cells by their option values, and calls a
+version of the process specialized for each value (see
+codegen.fold_constants) on the cells of its bucket only, gathering its
+inputs and scattering its result. The buckets are only recomputed when the
+option values change.
+"""
+import numpy as np
+from clearwater_modules.codegen import fold_constants
+from clearwater_modules.shared.types import (
+    Process,
+)
+from clearwater_modules.sorter import get_process_args
+from typing import (
+    Iterable,
+    Optional,
+)
+
+
+class GroupedProcess:
+    """Runs a process on the cells of each combination of option values.
+
+    A GroupedProcess is called with the arguments of the process it wraps,
+    and returns the same values.
+
+    Attributes:
+        process: The wrapped process.
+        args: The argument names of the process.
+        options: The option arguments cells are grouped by.
+        groups: The option values of each group, and the flat indices of its
+            cells (None if all cells are in the group).
+    """
+
+    def __init__(self, process: Process, options: Iterable[str]) -> None:
+        self.process = process
+        self.args: list[str] = get_process_args(process)
+        self.options: list[str] = [arg for arg in self.args if arg in set(options)]
+        if not self.options:
+            raise ValueError(
+                f'{getattr(process, "__name__", process)} takes none of the options {options}.'
+            )
+        self._option_positions: list[int] = [
+            self.args.index(name) for name in self.options
+        ]
+        self.groups: list[tuple[tuple, Optional[np.ndarray]]] = []
+        # the option values the groups were computed for
+        self._grouped: Optional[list[np.ndarray]] = None
+        self._specialized: dict[tuple, tuple[Process, list[int]]] = {}
+
+    def specialize(self, key: tuple) -> tuple[Process, list[int]]:
+        """Return the process specialized for option values, and its argument positions."""
+        if key not in self._specialized:
+            func: Process = fold_constants(self.process, dict(zip(self.options, key)))
+            self._specialized[key] = (
+                func,
+                [self.args.index(name) for name in get_process_args(func)],
+            )
+        return self._specialized[key]
+
+    def _update_groups(self, options: list[np.ndarray], shape: tuple[int, ...]) -> None:
+        """Bucket the cells by option values, unless these did not change."""
+        if self._grouped is not None and all(
+            np.array_equal(value, grouped)
+            for value, grouped in zip(options, self._grouped)
+        ):
+            return
+        self._grouped = [np.array(value, copy=True) for value in options]
+        if all(value.ndim == 0 for value in options):
+            self.groups = [(tuple(value.item() for value in options), None)]
+            return
+
+        cells: np.ndarray = np.stack([
+            np.broadcast_to(value, shape).reshape(-1) for value in options
+        ])
+        keys, inverse = np.unique(cells, axis=1, return_inverse=True)
+        if keys.shape[1] == 1:
+            self.groups = [(tuple(keys[:, 0].tolist()), None)]
+            return
+        inverse = inverse.reshape(-1)
+        order: np.ndarray = np.argsort(inverse, kind='stable')
+        bounds: np.ndarray = np.cumsum(np.bincount(inverse, minlength=keys.shape[1]))
+        self.groups = [
+            (tuple(keys[:, i].tolist()), order[start:stop])
+            for i, (start, stop) in enumerate(zip([0, *bounds[:-1]], bounds))
+        ]
+
+    def __call__(self, *values):
+        options: list[np.ndarray] = [
+            np.asarray(values[i]) for i in self._option_positions
+        ]
+        shape: tuple[int, ...] = np.broadcast_shapes(*[np.shape(v) for v in values])
+        self._update_groups(options, shape)
+        if len(self.groups) == 1 and self.groups[0][1] is None:
+            func, positions = self.specialize(self.groups[0][0])
+            return func(*[values[i] for i in positions])
+
+        results: list = []
+        for key, cells in self.groups:
+            func, positions = self.specialize(key)
+            results.append(func(*[_gather(values[i], cells, shape) for i in positions]))
+        out: np.ndarray = np.empty(
+            int(np.prod(shape)),
+            dtype=np.result_type(*[np.asarray(result) for result in results]),
+        )
+        for (_, cells), result in zip(self.groups, results):
+            out[cells] = result
+        return out.reshape(shape)
+
+
+def _gather(value, cells: np.ndarray, shape: tuple[int, ...]):
+    """Return the values of a process argument at flat cell indices."""
+    array: np.ndarray = np.asarray(value)
+    if array.ndim == 0:
+        return value
+    if array.shape != shape:
+        array = np.broadcast_to(array, shape)
+    return array.reshape(-1)[cells]
+
+
+def group_option_steps(
+    steps: tuple[tuple[int, Process, tuple[int, ...]], ...],
+    names: tuple[str, ...],
+    suffix: str,
+) -> tuple[tuple[int, Process, tuple[int, ...]], ...]:
+    """Wrap the processes of plan steps taking option variables in GroupedProcess.
+
+    Args:
+        steps: (output slot, process, argument slots) plan steps.
+        names: The variable name of each slot.
+        suffix: The name suffix of option variables.
+    """
+    grouped: list[tuple[int, Process, tuple[int, ...]]] = []
+    for out, func, args in steps:
+        options: list[str] = [names[i] for i in args if names[i].endswith(suffix)]
+        if options:
+            func = GroupedProcess(func, options)
+        grouped.append((out, func, args))
+    return tuple(grouped)
@@ -0,0 +1,354 @@
+"""Domain decomposition of a model across worker processes.
+
+Cells do not interact within a timestep, so PartitionedModel splits the grid
+along one dimension into shards, each run by a model in its own worker
+process. Inputs (updateable variables set by the caller) and the current state
+are held in multiprocessing.shared_memory blocks that the workers bind in
+place (see Model.bind_inputs and Model.bind_outputs), and workers are stepped
+in lockstep through a barrier, so nothing is pickled per timestep. The full
+dataset is only gathered from the workers when it is read.
+"""
+import multiprocessing
+import multiprocessing.connection
+import threading
+import traceback
+import numpy as np
+import xarray as xr
+from multiprocessing import shared_memory
+from typing import (
+    Any,
+    Iterable,
+    Optional,
+)
+
+# control block commands
+STEP: int = 0
+DATASET: int = 1
+STOP: int = 2
+
+
+def _shard(value: Any, dim: str, index: slice) -> Any:
+    """Return the part of a model argument in one shard (DataArrays along dim)."""
+    if isinstance(value, (xr.DataArray, xr.Dataset)) and dim in value.dims:
+        return value.isel({dim: index})
+    if isinstance(value, dict):
+        return {key: _shard(item, dim, index) for key, item in value.items()}
+    return value
+
+
+def _attach(name: str, shape: tuple[int, ...]) -> tuple[shared_memory.SharedMemory, np.ndarray]:
+    block = shared_memory.SharedMemory(name=name)
+    return block, np.ndarray(shape, dtype=np.float64, buffer=block.buf)
+
+
+def _worker(
+    conn: multiprocessing.connection.Connection,
+    barrier: threading.Barrier,
+    model_class: type,
+    model_kwargs: dict,
+    control_name: str,
+    blocks: dict[str, tuple[str, tuple[int, ...]]],
+    inputs: list[str],
+    axis: int,
+    index: slice,
+) -> None:
+    """Run one shard, stepping it each time the control block says so."""
+    attached: list[shared_memory.SharedMemory] = []
+    try:
+        block, control = _attach(control_name, (2,))
+        attached.append(block)
+        model = model_class(**model_kwargs)
+        views: dict[str, np.ndarray] = {}
+        for name, (block_name, shape) in blocks.items():
+            block, array = _attach(block_name, shape)
+            attached.append(block)
+            selection: list = [slice(None)] * len(shape)
+            selection[axis] = index
+            views[name] = array[tuple(selection)]
+            views[name][...] = model._engine.current[name]
+        model.bind_inputs({name: views[name] for name in inputs})
+        model.bind_outputs({
+            name: view for name, view in views.items()
+            if name not in inputs and name in model.state_variables_names
+        })
+        conn.send(None)
+    except BaseException:
+        conn.send(traceback.format_exc())
+        barrier.abort()
+        return
+
+    try:
+        while True:
+            barrier.wait()
+            command: int = int(control[0])
+            if command == STEP:
+                model.run(int(control[1]))
+            elif command == DATASET:
+                conn.send(model.dataset)
+            else:
+                break
+            barrier.wait()
+    except threading.BrokenBarrierError:
+        pass
+    except BaseException:
+        conn.send(traceback.format_exc())
+        barrier.abort()
+    finally:
+        for block in attached:
+            block.close()
+
+
+class PartitionedModel:
+    """Runs a model class on shards of the grid in worker processes.
+
+    Attributes:
+        model_class: The model class run by each worker (e.g. EnergyBudget).
+        split_dim: The grid dimension split into shards.
+        shards: The index range of each shard along split_dim.
+        inputs: The variables read from shared memory at each timestep.
+        timestep: The current timestep.
+    """
+
+    def __init__(
+        self,
+        model_class: type,
+        n_workers: int,
+        split_dim: Optional[str] = None,
+        inputs: Optional[list[str]] = None,
+        mp_context: str = 'spawn',
+        **model_kwargs: Any,
+    ) -> None:
+        """Split the grid and start one worker process per shard.
+
+        Args:
+            model_class: A base.Model subclass.
+            n_workers: The number of shards (and worker processes).
+            split_dim: The grid dimension to split, defaults to the first
+                dimension of the state variables.
+            inputs: State or updateable static variables the caller sets
+                between timesteps (see increment_timestep). They are read from
+                shared memory at every timestep. Defaults to the
+                updateable_static_variables.
+            mp_context: The multiprocessing start method. Defaults to 'spawn',
+                as forking a process that has started numba's threading layer
+                (e.g. for parallel kernels) can deadlock. With 'spawn', scripts
+                must create the model under `if __name__ == '__main__':`.
+            model_kwargs: Arguments of model_class, e.g. time_steps,
+                initial_state_values or hotstart_dataset. DataArrays along
+                split_dim (also inside dicts) are split between the shards.
+        """
+        if not isinstance(n_workers, int) or n_workers < 1:
+            raise ValueError(
+                f'n_workers must be a positive integer, got {n_workers}.'
+            )
+        if model_kwargs.get('sinks'):
+            raise ValueError('Sinks are not supported by PartitionedModel.')
+
+        # the grid is taken from the initial state values or hotstart dataset
+        hotstart: Optional[xr.Dataset] = model_kwargs.get('hotstart_dataset')
+        time_dim: str = model_kwargs.get('time_dim') or 'time_step'
+        state_names: list[str] = [var.name for var in model_class.get_state_variables()]
+        grid: Optional[xr.DataArray] = None
+        if isinstance(model_kwargs.get('initial_state_values'), dict):
+            for value in model_kwargs['initial_state_values'].values():
+                if isinstance(value, xr.DataArray):
+                    grid = value
+                    break
+        elif isinstance(hotstart, xr.Dataset):
+            name: str = next(name for name in state_names if name in hotstart)
+            grid = hotstart[name].isel({time_dim: -1}, drop=True)
+        if grid is None:
+            raise ValueError(
+                'PartitionedModel requires DataArray initial state values or a hotstart dataset.'
+            )
+        if split_dim is None:
+            split_dim = str(grid.dims[0])
+        if split_dim not in grid.dims:
+            raise ValueError(f'split_dim {split_dim} is not a grid dimension.')
+        if grid.sizes[split_dim] < n_workers:
+            raise ValueError(
+                f'Cannot split {grid.sizes[split_dim]} cells along {split_dim} into {n_workers} shards.'
+            )
+
+        self.model_class = model_class
+        self.split_dim = split_dim
+        self.time_dim = time_dim
+        self.timestep: int = int(model_kwargs.get('timestep') or 0)
+        self.grid_dims: tuple[str, ...] = tuple(grid.dims)
+        self.grid_shape: tuple[int, ...] = tuple(grid.shape)
+        self.shards: list[slice] = [
+            slice(int(part[0]), int(part[-1]) + 1)
+            for part in np.array_split(np.arange(grid.sizes[split_dim]), n_workers)
+        ]
+        updateable: list[str] = list(model_kwargs.get('updateable_static_variables') or [])
+        self.inputs: list[str] = list(inputs) if inputs is not None else updateable
+        for name in self.inputs:
+            if name not in state_names + updateable:
+                raise ValueError(
+                    f'Input {name} must be a state or updateable static variable.'
+                )
+
+        self._blocks: dict[str, shared_memory.SharedMemory] = {}
+        self._arrays: dict[str, np.ndarray] = {}
+        self._control_block = shared_memory.SharedMemory(create=True, size=16)
+        self._control: np.ndarray = np.ndarray((2,), dtype=np.float64, buffer=self._control_block.buf)
+        for name in self.inputs + [name for name in state_names if name not in self.inputs]:
+            size: int = int(np.prod(self.grid_shape)) * 8
+            self._blocks[name] = shared_memory.SharedMemory(create=True, size=max(size, 1))
+            self._arrays[name] = np.ndarray(
+                self.grid_shape,
+                dtype=np.float64,
+                buffer=self._blocks[name].buf,
+            )
+
+        context = multiprocessing.get_context(mp_context)
+        self._barrier = context.Barrier(n_workers + 1)
+        self._connections: list[multiprocessing.connection.Connection] = []
+        self._workers: list = []
+        axis: int = self.grid_dims.index(split_dim)
+        for index in self.shards:
+            parent, child = context.Pipe()
+            worker = context.Process(
+                target=_worker,
+                args=(
+                    child,
+                    self._barrier,
+                    model_class,
+                    _shard(model_kwargs, split_dim, index),
+                    self._control_block.name,
+                    {
+                        name: (block.name, self.grid_shape)
+                        for name, block in self._blocks.items()
+                    },
+                    self.inputs,
+                    axis,
+                    index,
+                ),
+                daemon=True,
+            )
+            worker.start()
+            self._connections.append(parent)
+            self._workers.append(worker)
+        self._closed: bool = False
+        for conn in self._connections:
+            error: Optional[str] = conn.recv()
+            if error is not None:
+                self.close()
+                raise RuntimeError(f'A PartitionedModel worker failed:\n{error}')
+
+    def _round(self, command: int, n_steps: int = 0) -> None:
+        """Run one command on all workers, in lockstep."""
+        if self._closed:
+            raise RuntimeError('The PartitionedModel is closed.')
+        self._control[0] = command
+        self._control[1] = n_steps
+        try:
+            self._barrier.wait()
+            if command == DATASET:
+                self._datasets = [conn.recv() for conn in self._connections]
+            if command != STOP:
+                self._barrier.wait()
+        except (threading.BrokenBarrierError, EOFError):
+            errors: list[str] = []
+            for conn in self._connections:
+                try:
+                    if conn.poll(1.0):
+                        errors.append(conn.recv())
+                except (EOFError, OSError):
+                    pass
+            self.close()
+            raise RuntimeError(
+                'A PartitionedModel worker failed:\n' + '\n'.join(
+                    error for error in errors if isinstance(error, str)
+                )
+            )
+
+    @property
+    def state(self) -> dict[str, np.ndarray]:
+        """The current values of the state variables and inputs (shared memory)."""
+        return self._arrays
+
+    def increment_timestep(
+        self,
+        update_state_values: Optional[dict[str, Any]] = None,
+    ) -> None:
+        """Compute one timestep on all shards.
+
+        Args:
+            update_state_values: New values for inputs (see inputs), written to
+                shared memory before computing the timestep.
+        """
+        for name, value in (update_state_values or {}).items():
+            if name not in self.inputs:
+                raise ValueError(
+                    f'Variable {name} is not an input of the PartitionedModel.'
+                )
+            self._arrays[name][...] = getattr(value, 'values', value)
+        self._round(STEP, 1)
+        self.timestep += 1
+
+    def run(
+        self,
+        n_steps: int,
+        forcing: Optional[dict[str, xr.DataArray]] = None,
+    ) -> None:
+        """Compute n_steps timesteps on all shards.
+
+        Args:
+            n_steps: The number of timesteps to run.
+            forcing: A dict with input names as keys, and arrays with time as
+                their first dimension (of length n_steps) as values. Row i is
+                applied before step i.
+        """
+        if not forcing:
+            self._round(STEP, n_steps)
+            self.timestep += n_steps
+            return
+        arrays: dict[str, np.ndarray] = {
+            name: np.asarray(getattr(value, 'values', value))
+            for name, value in forcing.items()
+        }
+        for i in range(n_steps):
+            self.increment_timestep({name: array[i] for name, array in arrays.items()})
+
+    @property
+    def dataset(self) -> xr.Dataset:
+        """The model dataset, gathered from the shards along split_dim."""
+        self._round(DATASET)
+        datasets: list[xr.Dataset] = self._datasets
+        self._datasets = []
+        return xr.concat(
+            datasets,
+            dim=self.split_dim,
+            data_vars='minimal',
+            coords='minimal',
+            compat='override',
+            join='override',
+        )
+
+    def close(self) -> None:
+        """Stop the workers and free the shared memory."""
+        if self._closed:
+            return
+        self._closed = True
+        if not self._barrier.broken:
+            self._control[0] = STOP
+            try:
+                self._barrier.wait(timeout=10.0)
+            except threading.BrokenBarrierError:
+                pass
+        for worker in self._workers:
+            worker.join(timeout=10.0)
+            if worker.is_alive():
+                worker.terminate()
+        del self._control
+        self._arrays = {}
+        for block in [self._control_block, *self._blocks.values()]:
+            block.close()
+            block.unlink()
+
+    def __enter__(self) -> 'PartitionedModel':
+        return self
+
+    def __exit__(self, *args: Iterable) -> None:
+        self.close()
@@ -0,0 +1,320 @@
+"""Precompiled execution plans for a model's computation order.
+
+A ComputationPlan resolves everything needed to dispatch a timestep once per
+model class: the sorted computation order, the argument slots of each process
+and the slot each process writes to, so that a timestep never has to
+re-introspect process annotations.
+
+Plans can also be cached on disk, keyed by a hash of the registered variables
+and their process code, to skip sorting on a cold start. The disk cache is
+opt-in: set the CLEARWATER_MODULES_CACHE environment variable to a directory,
+or pass cache_dir to ComputationPlan.build(). A cache directory that cannot
+be read or written is treated as a cache miss.
+"""
+import hashlib
+import heapq
+import json
+import os
+import types
+import warnings
+from pathlib import Path
+import clearwater_modules.sorter as sorter
+from clearwater_modules.shared.types import (
+    Process,
+    Variable,
+)
+from typing import (
+    Iterable,
+    Optional,
+)
+
+PLAN_FORMAT_VERSION: int = 1
+CACHE_DIR_ENV: str = 'CLEARWATER_MODULES_CACHE'
+
+
+def get_cache_dir() -> Optional[Path]:
+    """Return the plan cache directory, or None if caching is disabled.
+
+    Plans are only cached on disk if the CLEARWATER_MODULES_CACHE environment
+    variable is set to a directory (it is disabled when unset or empty).
+    """
+    cache_dir: Optional[str] = os.environ.get(CACHE_DIR_ENV)
+    if not cache_dir:
+        return None
+    return Path(cache_dir)
+
+
+def _update_code_hash(code: types.CodeType, digest) -> None:
+    digest.update(code.co_code)
+    digest.update(repr(code.co_names).encode())
+    digest.update(repr(code.co_varnames).encode())
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            _update_code_hash(const, digest)
+        else:
+            digest.update(repr(const).encode())
+
+
+def variables_hash(variables: list[Variable]) -> str:
+    """Return a hash of registered variables and the code of their processes."""
+    digest = hashlib.sha256(str(PLAN_FORMAT_VERSION).encode())
+    for var in variables:
+        digest.update(f'{var.name}:{var.use}'.encode())
+        if var.process is None:
+            continue
+        func = getattr(var.process, 'py_func', var.process)
+        digest.update(
+            f'{getattr(func, "__module__", "")}.{getattr(func, "__qualname__", "")}'.encode()
+        )
+        code: Optional[types.CodeType] = getattr(func, '__code__', None)
+        if code is not None:
+            _update_code_hash(code, digest)
+        digest.update(
+            repr(list(getattr(func, '__annotations__', {}).keys())).encode()
+        )
+    return digest.hexdigest()
+
+
+class ComputationPlan:
+    """A resolved, index-based execution plan for a set of variables.
+
+    Attributes:
+        key: Hash of the variables (and process code) the plan was built from.
+        variables: The variables the plan was built from.
+        names: The name held by each value slot (one slot per variable).
+        index: Maps each variable name to its slot.
+        order: Dynamic and state variables, in computation order.
+        args: The process argument names of each variable in `order`.
+        steps: (output slot, process, argument slots) for each variable in `order`.
+    """
+
+    def __init__(
+        self,
+        variables: list[Variable],
+        order: list[str],
+        args: dict[str, list[str]],
+        key: Optional[str] = None,
+    ) -> None:
+        by_name: dict[str, Variable] = {var.name: var for var in variables}
+        self.key: str = key if key is not None else variables_hash(variables)
+        self.variables: tuple[Variable, ...] = tuple(by_name.values())
+        self.names: tuple[str, ...] = tuple(by_name.keys())
+        self.index: dict[str, int] = {
+            name: i for i, name in enumerate(self.names)
+        }
+        self.order: tuple[Variable, ...] = tuple(by_name[name] for name in order)
+        self.args: dict[str, tuple[str, ...]] = {
+            name: tuple(args[name]) for name in order
+        }
+
+        steps: list[tuple[int, Process, tuple[int, ...]]] = []
+        for var in self.order:
+            missing = [a for a in self.args[var.name] if a not in self.index]
+            if missing:
+                raise ValueError(
+                    f'Process for {var.name} requires unknown variables: {missing}'
+                )
+            steps.append((
+                self.index[var.name],
+                var.process,
+                tuple(self.index[a] for a in self.args[var.name]),
+            ))
+        self.steps: tuple[tuple[int, Process, tuple[int, ...]], ...] = tuple(steps)
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def time_invariant(self, static_names: Iterable[str]) -> tuple[str, ...]:
+        """Return the dynamic variables that do not change between timesteps.
+
+        A dynamic variable is time-invariant when all of its process arguments
+        are static (non-updateable) or time-invariant themselves, so that it
+        can be computed once instead of at every timestep.
+
+        Args:
+            static_names: Names of the variables whose values never change.
+
+        Returns:
+            The time-invariant variable names, in computation order.
+        """
+        invariant: set[str] = set(static_names)
+        hoisted: list[str] = []
+        for var in self.order:
+            if var.use != 'dynamic':
+                continue
+            if all(arg in invariant for arg in self.args[var.name]):
+                invariant.add(var.name)
+                hoisted.append(var.name)
+        return tuple(hoisted)
+
+    def levels(
+        self,
+        steps: Optional[tuple[tuple[int, Process, tuple[int, ...]], ...]] = None,
+    ) -> list[tuple[tuple[int, Process, tuple[int, ...]], ...]]:
+        """Group steps into dependency levels (see sorter.dependency_levels).
+
+        Steps within a level are independent of each other, so they can be
+        run concurrently.
+
+        Args:
+            steps: A subsequence of self.steps, defaults to all steps.
+        """
+        if steps is None:
+            steps = self.steps
+        by_name: dict[str, tuple[int, Process, tuple[int, ...]]] = {
+            self.names[step[0]]: step for step in steps
+        }
+        levels: list[list[Variable]] = sorter.dependency_levels(
+            [self.variables[step[0]] for step in steps],
+        )
+        return [
+            tuple(by_name[var.name] for var in level) for level in levels
+        ]
+
+    def live_ranges(
+        self,
+        steps: Optional[tuple[tuple[int, Process, tuple[int, ...]], ...]] = None,
+    ) -> dict[int, tuple[int, int]]:
+        """Return the range of steps during which each computed slot is live.
+
+        A slot is live from the step computing it to the last step reading
+        it, or only during its own step if no later step reads it. Reads
+        before a slot is computed (e.g. the previous value of a state
+        variable) are not part of its range.
+
+        Args:
+            steps: A subsequence of self.steps, defaults to all steps.
+
+        Returns:
+            The (first, last) step index of each slot computed by steps.
+        """
+        if steps is None:
+            steps = self.steps
+        ranges: dict[int, tuple[int, int]] = {}
+        for i, (out, _, args) in enumerate(steps):
+            for slot in args:
+                if slot in ranges:
+                    ranges[slot] = (ranges[slot][0], i)
+            ranges[out] = (i, i)
+        return ranges
+
+    def assign_buffers(
+        self,
+        slots: Iterable[int],
+        steps: Optional[tuple[tuple[int, Process, tuple[int, ...]], ...]] = None,
+    ) -> dict[int, int]:
+        """Assign computed slots to reusable buffers (linear scan allocation).
+
+        Slots that are live at the same step get different buffers, so the
+        number of buffers is the largest number of these slots live at once.
+
+        Args:
+            slots: The slots to assign, computed by steps.
+            steps: A subsequence of self.steps, defaults to all steps.
+
+        Returns:
+            The buffer index of each slot.
+        """
+        ranges: dict[int, tuple[int, int]] = self.live_ranges(steps)
+        slots = sorted(set(slots), key=lambda slot: ranges[slot][0])
+        buffers: dict[int, int] = {}
+        free: list[int] = []
+        # (last step, buffer) of the assigned slots, by last step
+        active: list[tuple[int, int]] = []
+        n_buffers: int = 0
+        for slot in slots:
+            first, last = ranges[slot]
+            while active and active[0][0] < first:
+                free.append(heapq.heappop(active)[1])
+            if free:
+                buffer: int = free.pop()
+            else:
+                buffer = n_buffers
+                n_buffers += 1
+            buffers[slot] = buffer
+            heapq.heappush(active, (last, buffer))
+        return buffers
+
+    @classmethod
+    def build(
+        cls,
+        variables: list[Variable],
+        cache_dir: Optional[Path] = None,
+    ) -> 'ComputationPlan':
+        """Build a plan, loading it from (or saving it to) the on-disk cache.
+
+        Args:
+            variables: All variables registered with a model.
+            cache_dir: Directory used to persist plans. Defaults to get_cache_dir()
+                (no disk cache unless CLEARWATER_MODULES_CACHE is set).
+        """
+        if cache_dir is None:
+            cache_dir = get_cache_dir()
+        key: str = variables_hash(variables)
+
+        path: Optional[Path] = None
+        if cache_dir is not None:
+            path = Path(cache_dir) / f'{key}.json'
+            try:
+                if path.exists():
+                    return cls.load(path, variables, key=key)
+            except OSError:
+                pass  # an inaccessible cache directory is a cache miss
+            except (ValueError, KeyError, json.JSONDecodeError):
+                warnings.warn(f'Ignoring unreadable plan cache: {path}')
+
+        order: list[Variable] = sorter.sort_variables_for_computation(
+            sorter.split_variables(variables),
+        )
+        plan = cls(
+            variables,
+            order=[var.name for var in order],
+            args={
+                var.name: sorter.get_process_args(var.process)
+                for var in order
+            },
+            key=key,
+        )
+        if path is not None:
+            try:
+                plan.save(path)
+            except OSError:
+                pass  # an unwritable cache directory is a cache miss
+        return plan
+
+    def to_dict(self) -> dict:
+        """Return a JSON-serializable representation of the plan."""
+        return {
+            'version': PLAN_FORMAT_VERSION,
+            'key': self.key,
+            'order': [var.name for var in self.order],
+            'args': {name: list(args) for name, args in self.args.items()},
+        }
+
+    def save(self, path: Path | str) -> None:
+        """Write the plan to a JSON file."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path: Path = path.with_suffix(f'.{os.getpid()}.tmp')
+        tmp_path.write_text(json.dumps(self.to_dict()))
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(
+        cls,
+        path: Path | str,
+        variables: list[Variable],
+        key: Optional[str] = None,
+    ) -> 'ComputationPlan':
+        """Load a plan from a JSON file, binding it to registered variables."""
+        data: dict = json.loads(Path(path).read_text())
+        if data.get('version') != PLAN_FORMAT_VERSION:
+            raise ValueError(f'Unsupported plan format in {path}.')
+        if key is not None and data['key'] != key:
+            raise ValueError(f'Plan {path} does not match the registered variables.')
+        return cls(
+            variables,
+            order=data['order'],
+            args=data['args'],
+            key=data['key'],
+        )
@@ -0,0 +1,419 @@
+"""Streaming output sinks that persist model results while a model runs.
+
+A sink is opened with the model dataset, then receives the temporal variables
+of every output step. Steps are buffered in memory in chunks of `chunk_size`
+along the time dimension and appended to the store when a chunk is full (and
+on close), so peak memory is bounded by the chunk size and a crashed run keeps
+every chunk written so far.
+
+BackgroundSink wraps any sink to run its appends on a writer thread.
+
+Zarr and netCDF4 are optional dependencies, imported when a sink is opened.
+"""
+import queue
+import threading
+import time
+import numpy as np
+import xarray as xr
+from pathlib import Path
+from typing import (
+    Optional,
+)
+
+
+class OutputSink:
+    """Base class for sinks appending output steps along the time dimension.
+
+    Subclasses implement _create() (write static variables and metadata) and
+    _append() (append a chunk of output steps). The chunk passed to _append()
+    wraps the sink's buffers, which are reused for the next chunk.
+
+    Attributes:
+        chunk_size: The number of output steps buffered before appending.
+        time_dim: The name of the time dimension (set when opened).
+        variables: The temporal variables written by the sink.
+        steps_written: The number of output steps appended to the store.
+    """
+
+    def __init__(self, chunk_size: int = 100) -> None:
+        if chunk_size < 1:
+            raise ValueError(
+                f'chunk_size must be a positive integer, got {chunk_size}.'
+            )
+        self.chunk_size = chunk_size
+        self.time_dim: Optional[str] = None
+        self.variables: list[str] = []
+        self.steps_written: int = 0
+        self._template: Optional[xr.Dataset] = None
+        self._buffers: dict[str, np.ndarray] = {}
+        self._timesteps: np.ndarray = np.zeros(chunk_size, dtype=np.int64)
+        self._n_buffered: int = 0
+
+    @property
+    def is_open(self) -> bool:
+        return self._template is not None
+
+    def open(self, dataset: xr.Dataset, time_dim: str) -> None:
+        """Prepare the store from a model dataset (one step along time_dim).
+
+        Static variables are written once; temporal variables are appended
+        by write().
+        """
+        if self.is_open:
+            raise ValueError('Sink is already open.')
+        self.time_dim = time_dim
+        self.variables = [
+            name for name, data_array in dataset.data_vars.items()
+            if time_dim in data_array.dims
+        ]
+        self._template = dataset.isel({time_dim: slice(0, 0)})
+        self._buffers = {
+            name: np.empty(
+                (self.chunk_size,) + dataset[name].shape[1:],
+                dtype=dataset[name].dtype,
+            )
+            for name in self.variables
+        }
+        self._create(dataset.drop_vars(self.variables + [time_dim]))
+
+    def write(self, timestep: int, arrays: dict[str, np.ndarray]) -> None:
+        """Buffer one output step, appending the chunk to the store when full."""
+        if not self.is_open:
+            raise ValueError('Sink must be opened before writing.')
+        i: int = self._n_buffered
+        for name, buffer in self._buffers.items():
+            buffer[i] = arrays[name]
+        self._timesteps[i] = timestep
+        self._n_buffered += 1
+        if self._n_buffered == self.chunk_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Append all buffered output steps to the store."""
+        n: int = self._n_buffered
+        if n == 0:
+            return
+        chunk: xr.Dataset = xr.Dataset(
+            data_vars={
+                name: (
+                    self._template[name].dims,
+                    self._buffers[name][:n],
+                    self._template[name].attrs,
+                )
+                for name in self.variables
+            },
+            coords={
+                **{
+                    key: value for key, value in self._template.coords.items()
+                    if key != self.time_dim
+                },
+                self.time_dim: self._timesteps[:n],
+            },
+            attrs=self._template.attrs,
+        )
+        self._append(chunk)
+        self.steps_written += n
+        self._n_buffered = 0
+
+    def close(self) -> None:
+        """Flush any buffered steps and close the store."""
+        try:
+            if self.is_open:
+                self.flush()
+        finally:
+            if self.is_open:
+                self._close()
+            self._template = None
+            self._buffers = {}
+
+    def _create(self, static_dataset: xr.Dataset) -> None:
+        raise NotImplementedError
+
+    def _append(self, chunk: xr.Dataset) -> None:
+        raise NotImplementedError
+
+    def _close(self) -> None:
+        pass
+
+
+class ZarrSink(OutputSink):
+    """Appends output steps to a chunked Zarr store along the time dimension.
+
+    Args:
+        store: The path (or zarr store) to write to. Existing data is replaced.
+        chunk_size: The number of output steps per Zarr chunk (and per append).
+        encoding: Optional extra xarray encoding per variable, e.g. compressors.
+    """
+
+    def __init__(
+        self,
+        store: str | Path,
+        chunk_size: int = 100,
+        encoding: Optional[dict[str, dict]] = None,
+    ) -> None:
+        super().__init__(chunk_size=chunk_size)
+        self.store = store
+        self.encoding = encoding if encoding is not None else {}
+        self._static: Optional[xr.Dataset] = None
+
+    def _create(self, static_dataset: xr.Dataset) -> None:
+        try:
+            import zarr  # noqa: F401
+        except ImportError as e:
+            raise ImportError(
+                'ZarrSink requires zarr, install it with `pip install zarr`.'
+            ) from e
+        # the store is created with the first chunk, so that time is appendable
+        self._static = static_dataset
+
+    def _append(self, chunk: xr.Dataset) -> None:
+        if self.steps_written == 0:
+            dataset: xr.Dataset = xr.merge(
+                [self._static, chunk],
+                combine_attrs='override',
+            )
+            encoding: dict[str, dict] = {
+                name: {
+                    'chunks': (self.chunk_size,) + chunk[name].shape[1:],
+                    **self.encoding.get(name, {}),
+                }
+                for name in self.variables
+            }
+            dataset.to_zarr(self.store, mode='w', encoding=encoding)
+        else:
+            chunk.to_zarr(self.store, append_dim=self.time_dim)
+
+
+class NetCDFSink(OutputSink):
+    """Appends output steps to a NetCDF4 file with an unlimited time dimension.
+
+    Args:
+        path: The NetCDF file to write. Existing files are replaced.
+        chunk_size: The number of output steps buffered before appending, also
+            used as the NetCDF chunk length along time.
+        compression: The NetCDF4 compression ('zlib', 'zstd', ...), or None.
+        complevel: The compression level (1-9).
+        chunksizes: Optional NetCDF chunk sizes per variable, overriding
+            (chunk_size, *grid).
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        chunk_size: int = 100,
+        compression: Optional[str] = 'zlib',
+        complevel: int = 4,
+        chunksizes: Optional[dict[str, tuple[int, ...]]] = None,
+    ) -> None:
+        super().__init__(chunk_size=chunk_size)
+        self.path = Path(path)
+        self.compression = compression
+        self.complevel = complevel
+        self.chunksizes = chunksizes if chunksizes is not None else {}
+        self._file = None
+
+    def _create(self, static_dataset: xr.Dataset) -> None:
+        try:
+            import netCDF4
+        except ImportError as e:
+            raise ImportError(
+                'NetCDFSink requires netCDF4, install it with `pip install netCDF4`.'
+            ) from e
+        template: xr.Dataset = self._template
+        nc = netCDF4.Dataset(self.path, mode='w')
+        nc.setncatts(_nc_attrs(template.attrs))
+        nc.createDimension(self.time_dim, None)
+        for dim, size in template.sizes.items():
+            if dim != self.time_dim:
+                nc.createDimension(dim, size)
+
+        nc.createVariable(self.time_dim, 'i8', (self.time_dim,))
+        for name, coord in template.coords.items():
+            if name == self.time_dim:
+                continue
+            variable = nc.createVariable(name, coord.dtype, coord.dims)
+            variable[:] = coord.values
+
+        for name, data_array in static_dataset.data_vars.items():
+            variable = nc.createVariable(
+                name,
+                _nc_dtype(data_array.dtype),
+                data_array.dims,
+            )
+            variable.setncatts(_nc_attrs(data_array.attrs))
+            variable[:] = data_array.values.astype(_nc_dtype(data_array.dtype))
+
+        for name in self.variables:
+            data_array: xr.DataArray = template[name]
+            variable = nc.createVariable(
+                name,
+                _nc_dtype(data_array.dtype),
+                data_array.dims,
+                compression=self.compression,
+                complevel=self.complevel,
+                chunksizes=self.chunksizes.get(
+                    name,
+                    (self.chunk_size,) + data_array.shape[1:],
+                ),
+            )
+            variable.setncatts(_nc_attrs(data_array.attrs))
+        self._file = nc
+
+    def _append(self, chunk: xr.Dataset) -> None:
+        start: int = self.steps_written
+        stop: int = start + chunk.sizes[self.time_dim]
+        self._file[self.time_dim][start:stop] = chunk[self.time_dim].values
+        for name in self.variables:
+            values: np.ndarray = chunk[name].values
+            self._file[name][start:stop] = values.astype(_nc_dtype(values.dtype))
+        self._file.sync()
+
+    def _close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class BackgroundSink(OutputSink):
+    """Runs an output sink on a writer thread, overlapping compute and I/O.
+
+    Each output step is copied into one of `n_buffers` step buffers (double
+    buffering by default) and handed to the writer thread, so the compute
+    loop only waits when every buffer is still queued (back-pressure).
+    Appends, compression and disk writes of the wrapped sink happen on the
+    writer thread.
+
+    Args:
+        sink: The output sink to run in the background.
+        n_buffers: The number of step buffers shared with the writer thread.
+
+    Attributes:
+        blocked_time: Seconds the compute loop spent waiting for a free buffer.
+        steps_submitted: Output steps handed to the writer thread.
+        steps_written: Output steps passed on to the wrapped sink.
+        max_lag: The largest number of steps queued for the writer at once.
+    """
+
+    def __init__(self, sink: OutputSink, n_buffers: int = 2) -> None:
+        if n_buffers < 1:
+            raise ValueError(
+                f'n_buffers must be a positive integer, got {n_buffers}.'
+            )
+        super().__init__(chunk_size=sink.chunk_size)
+        self.sink = sink
+        self.n_buffers = n_buffers
+        self.blocked_time: float = 0.0
+        self.steps_submitted: int = 0
+        self.max_lag: int = 0
+        self._step_buffers: list[dict[str, np.ndarray]] = []
+        self._free: queue.Queue = queue.Queue()
+        self._work: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._error: Optional[BaseException] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._thread is not None
+
+    @property
+    def lag(self) -> int:
+        """The number of output steps queued for, or being written by, the writer."""
+        return self.steps_submitted - self.steps_written
+
+    def open(self, dataset: xr.Dataset, time_dim: str) -> None:
+        if self.is_open:
+            raise ValueError('Sink is already open.')
+        self.sink.open(dataset, time_dim)
+        self.time_dim = time_dim
+        self.variables = list(self.sink.variables)
+        self._step_buffers = [
+            {
+                name: np.empty(dataset[name].shape[1:], dtype=dataset[name].dtype)
+                for name in self.variables
+            }
+            for _ in range(self.n_buffers)
+        ]
+        for i in range(self.n_buffers):
+            self._free.put(i)
+        self._thread = threading.Thread(
+            target=self._run,
+            name=f'{type(self.sink).__name__}-writer',
+            daemon=True,
+        )
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self._work.get()
+            try:
+                if item is None:
+                    return
+                command, timestep, i = item
+                if self._error is None:
+                    if command == 'write':
+                        self.sink.write(timestep, self._step_buffers[i])
+                        self.steps_written += 1
+                    else:
+                        self.sink.flush()
+            except BaseException as e:
+                self._error = e
+            finally:
+                if item is not None and item[0] == 'write':
+                    self._free.put(item[2])
+                self._work.task_done()
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError('The background output writer failed.') from error
+
+    def write(self, timestep: int, arrays: dict[str, np.ndarray]) -> None:
+        """Copy one output step to a free buffer and queue it for the writer."""
+        if not self.is_open:
+            raise ValueError('Sink must be opened before writing.')
+        self._raise_error()
+        start: float = time.perf_counter()
+        i: int = self._free.get()
+        self.blocked_time += time.perf_counter() - start
+
+        for name, buffer in self._step_buffers[i].items():
+            buffer[...] = arrays[name]
+        self._work.put(('write', timestep, i))
+        self.steps_submitted += 1
+        self.max_lag = max(self.max_lag, self.lag)
+
+    def flush(self) -> None:
+        """Wait for all queued steps and flush the wrapped sink."""
+        if not self.is_open:
+            return
+        self._work.put(('flush', None, None))
+        self._work.join()
+        self._raise_error()
+
+    def close(self) -> None:
+        """Write all queued steps, then stop the writer and close the sink."""
+        try:
+            if self.is_open:
+                self._work.put(None)
+                self._thread.join()
+                self._thread = None
+                self._raise_error()
+        finally:
+            # the wrapped sink's files are closed even if the writer failed
+            self.sink.close()
+
+
+def _nc_dtype(dtype: np.dtype) -> np.dtype:
+    """NetCDF has no boolean type, so flags are stored as bytes."""
+    if dtype == np.bool_:
+        return np.dtype('i1')
+    return dtype
+
+
+def _nc_attrs(attrs: dict) -> dict:
+    """Return attributes NetCDF can store (booleans are stored as ints)."""
+    return {
+        key: int(value) if isinstance(value, (bool, np.bool_)) else value
+        for key, value in attrs.items()
+        if value is not None
+    }
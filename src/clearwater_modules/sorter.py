@@ -38,27 +38,59 @@ def __rapid_sort(
     state_vars: list[str],
     variable_args_dict: dict[str, tuple[Variable, list[str]]],
 ) -> list[Variable]:
-    """Sorts dynamic variables based on their required arguments."""
-    ordered_vars: list[Variable] = []
-    previous_len: int = len(variable_args_dict)
-    while len(variable_args_dict) > 0:
-        drop_keys: list[str] = []
-        for var_name, item in variable_args_dict.items():
-            var, args = item
-            ordered_names: list[str] = [var.name for var in ordered_vars]
-            if all(arg in ordered_names + static_vars + state_vars for arg in args):
-                ordered_vars.append(var)
-                drop_keys.append(var_name)
-        for key in drop_keys:
-            variable_args_dict.pop(key)
-        if len(variable_args_dict) == previous_len:
-            raise ValueError(
-                f'Circular dependency detected in dynamic/state variables! '
-                f'Variables remaining: {list(variable_args_dict.keys())}'
-            )
-        else:
-            previous_len = len(variable_args_dict)
-    return ordered_vars
+    """Sorts dynamic variables based on their required arguments.
+
+    The order matches repeatedly sweeping over the remaining variables (in
+    registration order) and appending each one whose arguments are available,
+    but is computed in linear time: a topological (Kahn) pass assigns each
+    variable the sweep it would be appended in, and variables are then bucketed
+    by sweep.
+    """
+    available: set[str] = set(static_vars) | set(state_vars)
+    names: list[str] = list(variable_args_dict.keys())
+    position: dict[str, int] = {name: i for i, name in enumerate(names)}
+
+    # build the dependency graph between dynamic/state variables
+    dependents: dict[str, list[str]] = {name: [] for name in names}
+    n_missing: dict[str, int] = {}
+    for name, (_, args) in variable_args_dict.items():
+        # static and state variables are available from the start
+        deps: set[str] = {
+            arg for arg in args if arg in position and arg not in available
+        }
+        unknown: bool = any(
+            arg not in position and arg not in available for arg in args
+        )
+        for dep in deps:
+            dependents[dep].append(name)
+        # variables with unknown arguments can never be computed
+        n_missing[name] = len(deps) + int(unknown)
+
+    sweep: dict[str, int] = {name: 0 for name in names}
+    ready: list[str] = [name for name in names if n_missing[name] == 0]
+    n_sorted: int = 0
+    while ready:
+        name = ready.pop()
+        n_sorted += 1
+        for dependent in dependents[name]:
+            # a later-registered dependency is only appended in a later sweep
+            offset: int = int(position[name] > position[dependent])
+            sweep[dependent] = max(sweep[dependent], sweep[name] + offset)
+            n_missing[dependent] -= 1
+            if n_missing[dependent] == 0:
+                ready.append(dependent)
+
+    if n_sorted != len(names):
+        remaining: list[str] = [name for name in names if n_missing[name] > 0]
+        raise ValueError(
+            f'Circular dependency detected in dynamic/state variables! '
+            f'Variables remaining: {remaining}'
+        )
+
+    buckets: list[list[Variable]] = [[] for _ in range(max(sweep.values(), default=-1) + 1)]
+    for name in names:
+        buckets[sweep[name]].append(variable_args_dict[name][0])
+    return [var for bucket in buckets for var in bucket]
 
 
 def sort_variables_for_computation(variables_dict: SplitVariablesDict) -> list[Variable]:
@@ -81,3 +113,44 @@ def sort_variables_for_computation(variables_dict: SplitVariablesDict) -> list[V
             arg_names.remove(var.name)
         variable_args[var.name] = (var, arg_names)
     return __rapid_sort(static_vars, state_vars, variable_args)
+
+
+def dependency_levels(order: list[Variable]) -> list[list[Variable]]:
+    """Group sorted dynamic/state variables into dependency levels (wavefronts).
+
+    A variable's level is one more than the levels of the variables it reads
+    that are computed before it in `order`. A state variable is also placed
+    after the variables reading its previous value, so that running the levels
+    in sequence, with any order (or concurrently) within a level, gives the
+    same values as running `order`.
+
+    Args:
+        order: Variables in computation order (see sort_variables_for_computation).
+
+    Returns:
+        The variables of each level, in order within each level.
+    """
+    written: dict[str, int] = {}
+    read: dict[str, int] = {}
+    levels: list[list[Variable]] = []
+    for var in order:
+        if var.process is None:
+            raise ValueError(
+                f'Dynamic/state variable {var.name} must be calculated by a process.'
+            )
+        args: list[str] = [
+            arg for arg in get_process_args(var.process) if arg != var.name
+        ]
+        level: int = 0
+        for arg in args:
+            if arg in written:
+                level = max(level, written[arg] + 1)
+        if var.name in read:
+            level = max(level, read[var.name] + 1)
+        written[var.name] = level
+        for arg in args:
+            read[arg] = max(read.get(arg, 0), level)
+        if level == len(levels):
+            levels.append([])
+        levels[level].append(var)
+    return levels
@@ -0,0 +1,173 @@
+"""Cache-tiled execution of a computation plan with the NumPy backend.
+
+The NumPy backend runs each process over the whole grid, so on large grids
+every intermediate array is written out to main memory and read back by the
+processes using it. TiledExecutor instead runs all the steps on one block of
+tile_size cells before moving on to the next block, so that the intermediates
+of a block stay in cache. Grid inputs are passed to the processes as
+(flattened) views of each block, and only the values needed after the
+timestep (see FusedExecutor needed_slots) are scattered back into grid-sized
+arrays.
+
+Intermediates are written into a few tile-sized scratch buffers, reused by
+every block, through the out= variants of their processes (see
+codegen.out_function), like the arena of the untiled NumPy backend (see
+arena.py). Intermediates that are live at the same time get different
+buffers (see ComputationPlan.assign_buffers), so the scratch space of a block
+is bounded by the intermediates live at once, and blocks allocate no new
+arrays for them.
+
+A good tile_size keeps the arrays of a block within the L2 cache while
+amortizing the Python call of each process over enough cells, e.g. 16,384
+cells (see examples/dev_sandbox/readme.md).
+"""
+import numpy as np
+from clearwater_modules.codegen import out_function
+from clearwater_modules.plan import ComputationPlan
+from clearwater_modules.shared.types import (
+    Process,
+)
+from typing import (
+    Optional,
+)
+
+
+class TiledExecutor:
+    """Runs plan steps block by block over the cells of the grid.
+
+    The scratch buffers are assigned on the first call: its first block is
+    computed without them, and the results are used to find the
+    intermediates that are block-sized floats, which are the ones stored in
+    the scratch buffers.
+
+    Attributes:
+        plan: The computation plan being executed.
+        needed_slots: Slots that must be materialized as grid arrays after the
+            step (e.g. state and tracked variables).
+        shape: The shape of the model grid.
+        tile_size: The number of cells computed at once.
+        steps: The plan steps to run (defaults to all of plan.steps).
+        buffers: The tile-sized scratch buffers, once assigned.
+        scratch_slots: The buffer index of each slot stored in a scratch buffer.
+    """
+
+    def __init__(
+        self,
+        plan: ComputationPlan,
+        needed_slots: set[int],
+        shape: tuple[int, ...],
+        tile_size: int,
+        steps: Optional[tuple[tuple[int, Process, tuple[int, ...]], ...]] = None,
+    ) -> None:
+        if not isinstance(tile_size, int) or tile_size < 1:
+            raise ValueError(
+                f'tile_size must be a positive integer, got {tile_size}.'
+            )
+        self.plan = plan
+        self.needed_slots = set(needed_slots)
+        self.shape = shape
+        self.size = int(np.prod(shape))
+        self.tile_size = tile_size
+        self.steps = plan.steps if steps is None else steps
+
+        # slots read before they are computed (e.g. previous state values)
+        written: set[int] = set()
+        in_slots: set[int] = set()
+        for out, _, args in self.steps:
+            in_slots.update(slot for slot in args if slot not in written)
+            written.add(out)
+        self._in_slots: list[int] = sorted(in_slots)
+        self._out_slots: list[int] = [
+            out for out, _, _ in self.steps if out in self.needed_slots
+        ]
+        # the values of the current block, reused between blocks and steps
+        self._block: list = []
+        self.buffers: list[np.ndarray] = []
+        self.scratch_slots: dict[int, int] = {}
+        self._stages: Optional[list[tuple]] = None
+
+    def _cells(self, value) -> Optional[np.ndarray]:
+        """Return a grid value as a flat array of cells, or None if uniform."""
+        array: np.ndarray = np.asarray(value)
+        if array.ndim == 0:
+            return None
+        if array.shape != self.shape:
+            array = np.broadcast_to(array, self.shape)
+        return array.reshape(-1)
+
+    def __call__(self, values: list) -> None:
+        size: int = self.size
+        if len(self._block) != len(values):
+            self._block = [None] * len(values)
+        block: list = self._block
+        cells: list[tuple[int, np.ndarray]] = []
+        for slot in self._in_slots:
+            flat: Optional[np.ndarray] = self._cells(values[slot])
+            if flat is None:
+                block[slot] = values[slot]
+            else:
+                cells.append((slot, flat))
+
+        outputs: dict[int, np.ndarray] = {}
+        for start in range(0, size, self.tile_size):
+            stop: int = min(start + self.tile_size, size)
+            for slot, flat in cells:
+                block[slot] = flat[start:stop]
+            if self._stages is None:
+                results: list[tuple] = []
+                for out, func, args in self.steps:
+                    inputs: list = [block[i] for i in args]
+                    block[out] = func(*inputs)
+                    results.append((block[out], inputs))
+                self._stages = self.build(results, stop - start)
+            else:
+                # the last block can be smaller than the buffers
+                buffers: list[np.ndarray] = [
+                    buffer[:stop - start] for buffer in self.buffers
+                ] if stop - start < self.tile_size else self.buffers
+                for out, func, args, buffer in self._stages:
+                    if buffer is None:
+                        block[out] = func(*[block[i] for i in args])
+                    else:
+                        block[out] = func(*[block[i] for i in args], buffers[buffer])
+            for slot in self._out_slots:
+                result: np.ndarray = np.asarray(block[slot])
+                if slot not in outputs:
+                    outputs[slot] = np.empty(size, dtype=result.dtype)
+                outputs[slot][start:stop] = result
+
+        for slot, output in outputs.items():
+            values[slot] = output.reshape(self.shape)
+        # release the block views of the inputs
+        for slot, _ in cells:
+            block[slot] = None
+
+    def build(self, results: list[tuple], length: int) -> list[tuple]:
+        """Assign the scratch buffers, using the (result, inputs) of each step of a block."""
+        functions: dict[int, object] = {}
+        # results viewing their inputs would be overwritten with the inputs
+        views: set[int] = set()
+        for (out, func, args), (result, inputs) in zip(self.steps, results):
+            array: np.ndarray = np.asarray(result)
+            if array.base is not None or any(result is value for value in inputs):
+                views.update(args)
+            if out in self.needed_slots:
+                continue
+            if array.shape != (length,) or array.dtype != np.float64:
+                continue
+            variant = out_function(func)
+            if variant is not None:
+                functions[out] = variant
+        for slot in views:
+            functions.pop(slot, None)
+
+        self.scratch_slots = self.plan.assign_buffers(functions, self.steps)
+        self.buffers = [
+            np.empty(length)
+            for _ in range(max(self.scratch_slots.values(), default=-1) + 1)
+        ]
+        return [
+            (out, functions[out], args, self.scratch_slots[out])
+            if out in self.scratch_slots else (out, func, args, None)
+            for out, func, args in self.steps
+        ]
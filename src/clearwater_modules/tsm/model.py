@@ -8,6 +8,7 @@ from clearwater_modules.tsm import (
 from clearwater_modules import base
 import clearwater_modules.shared.processes as shared_processes
 from typing import (
+    Any,
     Optional,
 )
 
@@ -15,6 +16,7 @@ from typing import (
 class EnergyBudget(base.Model):
     """"""
     _variables: list[base.Variable] = []
+    _temperature: str = 'water_temp_c'
 
     def __init__(
         self,
@@ -27,9 +29,15 @@ class EnergyBudget(base.Model):
         track_dynamic_variables: bool = True,
         hotstart_dataset: Optional[xr.Dataset] = None,
         time_dim: Optional[str] = None,
+        **engine_options: Any,
     ) -> None:
-        self.__meteo_parameters: constants.Meteorological = constants.DEFAULT_METEOROLOGICAL
-        self.__temp_parameters: constants.Temperature = constants.DEFAULT_TEMPERATURE
+        """Initialize the model.
+
+        Execution options (backend, output_interval, history_window, ...)
+        are passed to base.Model as engine_options, see base.Model.__init__.
+        """
+        self.__meteo_parameters: constants.Meteorological = constants.DEFAULT_METEOROLOGICAL.copy()
+        self.__temp_parameters: constants.Temperature = constants.DEFAULT_TEMPERATURE.copy()
 
         if meteo_parameters is None:
             meteo_parameters = {}
@@ -67,6 +75,7 @@ class EnergyBudget(base.Model):
             track_dynamic_variables=track_dynamic_variables,
             hotstart_dataset=hotstart_dataset,
             time_dim=time_dim,
+            **engine_options,
         )
 
     @property
@@ -17,7 +17,6 @@ def validate_arrays(array: xr.DataArray, *args: xr.DataArray) -> None:
                 'All arguments must be of type xarray.DataArray.'
             )
         if tuple(arg.dims) != tuple(array.dims):
-            print(tuple(arg.dims), tuple(array.dims))
             raise ValueError(
                 'All DataArrays must have the same dimensions.'
             )
@@ -28,6 +27,18 @@ def validate_arrays(array: xr.DataArray, *args: xr.DataArray) -> None:
         #    )
 
 
+def validate_dims(array: xr.DataArray, dims: tuple[str, ...]) -> None:
+    """Validate that a DataArray has the expected dimensions."""
+    if not isinstance(array, xr.DataArray):
+        raise TypeError(
+            'All arguments must be of type xarray.DataArray.'
+        )
+    if tuple(array.dims) != tuple(dims):
+        raise ValueError(
+            'All DataArrays must have the same dimensions.'
+        )
+
+
 def _prep_inputs(
     input_dataset: xr.Dataset,
     var: Variable,
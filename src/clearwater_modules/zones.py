@@ -0,0 +1,107 @@
+"""Per-zone parameter tables.
+
+Models are usually calibrated by reach or zone rather than per cell. Instead
+of a full-grid array for each parameter, ParameterZones holds one zone index
+per cell (shared by all parameters) and a small table of values per zone for
+each zoned parameter. Per-cell values are gathered from the tables when a
+process needs them (see ArrayEngine), so re-parameterizing a zone only
+updates one table entry.
+"""
+import numpy as np
+import xarray as xr
+from typing import (
+    Hashable,
+    Mapping,
+    Optional,
+)
+
+
+class ParameterZones:
+    """Zone ids of the model grid and per-zone parameter tables.
+
+    Attributes:
+        ids: The sorted unique zone ids.
+        index: The position of each cell's zone in ids, of shape (*grid), in the
+            smallest unsigned integer type that fits.
+        dims: The grid dimensions of index.
+        tables: Parameter names and their values, one per zone id.
+        attrs: Parameter names and their variable attributes.
+    """
+
+    def __init__(self, zones: xr.DataArray) -> None:
+        """Build the zone index of the grid.
+
+        Args:
+            zones: A DataArray with the zone id of each cell, on the same
+                dimensions as the model's state variables.
+        """
+        if not isinstance(zones, xr.DataArray):
+            raise TypeError(
+                f'Expected zones to be a xarray.DataArray, got {type(zones)} instead.'
+            )
+        values: np.ndarray = np.asarray(zones.values)
+        if values.dtype.kind not in 'iub' and values.dtype != object:
+            raise TypeError(
+                f'Zone ids must be integers, got dtype {values.dtype}.'
+            )
+        self.ids: np.ndarray = np.unique(values)
+        self.index: np.ndarray = np.searchsorted(self.ids, values).astype(
+            np.min_scalar_type(max(len(self.ids) - 1, 0))
+        )
+        self.dims: tuple[str, ...] = tuple(zones.dims)
+        self.tables: dict[str, np.ndarray] = {}
+        self.attrs: dict[str, dict] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.tables
+
+    def _position(self, zone: Hashable) -> int:
+        position: int = int(np.searchsorted(self.ids, zone))
+        if position == len(self.ids) or self.ids[position] != zone:
+            raise KeyError(f'Zone {zone!r} is not in the model grid.')
+        return position
+
+    def add(
+        self,
+        name: str,
+        values: Mapping[Hashable, object],
+        attrs: Optional[dict] = None,
+    ) -> None:
+        """Add the per-zone table of a parameter.
+
+        Args:
+            name: The parameter (static variable) name.
+            values: A mapping of zone id to value, with an entry for every zone.
+            attrs: The variable attributes of the parameter.
+        """
+        missing: list = [zone for zone in self.ids if zone not in values]
+        if missing:
+            raise ValueError(
+                f'No value found for zones {missing} of parameter {name}.'
+            )
+        self.tables[name] = np.array([values[zone] for zone in self.ids])
+        self.attrs[name] = attrs if attrs is not None else {}
+
+    def table(self, name: str) -> dict:
+        """Return the per-zone values of a parameter as a {zone id: value} dict."""
+        return {
+            zone.item() if isinstance(zone, np.generic) else zone: value.item()
+            for zone, value in zip(self.ids, self.tables[name])
+        }
+
+    def set(self, name: str, zone: Hashable, value: object) -> None:
+        """Set the value of a parameter in one zone."""
+        if name not in self.tables:
+            raise KeyError(f'Parameter {name} is not zoned.')
+        table: np.ndarray = self.tables[name]
+        dtype: np.dtype = np.result_type(table, np.asarray(value))
+        if dtype != table.dtype:
+            table = self.tables[name] = table.astype(dtype)
+        table[self._position(zone)] = value
+
+    def gather(self, name: str) -> np.ndarray:
+        """Return the per-cell values of a parameter, of shape (*grid)."""
+        return self.tables[name][self.index]
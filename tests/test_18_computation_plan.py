@@ -0,0 +1,118 @@
+"""Tests the precompiled computation plan."""
+import json
+import warnings
+import pytest
+from clearwater_modules.shared.types import (
+    Variable,
+)
+from clearwater_modules.sorter import (
+    split_variables,
+    sort_variables_for_computation,
+)
+from clearwater_modules.plan import (
+    CACHE_DIR_ENV,
+    ComputationPlan,
+    get_cache_dir,
+    variables_hash,
+)
+
+
+@pytest.fixture
+def all_variables(static_variables, dynamic_variables) -> list[Variable]:
+    """Return a list of all Variables, with dynamics registered in reverse."""
+    return static_variables + dynamic_variables[::-1]
+
+
+def test_plan_order(all_variables: list[Variable]) -> None:
+    """Test that the plan matches the sorter and resolves argument slots."""
+    plan = ComputationPlan.build(all_variables)
+    sorted_vars = sort_variables_for_computation(split_variables(all_variables))
+    assert [var.name for var in plan.order] == [var.name for var in sorted_vars]
+    assert [var.name for var in plan.order] == ['dynamic_0', 'dynamic_1', 'dynamic_2']
+
+    out, func, args = plan.steps[1]
+    assert plan.names[out] == 'dynamic_1'
+    assert func is plan.order[1].process
+    assert [plan.names[i] for i in args] == ['a', 'b', 'dynamic_0']
+
+
+def test_plan_cache(all_variables: list[Variable], tmp_path) -> None:
+    """Test that plans are persisted and reloaded by variable hash."""
+    plan = ComputationPlan.build(all_variables, cache_dir=tmp_path)
+    path = tmp_path / f'{plan.key}.json'
+    assert path.exists()
+    assert json.loads(path.read_text())['order'] == [var.name for var in plan.order]
+
+    loaded = ComputationPlan.build(all_variables, cache_dir=tmp_path)
+    assert loaded.key == plan.key
+    assert loaded.steps == plan.steps
+
+
+def test_plan_cache_opt_in(all_variables: list[Variable], tmp_path, monkeypatch) -> None:
+    """Test that plans are only cached on disk if a cache directory is set."""
+    monkeypatch.delenv(CACHE_DIR_ENV, raising=False)
+    assert get_cache_dir() is None
+    monkeypatch.setenv(CACHE_DIR_ENV, '')
+    assert get_cache_dir() is None
+
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path))
+    plan = ComputationPlan.build(all_variables)
+    assert (tmp_path / f'{plan.key}.json').exists()
+
+
+def test_plan_cache_unwritable(all_variables: list[Variable], tmp_path) -> None:
+    """Test that a cache directory that cannot be created is a silent miss."""
+    blocker = tmp_path / 'blocker'
+    blocker.write_text('')
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        plan = ComputationPlan.build(all_variables, cache_dir=blocker / 'plans')
+    assert [var.name for var in plan.order] == ['dynamic_0', 'dynamic_1', 'dynamic_2']
+
+
+def test_plan_hash(all_variables: list[Variable]) -> None:
+    """Test that the cache key changes with the registered variables."""
+    assert variables_hash(all_variables) == variables_hash(list(all_variables))
+    assert variables_hash(all_variables) != variables_hash(all_variables[:-1])
+
+
+def test_circular_dependency(static_variables: list[Variable]) -> None:
+    """Test that circular dependencies are still detected."""
+    def process_x(y: float) -> float:
+        return y
+
+    def process_y(x: float) -> float:
+        return x
+
+    variables = static_variables + [
+        Variable('x', 'x', 'm', 'x', 'dynamic', process_x),
+        Variable('y', 'y', 'm', 'y', 'dynamic', process_y),
+    ]
+    with pytest.raises(ValueError, match='Circular dependency'):
+        ComputationPlan.build(variables)
+
+
+def test_time_invariant(all_variables: list[Variable]) -> None:
+    """Test that dynamics depending only on static values are time-invariant."""
+    plan = ComputationPlan.build(all_variables)
+    assert plan.time_invariant(['a', 'b']) == ('dynamic_0', 'dynamic_1', 'dynamic_2')
+    assert plan.time_invariant(['a']) == ()
+
+
+def test_live_ranges(all_variables: list[Variable]) -> None:
+    """Test that intermediates live at the same step never share a buffer."""
+    plan = ComputationPlan.build(all_variables)
+    slot = plan.index
+    assert plan.live_ranges() == {
+        slot['dynamic_0']: (0, 1),
+        slot['dynamic_1']: (1, 2),
+        slot['dynamic_2']: (2, 2),
+    }
+    assert plan.assign_buffers([slot['dynamic_0'], slot['dynamic_1'], slot['dynamic_2']]) == {
+        slot['dynamic_0']: 0,
+        slot['dynamic_1']: 1,
+        slot['dynamic_2']: 0,
+    }
+    assert plan.assign_buffers([slot['dynamic_1']], plan.steps[1:]) == {
+        slot['dynamic_1']: 0,
+    }
@@ -0,0 +1,310 @@
+"""Tests the fused numba kernel backend."""
+import numba
+import numpy as np
+import pytest
+import xarray as xr
+from clearwater_modules.codegen import (
+    FusedExecutor,
+    LevelStage,
+    fold_constants,
+    out_function,
+    scalar_function,
+)
+from clearwater_modules.sorter import get_process_args
+from clearwater_modules.plan import ComputationPlan
+from clearwater_modules.shared.types import (
+    Variable,
+)
+from clearwater_modules.tsm.model import EnergyBudget
+from typing import Optional
+
+
+def selection_process(a: float, b: float) -> float:
+    bounded = np.select(
+        condlist=[a > 2.0, a < -1.0],
+        choicelist=[2.0, -1.0],
+        default=a,
+    )
+    return xr.where(b > 0.0, bounded * b, 0.0)
+
+
+def switched_process(a: float, b: float, use_a: bool, use_b: bool) -> float:
+    total = xr.where(use_a & use_b, a + b, 0.0)
+    return np.select(
+        condlist=[~use_a & use_b, use_a],
+        choicelist=[b, total * a],
+        default=total,
+    )
+
+
+def option_process(a: float, b: float, option: int) -> float:
+    return np.select(
+        condlist=[option == 1, (option == 2) & (a > 1.0), (option == 2) & (a <= 1.0)],
+        choicelist=[a, a * b, b],
+        default=np.nan,
+    )
+
+
+def arithmetic_process(a: float, b: float) -> float:
+    ratio = a / b
+    return np.exp(ratio) * b
+
+
+def object_process(a: float, dynamic_0: float) -> float:
+    return getattr(np, 'sum')(a) + dynamic_0 * 0
+
+
+@pytest.fixture
+def fallback_variables(static_variables) -> list[Variable]:
+    """Return variables with one process numba cannot compile per cell."""
+    return static_variables + [
+        Variable(
+            name='dynamic_0',
+            long_name='Dynamic Variable 0',
+            units='m',
+            description='A dynamic variable.',
+            use='dynamic',
+            process=selection_process,
+        ),
+        Variable(
+            name='dynamic_1',
+            long_name='Dynamic Variable 1',
+            units='m',
+            description='A dynamic variable.',
+            use='dynamic',
+            process=object_process,
+        ),
+    ]
+
+
+def test_scalar_function() -> None:
+    """Test that element-wise selections are rewritten for scalars."""
+    scalar = scalar_function(selection_process)
+    a = np.array([-3.0, 0.5, 3.0, 1.0])
+    b = np.array([1.0, 2.0, 1.0, -1.0])
+    expected = np.asarray(selection_process(a, b))
+    assert [scalar(x, y) for x, y in zip(a, b)] == list(expected)
+
+
+def test_fold_constants() -> None:
+    """Test that selections on constant switches are folded out."""
+    a = np.array([1.0, 2.0])
+    b = np.array([3.0, 4.0])
+    for use_a in [True, False]:
+        for use_b in [True, False]:
+            folded = fold_constants(
+                switched_process,
+                {'use_a': use_a, 'use_b': use_b},
+            )
+            assert 'use_a' not in get_process_args(folded)
+            assert 'use_b' not in get_process_args(folded)
+            np.testing.assert_array_equal(
+                folded(*[{'a': a, 'b': b}[arg] for arg in get_process_args(folded)]),
+                switched_process(a, b, np.bool_(use_a), np.bool_(use_b)),
+            )
+
+    folded = fold_constants(switched_process, {'use_a': False, 'use_b': False})
+    assert get_process_args(folded) == []
+    assert fold_constants(switched_process, {'b': 1.0}) is switched_process
+    assert scalar_function(folded)() == 0.0
+
+
+def test_out_function() -> None:
+    """Test that out= variants write the result of a process into out."""
+    a = np.array([1.0, 2.0, 3.0])
+    b = np.array([2.0, 4.0, 0.5])
+    variant = out_function(arithmetic_process)
+    out = np.empty(3)
+    assert variant(a, b, out) is out
+    np.testing.assert_array_equal(out, arithmetic_process(a, b))
+    assert out_function(selection_process) is None
+
+
+def test_fold_options() -> None:
+    """Test that folded options are removed from partially known conditions."""
+    a = np.array([0.5, 2.0])
+    b = np.array([3.0, 4.0])
+    for option in [1, 2, 3]:
+        folded = fold_constants(option_process, {'option': option})
+        assert 'option' not in get_process_args(folded)
+        np.testing.assert_array_equal(
+            folded(*[{'a': a, 'b': b}[arg] for arg in get_process_args(folded)]),
+            option_process(a, b, np.full(2, option)),
+        )
+
+
+def test_fused_executor_fallback(fallback_variables: list[Variable]) -> None:
+    """Test that processes which cannot be compiled use the NumPy path."""
+    plan = ComputationPlan.build(fallback_variables)
+    executor = FusedExecutor(plan, needed_slots=set(range(len(plan.names))), shape=(4,))
+
+    values: list = [None] * len(plan.names)
+    values[plan.index['a']] = np.array([-3.0, 0.5, 3.0, 1.0])
+    values[plan.index['b']] = np.array([2.0])
+    for _ in range(2):
+        executor(values)
+
+    assert executor.fallback == ['dynamic_1']
+    assert executor.kernels[0].names == ['dynamic_0']
+    np.testing.assert_array_equal(
+        values[plan.index['dynamic_0']],
+        [-2.0, 1.0, 4.0, 2.0],
+    )
+    np.testing.assert_array_equal(values[plan.index['dynamic_1']], 1.5)
+
+
+def test_numba_backend(initial_array) -> None:
+    """Test that the numba backend matches the numpy backend."""
+    datasets: dict[str, xr.Dataset] = {}
+    for backend in ['numpy', 'numba']:
+        model = EnergyBudget(
+            time_steps=3,
+            initial_state_values={
+                'water_temp_c': initial_array * 20.0,
+                'surface_area': initial_array,
+                'volume': initial_array,
+            },
+            updateable_static_variables=['air_temp_c'],
+            backend=backend,
+        )
+        for i in range(3):
+            model.increment_timestep(
+                {'air_temp_c': initial_array * (10.0 + i)}
+            )
+        datasets[backend] = model.dataset
+
+    executor = model._engine.executor
+    assert executor.fallback == []
+    assert len(executor.kernels) == 1
+    xr.testing.assert_allclose(datasets['numpy'], datasets['numba'])
+
+
+def test_parallel_kernels(initial_array) -> None:
+    """Test that cell-parallel kernels give the same results as serial ones."""
+    datasets: dict[Optional[int], xr.Dataset] = {}
+    for threads in [None, 1, numba.config.NUMBA_NUM_THREADS]:
+        model = EnergyBudget(
+            time_steps=3,
+            initial_state_values={
+                'water_temp_c': initial_array * 20.0,
+                'surface_area': initial_array,
+                'volume': initial_array * 1000.0,
+            },
+            backend='numba',
+            threads=threads,
+        )
+        model.run(3)
+        datasets[threads] = model.dataset
+
+    kernel = model._engine.executor.kernels[0]
+    assert 'numba.prange' in kernel.source
+    assert kernel.threads == numba.config.NUMBA_NUM_THREADS
+    for dataset in datasets.values():
+        xr.testing.assert_identical(dataset, datasets[None])
+
+    for backend, threads in [('numba', numba.config.NUMBA_NUM_THREADS + 1), ('numpy', 2)]:
+        with pytest.raises(ValueError):
+            EnergyBudget(
+                time_steps=1,
+                initial_state_values={
+                    'water_temp_c': initial_array,
+                    'surface_area': initial_array,
+                    'volume': initial_array,
+                },
+                backend=backend,
+                threads=threads,
+            )
+
+
+@pytest.mark.parametrize('backend', ['numpy', 'numba'])
+def test_level_workers(initial_array, backend) -> None:
+    """Test that running dependency levels concurrently matches a sequential run."""
+    datasets: dict[Optional[int], xr.Dataset] = {}
+    for workers in [None, 1, 3]:
+        model = EnergyBudget(
+            time_steps=3,
+            initial_state_values={
+                'water_temp_c': initial_array * 20.0,
+                'surface_area': initial_array,
+                'volume': initial_array * 1000.0,
+            },
+            updateable_static_variables=['air_temp_c'],
+            backend=backend,
+            workers=workers,
+        )
+        for i in range(3):
+            model.increment_timestep({'air_temp_c': initial_array * (10.0 + i)})
+        datasets[workers] = model.dataset
+
+    stages = model._engine.executor.stages
+    assert any(isinstance(stage, LevelStage) for stage in stages)
+    if backend == 'numba':
+        # the compiled processes of a level are fused into one kernel per worker
+        assert max(
+            len(stage.stages) for stage in stages if isinstance(stage, LevelStage)
+        ) <= 3
+    for dataset in datasets.values():
+        xr.testing.assert_identical(dataset, datasets[None])
+
+    for kwargs in [dict(workers=0), dict(workers=2, threads=1)]:
+        with pytest.raises(ValueError):
+            EnergyBudget(
+                time_steps=1,
+                initial_state_values={
+                    'water_temp_c': initial_array,
+                    'surface_area': initial_array,
+                    'volume': initial_array,
+                },
+                backend='numba',
+                **kwargs,
+            )
+
+
+def test_invalid_backend(initial_array) -> None:
+    """Test that an unknown backend raises an error."""
+    with pytest.raises(ValueError):
+        EnergyBudget(
+            time_steps=1,
+            initial_state_values={
+                'water_temp_c': initial_array,
+                'surface_area': initial_array,
+                'volume': initial_array,
+            },
+            backend='cuda',
+        )
+
+
+@pytest.mark.parametrize('kwargs', [dict(output_interval=2), dict(history_window=2)])
+def test_multistep_kernel(initial_array, kwargs) -> None:
+    """Test that run() with a multi-step kernel matches stepping with numpy."""
+    air_temp_c = xr.concat(
+        [initial_array * (10.0 + i) for i in range(5)],
+        dim='time_step',
+    )
+    datasets: dict[str, xr.Dataset] = {}
+    for backend in ['numpy', 'numba']:
+        model = EnergyBudget(
+            time_steps=5,
+            initial_state_values={
+                'water_temp_c': initial_array * 20.0,
+                'surface_area': initial_array,
+                'volume': initial_array * 1000.0,
+            },
+            updateable_static_variables=['air_temp_c'],
+            track_dynamic_variables=True,
+            backend=backend,
+            **kwargs,
+        )
+        if backend == 'numpy':
+            for i in range(5):
+                model.increment_timestep({'air_temp_c': air_temp_c.isel(time_step=i)})
+        else:
+            model.run(5, forcing={'air_temp_c': air_temp_c})
+        datasets[backend] = model.dataset
+
+    # the first timestep compiles the kernels, the other four run in one call
+    kernels = list(model._engine.executor._multistep.values())
+    assert len(kernels) == 1
+    assert 'for t in range(n_steps)' in kernels[0].source
+    assert model.timestep == 5
+    xr.testing.assert_allclose(datasets['numpy'], datasets['numba'])
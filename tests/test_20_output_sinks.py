@@ -0,0 +1,157 @@
+"""Tests streaming output sinks."""
+import time
+import numpy as np
+import pytest
+import xarray as xr
+from clearwater_modules.sinks import (
+    BackgroundSink,
+    OutputSink,
+    ZarrSink,
+    NetCDFSink,
+)
+from clearwater_modules.tsm.model import EnergyBudget
+
+
+class MemorySink(OutputSink):
+    """Keeps appended chunks in memory."""
+
+    def _create(self, static_dataset: xr.Dataset) -> None:
+        self.static = static_dataset
+        self.chunks: list[xr.Dataset] = []
+
+    def _append(self, chunk: xr.Dataset) -> None:
+        self.chunks.append(chunk.copy(deep=True))
+
+
+@pytest.fixture(scope='module')
+def initial_tsm_state(initial_array) -> dict[str, xr.DataArray]:
+    """Return initial state values for the model."""
+    return {
+        'water_temp_c': initial_array * 20.0,
+        'surface_area': initial_array,
+        'volume': initial_array,
+    }
+
+
+def run_model(initial_tsm_state, sinks, **kwargs) -> EnergyBudget:
+    model = EnergyBudget(
+        time_steps=7,
+        initial_state_values=initial_tsm_state,
+        updateable_static_variables=['air_temp_c'],
+        track_dynamic_variables=False,
+        sinks=sinks,
+        **kwargs,
+    )
+    model.run(7)
+    model.close()
+    return model
+
+
+def test_sink_chunks(initial_tsm_state) -> None:
+    """Test that output steps are appended in chunks of chunk_size."""
+    sink = MemorySink(chunk_size=3)
+    model = run_model(initial_tsm_state, [sink], output_interval=2)
+
+    assert sink.steps_written == 4
+    assert [chunk.sizes['time_step'] for chunk in sink.chunks] == [3, 1]
+    assert 'air_temp_c' in sink.variables
+    assert 'water_temp_c' in sink.variables
+    assert 'use_sed_temp' in sink.static.data_vars
+    xr.testing.assert_equal(
+        xr.concat(sink.chunks, dim='time_step'),
+        model.dataset[sink.variables],
+    )
+
+
+def test_sink_history_window(initial_tsm_state) -> None:
+    """Test that sinks keep the steps dropped from a ring buffer."""
+    sink = MemorySink(chunk_size=4)
+    model = run_model(initial_tsm_state, [sink], history_window=2)
+    written = xr.concat(sink.chunks, dim='time_step')
+    assert list(written['time_step'].values) == list(range(8))
+    xr.testing.assert_equal(
+        written.isel(time_step=slice(-2, None)),
+        model.dataset[sink.variables],
+    )
+
+
+def test_zarr_sink(initial_tsm_state, tmp_path) -> None:
+    """Test that results are appended to a Zarr store."""
+    pytest.importorskip('zarr')
+    store = tmp_path / 'tsm.zarr'
+    model = run_model(initial_tsm_state, [ZarrSink(store, chunk_size=3)])
+
+    written = xr.open_zarr(store).load()
+    assert written.sizes['time_step'] == 8
+    xr.testing.assert_allclose(written, model.dataset)
+
+
+def test_netcdf_sink(initial_tsm_state, tmp_path) -> None:
+    """Test that results are appended to a compressed NetCDF file."""
+    pytest.importorskip('netCDF4')
+    path = tmp_path / 'tsm.nc'
+    model = run_model(
+        initial_tsm_state,
+        [NetCDFSink(path, chunk_size=3, complevel=1)],
+    )
+
+    with xr.open_dataset(path) as written:
+        assert written.sizes['time_step'] == 8
+        assert written['water_temp_c'].encoding['zlib']
+        assert written['water_temp_c'].encoding['chunksizes'][0] == 3
+        np.testing.assert_allclose(
+            written['water_temp_c'].values,
+            model.dataset['water_temp_c'].values,
+        )
+        np.testing.assert_array_equal(
+            written['use_sed_temp'].values.astype(bool),
+            model.dataset['use_sed_temp'].values,
+        )
+
+
+class SlowSink(MemorySink):
+    """A memory sink with slow appends."""
+
+    def _append(self, chunk: xr.Dataset) -> None:
+        time.sleep(0.01)
+        super()._append(chunk)
+
+
+class FailingSink(MemorySink):
+    """A memory sink failing on append."""
+
+    def _append(self, chunk: xr.Dataset) -> None:
+        raise OSError('Disk full.')
+
+    def _close(self) -> None:
+        self.closed = True
+
+
+def test_background_sink(initial_tsm_state) -> None:
+    """Test that a background sink writes the same steps as a direct sink."""
+    direct = MemorySink(chunk_size=2)
+    background = BackgroundSink(SlowSink(chunk_size=2))
+    run_model(initial_tsm_state, [direct, background])
+
+    assert background.steps_submitted == 8
+    assert background.steps_written == 8
+    assert background.lag == 0
+    assert 1 <= background.max_lag <= 2
+    assert background.blocked_time > 0.0
+    xr.testing.assert_equal(
+        xr.concat(background.sink.chunks, dim='time_step'),
+        xr.concat(direct.chunks, dim='time_step'),
+    )
+
+
+def test_background_sink_error(initial_tsm_state) -> None:
+    """Test that writer errors are raised in the compute thread."""
+    background = BackgroundSink(FailingSink(chunk_size=2))
+    with pytest.raises(RuntimeError):
+        run_model(initial_tsm_state, [background])
+
+    # the wrapped sink is closed even though its buffered steps can't be written
+    with pytest.raises(OSError):
+        background.close()
+    assert background.sink.closed
+    assert not background.sink.is_open
@@ -0,0 +1,186 @@
+"""Tests time-varying forcing."""
+import numpy as np
+import pytest
+import xarray as xr
+import pandas as pd
+from clearwater_modules.forcing import (
+    Forcing,
+    interpolation_weights,
+)
+from clearwater_modules.forcing_cache import (
+    ForcingCache,
+    write_forcing_cache,
+)
+from clearwater_modules.tsm.model import EnergyBudget
+
+
+@pytest.fixture
+def zones(initial_array) -> xr.DataArray:
+    """Return two zones, split along y."""
+    return xr.where(initial_array.y < 5, 1, 7).broadcast_like(initial_array)
+
+
+def make_model(initial_array, **kwargs) -> EnergyBudget:
+    return EnergyBudget(
+        time_steps=4,
+        initial_state_values={
+            'water_temp_c': initial_array * 20.0,
+            'surface_area': initial_array,
+            'volume': initial_array * 1000.0,
+        },
+        updateable_static_variables=['air_temp_c', 'wind_speed', 'q_solar'],
+        **kwargs,
+    )
+
+
+def test_interpolation_weights() -> None:
+    """Test linear interpolation indices and weights."""
+    indices, weights = interpolation_weights(
+        np.array([0.0, 2.0, 3.0]),
+        np.array([0.0, 1.0, 2.0, 2.5, 3.0]),
+    )
+    np.testing.assert_array_equal(indices, [0, 0, 1, 1, 1])
+    np.testing.assert_allclose(weights, [0.0, 0.5, 0.0, 0.5, 1.0])
+
+    times = np.array(['2024-01-01T00', '2024-01-01T01'], dtype='datetime64[h]')
+    _, weights = interpolation_weights(
+        times,
+        np.array(['2024-01-01T00:15'], dtype='datetime64[m]'),
+    )
+    np.testing.assert_allclose(weights, [0.25])
+
+    with pytest.raises(ValueError):
+        interpolation_weights(np.array([0.0, 1.0]), np.array([2.0]))
+
+
+@pytest.mark.parametrize('backend', ['numpy', 'numba'])
+def test_forcing(initial_array, zones, backend) -> None:
+    """Test that forcing matches updating the interpolated values each step."""
+    hours = np.arange(4) * 3600.0
+    air = xr.DataArray([10.0, 14.0, 12.0, 8.0], dims='time', coords={'time': hours})
+    wind = xr.DataArray(
+        [[2.0, 1.0], [4.0, 1.0], [0.0, 3.0], [1.0, 1.0]],
+        dims=('time', 'zone'),
+        coords={'time': hours, 'zone': [7, 1]},
+    )
+    solar = (
+        xr.DataArray(np.arange(4) * 100.0, dims='time', coords={'time': hours})
+        * initial_array
+    ).transpose('time', *initial_array.dims)
+    times = np.arange(5) * 2700.0
+
+    model = make_model(initial_array, zones=zones, backend=backend)
+    model.set_forcing(
+        Forcing(
+            {'air_temp_c': air, 'wind_speed': wind, 'q_solar': solar},
+            times=times,
+        )
+    )
+    model.run(4)
+
+    expected = make_model(initial_array, backend=backend)
+    for time in times[1:]:
+        i: int = min(int(time // 3600), 2)
+        w: float = (time - hours[i]) / 3600.0
+        interpolated = {
+            name: series.isel(time=i) * (1 - w) + series.isel(time=i + 1) * w
+            for name, series in [('air_temp_c', air), ('wind_speed', wind), ('q_solar', solar)]
+        }
+        expected.increment_timestep({
+            'air_temp_c': interpolated['air_temp_c'].reset_coords(drop=True) + initial_array * 0,
+            'wind_speed': interpolated['wind_speed'].sel(zone=zones).reset_coords(drop=True),
+            'q_solar': interpolated['q_solar'].reset_coords(drop=True),
+        })
+    xr.testing.assert_allclose(model.dataset, expected.dataset)
+
+
+def test_forcing_errors(initial_array) -> None:
+    """Test that forcing is validated when it is set."""
+    hours = np.arange(4) * 3600.0
+    model = make_model(initial_array)
+    with pytest.raises(ValueError):
+        model.set_forcing(Forcing(
+            {'pressure_mb': xr.DataArray(np.ones(4), dims='time', coords={'time': hours})},
+            times=hours,
+        ))
+    with pytest.raises(ValueError):
+        model.set_forcing(Forcing(
+            {'wind_speed': xr.DataArray(np.ones((4, 2)), dims=('time', 'zone'), coords={'time': hours})},
+            times=hours,
+        ))
+    with pytest.raises(ValueError):
+        Forcing(
+            {'air_temp_c': xr.DataArray(np.ones(4), dims='time', coords={'time': hours})},
+            times=hours + 1.0,
+        )
+
+
+@pytest.fixture
+def met_dataset(initial_array) -> xr.Dataset:
+    """Return hourly meteorology on the test grid."""
+    times = pd.date_range('2024-01-01', periods=6, freq='h').values
+    rng = np.random.default_rng(0)
+    return xr.Dataset(
+        data_vars={
+            'air_temp_c': (
+                ('time',) + initial_array.dims,
+                10.0 + rng.random((6,) + initial_array.shape),
+            ),
+            'wind_speed': ('time', rng.random(6)),
+        },
+        coords={'time': times, **initial_array.coords},
+    )
+
+
+def test_forcing_cache(met_dataset, tmp_path) -> None:
+    """Test that a forcing cache is a memory-mapped copy of its source."""
+    pytest.importorskip('netCDF4')
+    met_dataset.to_netcdf(tmp_path / 'met.nc')
+    write_forcing_cache(tmp_path / 'met.nc', tmp_path / 'met.cwf')
+
+    cache = ForcingCache(tmp_path / 'met.cwf')
+    assert cache.data.shape == (6, 100, 2)
+    np.testing.assert_array_equal(cache.times, met_dataset['time'].values)
+    series = cache.series()
+    assert np.shares_memory(series['air_temp_c'].values, cache.data)
+    xr.testing.assert_equal(series['air_temp_c'], met_dataset['air_temp_c'])
+    np.testing.assert_array_equal(
+        series['wind_speed'].values,
+        np.broadcast_to(
+            met_dataset['wind_speed'].values[:, None, None],
+            series['wind_speed'].shape,
+        ),
+    )
+
+    csv = met_dataset['air_temp_c'].to_dataframe().reset_index()
+    csv.to_csv(tmp_path / 'met.csv', index=False)
+    write_forcing_cache(
+        tmp_path / 'met.csv',
+        tmp_path / 'csv.cwf',
+        dtype='float32',
+        cell_columns=['y', 'x'],
+    )
+    np.testing.assert_allclose(
+        ForcingCache(tmp_path / 'csv.cwf').series()['air_temp_c'].values,
+        met_dataset['air_temp_c'].transpose('time', 'y', 'x').values,
+        rtol=1e-6,
+    )
+
+    with pytest.raises(ValueError):
+        ForcingCache(tmp_path / 'met.csv')
+
+
+def test_forcing_from_cache(initial_array, met_dataset, tmp_path) -> None:
+    """Test that forcing read from a cache matches in-memory forcing."""
+    write_forcing_cache(met_dataset, tmp_path / 'met.cwf')
+    times = met_dataset['time'].values[0] + np.arange(5) * np.timedelta64(45, 'm')
+    datasets: list[xr.Dataset] = []
+    for forcing in [
+        Forcing.from_cache(tmp_path / 'met.cwf', times=times),
+        Forcing(dict(met_dataset.data_vars), times=times),
+    ]:
+        model = make_model(initial_array)
+        model.set_forcing(forcing)
+        model.run(4)
+        datasets.append(model.dataset)
+    xr.testing.assert_allclose(datasets[0], datasets[1])
@@ -0,0 +1,84 @@
+"""Tests running a model on shards of the grid in worker processes."""
+import numpy as np
+import pytest
+import xarray as xr
+from clearwater_modules.partition import PartitionedModel
+from clearwater_modules.tsm.model import EnergyBudget
+
+
+@pytest.fixture
+def model_kwargs(initial_array) -> dict:
+    return dict(
+        time_steps=4,
+        initial_state_values={
+            'water_temp_c': initial_array * 20.0,
+            'surface_area': initial_array,
+            'volume': initial_array * 1000.0,
+        },
+        updateable_static_variables=['air_temp_c'],
+    )
+
+
+def test_partitioned_model(initial_array, model_kwargs) -> None:
+    """Test that shards in worker processes match a single model."""
+    expected = EnergyBudget(**model_kwargs)
+    with PartitionedModel(EnergyBudget, 3, **model_kwargs) as model:
+        assert model.split_dim == 'y'
+        assert [index.stop - index.start for index in model.shards] == [4, 3, 3]
+        assert model.inputs == ['air_temp_c']
+        for i in range(3):
+            air_temp_c = initial_array * (10.0 + i)
+            model.increment_timestep({'air_temp_c': air_temp_c})
+            expected.increment_timestep({'air_temp_c': air_temp_c})
+        model.run(1)
+        expected.increment_timestep()
+        assert model.timestep == 4
+
+        np.testing.assert_allclose(
+            model.state['water_temp_c'],
+            expected.dataset['water_temp_c'].isel(time_step=-1).values,
+        )
+        dataset = model.dataset
+        xr.testing.assert_allclose(dataset, expected.dataset[list(dataset.data_vars)])
+
+        with pytest.raises(ValueError):
+            model.increment_timestep({'water_temp_c': initial_array})
+        # the error raised in the workers closes the model
+        with pytest.raises(RuntimeError, match='only has 4 timesteps'):
+            model.run(1)
+        with pytest.raises(RuntimeError):
+            model.run(1)
+
+
+def test_partitioned_model_hotstart(initial_array, model_kwargs) -> None:
+    """Test that a partitioned model can be hotstarted from a dataset."""
+    expected = EnergyBudget(**model_kwargs)
+    expected.run(2)
+    hotstart = expected.dataset.isel(time_step=slice(0, 3))
+    expected.run(2)
+
+    with PartitionedModel(
+        EnergyBudget,
+        2,
+        split_dim='x',
+        time_steps=2,
+        hotstart_dataset=hotstart,
+        updateable_static_variables=['air_temp_c'],
+    ) as model:
+        model.run(2)
+        np.testing.assert_allclose(
+            model.state['water_temp_c'],
+            expected.dataset['water_temp_c'].isel(time_step=-1).values,
+        )
+
+
+def test_partitioned_model_errors(model_kwargs) -> None:
+    """Test that invalid partitions are rejected."""
+    with pytest.raises(ValueError):
+        PartitionedModel(EnergyBudget, 0, **model_kwargs)
+    with pytest.raises(ValueError):
+        PartitionedModel(EnergyBudget, 11, **model_kwargs)
+    with pytest.raises(ValueError):
+        PartitionedModel(EnergyBudget, 2, split_dim='z', **model_kwargs)
+    with pytest.raises(ValueError):
+        PartitionedModel(EnergyBudget, 2, inputs=['pressure_mb'], **model_kwargs)
@@ -10,6 +10,7 @@ from clearwater_modules.sorter import (
     split_variables,
     get_process_args,
     sort_variables_for_computation,
+    dependency_levels,
 )
 
 
@@ -68,3 +69,55 @@ def test_sort_variables(
     assert sorted_vars[0].name == 'dynamic_0'
     assert sorted_vars[1].name == 'dynamic_1'
     assert sorted_vars[2].name == 'dynamic_2'
+
+
+def state_equation(state_0: float, dynamic_0: float) -> float:
+    return state_0 + dynamic_0
+
+
+def reads_state_equation(a: float, state_0: float) -> float:
+    return a * state_0
+
+
+def test_dependency_levels(
+    static_variables: list[Variable],
+    dynamic_variables: list[Variable],
+) -> None:
+    """Test that independent variables share a dependency level."""
+    sorted_vars = sort_variables_for_computation(
+        split_variables(static_variables + dynamic_variables),
+    )
+    levels = dependency_levels(sorted_vars)
+    assert [[var.name for var in level] for level in levels] == [
+        ['dynamic_0'], ['dynamic_1'], ['dynamic_2'],
+    ]
+
+    # processes after a state update read its new value, those before it
+    # read the previous value, so the update must follow them
+    order = [
+        dynamic_variables[0],
+        Variable(
+            name='state_0',
+            long_name='State Variable 0',
+            units='m',
+            description='A state variable.',
+            use='state',
+            process=state_equation,
+        ),
+        Variable(
+            name='dynamic_3',
+            long_name='Dynamic Variable 3',
+            units='m',
+            description='A dynamic variable.',
+            use='dynamic',
+            process=reads_state_equation,
+        ),
+    ]
+    levels = dependency_levels(order)
+    assert [[var.name for var in level] for level in levels] == [
+        ['dynamic_0'], ['state_0'], ['dynamic_3'],
+    ]
+    levels = dependency_levels([order[0], order[2], order[1]])
+    assert [[var.name for var in level] for level in levels] == [
+        ['dynamic_0', 'dynamic_3'], ['state_0'],
+    ]
@@ -8,6 +8,7 @@ from clearwater_modules.base import (
     Variable,
     InitialVariablesDict,
 )
+from clearwater_modules.engine import compact_array
 
 
 class MockModel(Model):
@@ -208,6 +209,21 @@ def test_static_variable_dims(model: Model) -> None:
             assert len(ds[var_name].dims) == 2
 
 
+def test_compact_static_arrays(model: Model) -> None:
+    """Test that uniform static variables are stored as 0-d arrays."""
+    model.increment_timestep()
+    assert model._engine.static['b'].shape == ()
+    assert model.dataset['b'].shape == (10, 10)
+    np.testing.assert_array_equal(model.dataset['b'].values, 2.0)
+
+    options = compact_array('growth_option', np.full((10, 10), 2))
+    assert options.shape == ()
+    assert options.dtype == np.int8
+    varying = np.arange(4.0)
+    assert np.array_equal(compact_array('b', varying), varying)
+    assert not np.shares_memory(compact_array('b', varying), varying)
+
+
 def test_variable_attributes(model: Model) -> None:
     """Tests that all variables in the Model.dataset have the correct attributes."""
     model.increment_timestep()
@@ -263,3 +279,240 @@ def test_model_update_state(
     mean_static_f: float = ds.a.sel(time_step=time_steps).mean().item()
     assert mean_static_f >= mean_static_i * 100
 
+
+
+def test_model_bind_arrays(model: Model) -> None:
+    """Tests that bound host arrays are read and written in place."""
+    host_a = np.full((10, 10), 3.0)
+    state = np.empty((10, 10))
+    model.bind_inputs({'a': memoryview(host_a)})
+    model.bind_outputs({'state_variable': state})
+    assert np.shares_memory(model._engine.inputs['a'], host_a)
+
+    for _ in range(2):
+        host_a *= 2.0
+        model.increment_timestep()
+        expected = model.dataset['state_variable'].sel(time_step=model.timestep).values
+        np.testing.assert_array_equal(state, expected)
+        np.testing.assert_array_equal(
+            model.dataset['a'].sel(time_step=model.timestep).values,
+            host_a,
+        )
+
+    with pytest.raises(ValueError):
+        model.bind_inputs({'a': np.zeros((10, 9))})
+    with pytest.raises(TypeError):
+        model.bind_inputs({'a': np.zeros((10, 10), dtype=int)})
+    with pytest.raises(ValueError):
+        model.bind_inputs({'b': host_a})
+    read_only = np.zeros((10, 10))
+    read_only.flags.writeable = False
+    with pytest.raises(ValueError):
+        model.bind_outputs({'state_variable': read_only})
+
+
+@pytest.mark.parametrize('validate', ['always', 'once', 'never'])
+def test_model_validate_modes(
+    model: Model,
+    initial_state_values: InitialVariablesDict,
+    initial_static_values: InitialVariablesDict,
+    validate: str,
+) -> None:
+    """Tests when update_state_values are checked."""
+    model = MockModel(
+        time_steps=3,
+        initial_state_values=initial_state_values,
+        static_variable_values=initial_static_values,
+        updateable_static_variables=['a'],
+        validate=validate,
+    )
+    update = model.dataset['a'].isel(time_step=0)
+    misnamed = update.rename({'x': 'i', 'y': 'j'})
+    if validate == 'never':
+        model.increment_timestep({'a': misnamed})
+    else:
+        with pytest.raises(ValueError):
+            model.increment_timestep({'a': misnamed})
+    model.increment_timestep({'a': update})
+
+    if validate == 'always':
+        with pytest.raises(ValueError):
+            model.increment_timestep({'a': misnamed})
+    else:
+        model.increment_timestep({'a': misnamed})
+
+    with pytest.raises(ValueError):
+        MockModel(
+            time_steps=1,
+            initial_state_values=initial_state_values,
+            static_variable_values=initial_static_values,
+            validate='sometimes',
+        )
+
+
+def test_dataset_is_engine_view(model: Model) -> None:
+    """Tests that Model.dataset wraps the engine buffers without copying."""
+    ds = model.increment_timestep()
+    assert ds is model.dataset
+    assert np.shares_memory(
+        ds['state_variable'].values,
+        model._engine.temporal['state_variable'],
+    )
+    np.testing.assert_array_equal(
+        ds['state_variable'].isel(time_step=1).values,
+        model._engine.current['state_variable'],
+    )
+
+
+def test_model_run(
+    model: Model,
+    time_steps: int,
+    initial_static_values: InitialVariablesDict,
+    initial_state_values: InitialVariablesDict,
+) -> None:
+    """Tests that run() matches increment_timestep() with the same forcing."""
+    a = model.dataset['a'].isel(time_step=0)
+    forcing = xr.concat([a * 10, a * 100], dim='time_step')
+
+    synced: list[int] = []
+    ds = model.run(
+        time_steps,
+        forcing={'a': forcing},
+        sync_steps=[1],
+        callback=lambda m: synced.append(m.timestep),
+    )
+    assert synced == [1]
+    assert model.timestep == time_steps
+
+    stepped = MockModel(
+        time_steps=time_steps,
+        initial_state_values=initial_state_values,
+        static_variable_values=initial_static_values,
+        updateable_static_variables=['a'],
+    )
+    for i in range(time_steps):
+        stepped.increment_timestep({'a': forcing.isel(time_step=i)})
+    xr.testing.assert_equal(ds, stepped.dataset)
+
+    with pytest.raises(ValueError):
+        model.run(1)
+
+
+def test_model_run_forcing_dims(model: Model) -> None:
+    """Tests that run() validates forcing up front."""
+    a = model.dataset['a'].isel(time_step=0)
+    with pytest.raises(ValueError):
+        model.run(2, forcing={'a': xr.concat([a], dim='time_step')})
+    with pytest.raises(ValueError):
+        model.run(1, forcing={'b': xr.concat([a], dim='time_step')})
+    with pytest.raises(ValueError):
+        model.run(1, forcing={'a': a})
+    assert model.timestep == 0
+
+
+def test_model_output_interval(
+    initial_static_values: InitialVariablesDict,
+    initial_state_values: InitialVariablesDict,
+    model: Model,
+) -> None:
+    """Tests that only every Nth timestep is allocated and written."""
+    decimated = MockModel(
+        time_steps=5,
+        initial_state_values=initial_state_values,
+        static_variable_values=initial_static_values,
+        updateable_static_variables=['a'],
+        output_interval=2,
+        track_dynamic_variables=True,
+    )
+    assert list(decimated.output_steps) == [0, 2, 4]
+    assert decimated.dataset.sizes['time_step'] == 3
+
+    full = MockModel(
+        time_steps=5,
+        initial_state_values=initial_state_values,
+        static_variable_values=initial_static_values,
+        updateable_static_variables=['a'],
+        track_dynamic_variables=True,
+    )
+    for _ in range(5):
+        decimated.increment_timestep()
+        full.increment_timestep()
+    xr.testing.assert_equal(
+        decimated.dataset,
+        full.dataset.sel(time_step=[0, 2, 4]),
+    )
+
+    listed = MockModel(
+        time_steps=5,
+        initial_state_values=initial_state_values,
+        static_variable_values=initial_static_values,
+        updateable_static_variables=['a'],
+        output_steps=[5, 3],
+    )
+    assert list(listed.dataset['time_step'].values) == [0, 3, 5]
+    with pytest.raises(ValueError):
+        MockModel(
+            time_steps=5,
+            initial_state_values=initial_state_values,
+            static_variable_values=initial_static_values,
+        updateable_static_variables=['a'],
+            output_interval=0,
+        )
+
+
+def test_model_history_window(
+    initial_static_values: InitialVariablesDict,
+    initial_state_values: InitialVariablesDict,
+    model: Model,
+) -> None:
+    """Tests that a ring buffer keeps the last K steps and can hotstart."""
+    kwargs = dict(
+        initial_state_values=initial_state_values,
+        static_variable_values=initial_static_values,
+        updateable_static_variables=['a'],
+        track_dynamic_variables=True,
+    )
+    ring = MockModel(time_steps=1, history_window=3, **kwargs)
+    full = MockModel(time_steps=7, **kwargs)
+    assert ring.dataset.sizes['time_step'] == 1
+    # each output step is mirrored, so that the last 3 are always contiguous
+    assert ring._engine.temporal['state_variable'].shape[0] == 6
+
+    builds: list[int] = []
+    build_dataset = ring._engine._build_dataset
+    ring._engine._build_dataset = lambda *args: builds.append(1) or build_dataset(*args)
+    for _ in range(7):
+        ring.increment_timestep()
+        full.increment_timestep()
+    ring._engine._build_dataset = build_dataset
+    assert ring.timestep == 7
+    assert list(ring.dataset['time_step'].values) == [5, 6, 7]
+    # the view is rebuilt once per lap of the ring, and never copies the buffers
+    assert len(builds) == 2
+    assert np.shares_memory(
+        ring.dataset['state_variable'].values,
+        ring._engine.temporal['state_variable'],
+    )
+    xr.testing.assert_equal(
+        ring.dataset,
+        full.dataset.sel(time_step=[5, 6, 7]),
+    )
+
+    ring.run(5)
+    assert list(ring.dataset['time_step'].values) == [10, 11, 12]
+
+    hotstart = MockModel(
+        time_steps=2,
+        hotstart_dataset=ring.dataset,
+        updateable_static_variables=['a'],
+        history_window=2,
+    )
+    np.testing.assert_array_equal(
+        hotstart.dataset['state_variable'].isel(time_step=0).values,
+        ring.dataset['state_variable'].isel(time_step=-1).values,
+    )
+    hotstart.run(3)
+    assert list(hotstart.dataset['time_step'].values) == [2, 3]
+
+    with pytest.raises(ValueError):
+        MockModel(time_steps=1, history_window=0, **kwargs)
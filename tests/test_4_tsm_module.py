@@ -1,10 +1,12 @@
 import pytest
 import numpy as np
+import xarray as xr
 
 from clearwater_modules.tsm.model import (
     EnergyBudget
 )
 
+from clearwater_modules.lookup import TemperatureTables
 from clearwater_modules.tsm.constants import (
     DEFAULT_METEOROLOGICAL,
     DEFAULT_TEMPERATURE,
@@ -83,3 +85,98 @@ def test_use_sed_temp(
     )
     assert no_sed_temp.dataset.use_sed_temp.dtype == bool
     assert bool(np.all(no_sed_temp.dataset.use_sed_temp == False))
+
+
+def test_tsm_tiled_execution(initial_tsm_state) -> None:
+    """Tests that tiled execution matches computing the whole grid at once."""
+    datasets: list[xr.Dataset] = []
+    for tile_size in [None, 7, 1000]:
+        model = EnergyBudget(
+            time_steps=3,
+            initial_state_values=dict(initial_tsm_state),
+            updateable_static_variables=['air_temp_c'],
+            tile_size=tile_size,
+        )
+        for i in range(3):
+            model.increment_timestep(
+                {'air_temp_c': initial_tsm_state['water_temp_c'] * (10.0 + i)}
+            )
+        datasets.append(model.dataset)
+    for dataset in datasets[1:]:
+        xr.testing.assert_identical(dataset, datasets[0])
+
+    # untracked intermediates are written into reused tile-sized buffers
+    for tile_size in [None, 7]:
+        model = EnergyBudget(
+            time_steps=3,
+            initial_state_values=dict(initial_tsm_state),
+            updateable_static_variables=['air_temp_c'],
+            track_dynamic_variables=False,
+            tile_size=tile_size,
+        )
+        for i in range(3):
+            model.increment_timestep(
+                {'air_temp_c': initial_tsm_state['water_temp_c'] * (10.0 + i)}
+            )
+        if tile_size is None:
+            untiled: xr.Dataset = model.dataset
+    executor = model._engine.executor
+    assert 0 < len(executor.buffers) < len(executor.scratch_slots)
+    assert all(buffer.shape == (7,) for buffer in executor.buffers)
+    xr.testing.assert_allclose(model.dataset, untiled, rtol=1e-12)
+
+    for kwargs in [dict(tile_size=0), dict(tile_size=16, backend='numba')]:
+        with pytest.raises(ValueError):
+            EnergyBudget(
+                time_steps=1,
+                initial_state_values=dict(initial_tsm_state),
+                **kwargs,
+            )
+
+
+def test_tsm_buffer_reuse(initial_tsm_state) -> None:
+    """Tests that reusing buffers for untracked intermediates keeps results."""
+    datasets: list[xr.Dataset] = []
+    for track in [True, False]:
+        model = EnergyBudget(
+            time_steps=3,
+            initial_state_values=dict(initial_tsm_state),
+            updateable_static_variables=['air_temp_c'],
+            track_dynamic_variables=track,
+        )
+        for i in range(3):
+            model.increment_timestep(
+                {'air_temp_c': initial_tsm_state['water_temp_c'] * (10.0 + i)}
+            )
+        datasets.append(model.dataset[model.state_variables_names])
+    executor = model._engine.executor
+    assert 0 < len(executor.buffers) < len(executor.arena_slots)
+    xr.testing.assert_identical(datasets[1], datasets[0])
+
+
+def test_tsm_lookup_tables(initial_tsm_state) -> None:
+    """Tests that listed variables of water temperature are tabulated."""
+    datasets: list[xr.Dataset] = []
+    for lookup_tables in [None, TemperatureTables(variables=('density_water', 'esat_mb'))]:
+        model = EnergyBudget(
+            time_steps=2,
+            initial_state_values=dict(initial_tsm_state),
+            lookup_tables=lookup_tables,
+        )
+        model.run(2)
+        datasets.append(model.dataset)
+    assert set(model._engine.tables) == {'density_water', 'esat_mb'}
+    for name in ['density_water', 'esat_mb', 'water_temp_c']:
+        np.testing.assert_allclose(
+            datasets[1][name].values,
+            datasets[0][name].values,
+            rtol=1e-6,
+        )
+
+    # TSM has no default tables
+    with pytest.raises(ValueError):
+        EnergyBudget(
+            time_steps=1,
+            initial_state_values=dict(initial_tsm_state),
+            lookup_tables=TemperatureTables(),
+        )
@@ -1,9 +1,11 @@
 import numpy as np
 import pytest
+import xarray as xr
 
 from clearwater_modules.nsm1.model import (
     NutrientBudget
 )
+from clearwater_modules.lookup import TemperatureTables
 
 from clearwater_modules.nsm1.constants import (
     DEFAULT_ALGAE,
@@ -115,3 +117,276 @@ def test_nsm1_timestep(nutrient_budget_instance) -> None:
     assert len(nutrient_budget_instance.dataset.nsm1_time_step) == 2
     assert nutrient_budget_instance.dataset.sel(nsm1_time_step=1).isnull().any() == False
 
+
+
+@pytest.mark.parametrize('track_dynamic_variables', [True, False])
+def test_nsm1_switch_pruning(
+    initial_nsm1_state,
+    monkeypatch,
+    track_dynamic_variables,
+) -> None:
+    """Checks that switched-off modules give the same results as the full plan."""
+    modules: list[str] = ['use_Algae', 'use_POM', 'use_Pathogen', 'use_Alk', 'use_N2']
+    combinations: list[dict[str, bool]] = [
+        {name: bool(i >> bit & 1) for bit, name in enumerate(modules)}
+        for i in range(2 ** len(modules))
+    ]
+    # only nitrogen
+    combinations.append({
+        name: name in ['use_NH4', 'use_NO3', 'use_OrgN']
+        for name in DEFAULT_GLOBALPARAMETERS
+    })
+    for switches in combinations:
+        models: list[NutrientBudget] = []
+        for folded in [True, False]:
+            if not folded:
+                # the unpruned baseline
+                monkeypatch.setattr(NutrientBudget, '_switches', ())
+                monkeypatch.setattr(NutrientBudget, '_options', ())
+            models.append(NutrientBudget(
+                time_steps=3,
+                initial_state_values=dict(initial_nsm1_state),
+                global_parameters=switches,
+                track_dynamic_variables=track_dynamic_variables,
+            ))
+            monkeypatch.undo()
+        pruned, full = models
+        for _ in range(2):
+            pruned.increment_timestep()
+            full.increment_timestep()
+        assert pruned.state_variables_names == full.state_variables_names
+        xr.testing.assert_allclose(pruned.dataset, full.dataset)
+
+    assert set(full.computation_plan.names) == set(NutrientBudget.get_variable_names())
+    if track_dynamic_variables:
+        assert pruned.dynamic_variables_names == full.dynamic_variables_names
+    else:
+        # only processes whose outputs nothing reads are pruned
+        assert len(pruned.computation_order) < len(full.computation_order)
+        assert 'TN' not in pruned.computation_plan.index
+
+
+def test_nsm1_option_folding(initial_nsm1_state) -> None:
+    """Checks that uniform options only compute the selected formulas."""
+    options: dict[str, dict[str, int]] = {
+        'global_vars': {'hydraulic_reaeration_option': 5, 'wind_reaeration_option': 13},
+        'algae_parameters': {'light_limitation_option': 2, 'growth_rate_option': 2},
+    }
+    folded = NutrientBudget(
+        time_steps=2,
+        initial_state_values=dict(initial_nsm1_state),
+        **options,
+    )
+    # updateable options are not folded
+    full = NutrientBudget(
+        time_steps=2,
+        initial_state_values=dict(initial_nsm1_state),
+        updateable_static_variables=['light_limitation_option', 'growth_rate_option'],
+        **options,
+    )
+    plan = folded.computation_plan
+    for name in ['kah_20', 'kaw_20', 'FL', 'mu']:
+        assert not any(arg.endswith('_option') for arg in plan.args[name])
+    assert 'flow' not in plan.args['kah_20']
+    assert 'light_limitation_option' in full.computation_plan.args['FL']
+
+    for _ in range(2):
+        folded.increment_timestep()
+        full.increment_timestep()
+    for name in folded.state_variables_names + ['kah_20', 'kaw_20', 'FL', 'mu']:
+        np.testing.assert_array_equal(
+            folded.dataset[name].values,
+            full.dataset[name].values,
+        )
+
+
+def test_nsm1_option_grouping(initial_nsm1_state, initial_array) -> None:
+    """Checks that grouping cells by option value keeps the results."""
+    regimes = xr.where(initial_array.y < 5, 1, 0).broadcast_like(initial_array)
+    options: dict[str, dict[str, xr.DataArray]] = {
+        'global_vars': {'hydraulic_reaeration_option': 2 + 3 * regimes},
+        'algae_parameters': {
+            'light_limitation_option': 1 + regimes,
+            'growth_rate_option': 3 - 2 * regimes,
+        },
+    }
+    datasets: list[xr.Dataset] = []
+    for group_options in [False, True]:
+        nsm1 = NutrientBudget(
+            time_steps=3,
+            initial_state_values=dict(initial_nsm1_state),
+            updateable_static_variables=['light_limitation_option'],
+            group_options=group_options,
+            **options,
+        )
+        for i in range(3):
+            # the cells of each option are regrouped when they change
+            nsm1.increment_timestep(
+                {'light_limitation_option': (1 + (regimes + i) % 3).astype(int)}
+            )
+        datasets.append(nsm1.dataset)
+    for name in ['kah_20', 'FL', 'mu']:
+        assert datasets[1][name].isel(time_step=-1).notnull().all()
+    xr.testing.assert_identical(datasets[1], datasets[0])
+
+    with pytest.raises(ValueError):
+        NutrientBudget(
+            time_steps=1,
+            initial_state_values=dict(initial_nsm1_state),
+            backend='numba',
+            group_options=True,
+        )
+
+
+def test_nsm1_lookup_tables(initial_nsm1_state, initial_array) -> None:
+    """Checks that temperature tables match the exact computations."""
+    datasets: list[xr.Dataset] = []
+    for lookup_tables in [None, TemperatureTables(resolution=0.05)]:
+        nsm1 = NutrientBudget(
+            time_steps=3,
+            initial_state_values={**initial_nsm1_state, 'TwaterC': initial_array * 30.0},
+            updateable_static_variables=['TwaterC'],
+            lookup_tables=lookup_tables,
+        )
+        for temperature in [5.0, 25.0]:
+            nsm1.increment_timestep({'TwaterC': initial_array * 10.0 + temperature})
+        # outside the tables, the variables are computed exactly
+        nsm1.increment_timestep({'TwaterC': initial_array * 10.0 + 50.0})
+        datasets.append(nsm1.dataset)
+
+    assert set(nsm1._engine.tables) == {'pwv', 'DOX_sat', 'K_H', 'KHN2_tc', 'N2sat'}
+    for name, table in nsm1._engine.tables.items():
+        assert table.max_error < 1e-5 * np.abs(table.table).max()
+        np.testing.assert_allclose(
+            datasets[1][name].isel(time_step=slice(1, 3)).values,
+            datasets[0][name].isel(time_step=slice(1, 3)).values,
+            rtol=1e-6,
+        )
+        np.testing.assert_array_equal(
+            datasets[1][name].isel(time_step=3).values,
+            datasets[0][name].isel(time_step=3).values,
+        )
+
+    with pytest.raises(ValueError):
+        NutrientBudget(
+            time_steps=1,
+            initial_state_values=dict(initial_nsm1_state),
+            backend='numba',
+            lookup_tables=TemperatureTables(),
+        )
+
+
+def test_nsm1_batch_arrhenius(initial_nsm1_state, initial_array) -> None:
+    """Checks that batched Arrhenius rates match the per-rate corrections."""
+    datasets: list[xr.Dataset] = []
+    for batch_arrhenius in [False, True]:
+        nsm1 = NutrientBudget(
+            time_steps=3,
+            initial_state_values={**initial_nsm1_state, 'TwaterC': initial_array * 30.0},
+            updateable_static_variables=['TwaterC'],
+            batch_arrhenius=batch_arrhenius,
+        )
+        for temperature in [5.0, 25.0]:
+            nsm1.increment_timestep({
+                'TwaterC': initial_array * temperature + initial_array.x,
+            })
+        datasets.append(nsm1.dataset)
+
+    # a single stage computes every rate, sharing factors between equal thetas
+    (stage,) = nsm1._engine._arrhenius
+    index: dict[str, int] = nsm1._engine.plan.index
+    assert {index['kah_tc'], index['knit_tc']} <= set(stage.outs)
+    assert 0 < len(stage.thetas) < len(stage.outs)
+    assert not set(stage.outs) & {out for out, _, _ in nsm1._engine._steps}
+    for name in ['kah_tc', 'knit_tc', 'NH4', 'DOX', 'DOC']:
+        np.testing.assert_allclose(
+            datasets[1][name].values,
+            datasets[0][name].values,
+            rtol=1e-12,
+        )
+
+    with pytest.raises(ValueError):
+        NutrientBudget(
+            time_steps=1,
+            initial_state_values=dict(initial_nsm1_state),
+            backend='numba',
+            batch_arrhenius=True,
+        )
+
+
+def test_nsm1_output_variables(initial_nsm1_state) -> None:
+    """Checks that only requested outputs (and their inputs) are computed."""
+    nsm1 = NutrientBudget(
+        time_steps=1,
+        initial_state_values=dict(initial_nsm1_state),
+        output_variables=['NH4', 'DIN'],
+    )
+    assert 'DIN' in nsm1.dynamic_variables_names
+    assert 'TON' not in nsm1.dynamic_variables_names
+    # state variables are always computed
+    assert 'PX' in nsm1.state_variables_names
+    nsm1.increment_timestep()
+    assert nsm1.dataset['DIN'].sel(time_step=1).notnull().all()
+    assert nsm1.dataset['PX'].sel(time_step=1).notnull().all()
+
+    with pytest.raises(ValueError):
+        NutrientBudget(
+            time_steps=1,
+            initial_state_values=dict(initial_nsm1_state),
+            output_variables=['vson'],
+        )
+
+
+def test_nsm1_hoisted_variables(initial_nsm1_state) -> None:
+    """Checks that dynamics depending only on statics are computed once."""
+    nsm1 = NutrientBudget(
+        time_steps=1,
+        initial_state_values=dict(initial_nsm1_state),
+        updateable_static_variables=['TwaterC'],
+    )
+    assert 'rna' in nsm1.hoisted_variables
+    assert 'knit_tc' not in nsm1.hoisted_variables
+    assert 'ApGrowth' not in nsm1.hoisted_variables
+    nsm1.increment_timestep()
+    np.testing.assert_allclose(
+        nsm1.dataset['rna'].sel(time_step=1).values,
+        DEFAULT_ALGAE['AWn'] / DEFAULT_ALGAE['AWa'],
+    )
+
+
+def test_nsm1_parameter_zones(initial_nsm1_state, initial_array) -> None:
+    """Checks that per-zone parameters match the equivalent grid arrays."""
+    zones = xr.where(initial_array.y < 5, 1, 7).broadcast_like(initial_array)
+    grid_mu = xr.where(zones == 1, 1.0, 3.0)
+
+    zoned = NutrientBudget(
+        time_steps=1,
+        initial_state_values=dict(initial_nsm1_state),
+        algae_parameters={'mu_max_20': {1: 1.0, 7: 2.0}},
+        zones=zones,
+    )
+    assert zoned.parameter_zones.index.dtype == np.uint8
+    assert 'mu_max_20' not in zoned._engine.static
+    zoned.set_zone_parameter('mu_max_20', 7, 3.0)
+    assert zoned.parameter_zones.table('mu_max_20') == {1: 1.0, 7: 3.0}
+    zoned.increment_timestep()
+
+    gridded = NutrientBudget(
+        time_steps=1,
+        initial_state_values=dict(initial_nsm1_state),
+        algae_parameters={'mu_max_20': grid_mu},
+    )
+    gridded.increment_timestep()
+    xr.testing.assert_allclose(zoned.dataset, gridded.dataset)
+
+    with pytest.raises(KeyError):
+        zoned.set_zone_parameter('mu_max_20', 3, 1.0)
+    with pytest.raises(ValueError):
+        zoned.set_zone_parameter('KNR', 7, 1.0)
+    with pytest.raises(ValueError):
+        NutrientBudget(
+            time_steps=1,
+            initial_state_values=dict(initial_nsm1_state),
+            algae_parameters={'mu_max_20': {1: 1.0}},
+            zones=zones,
+        )